@@ -0,0 +1,424 @@
+"""
+Incrementally maintained aggregates.
+
+`AggregateState` holds the attrition counters per dimension, the co-moment
+sums behind the correlation matrix (see correlation.py), per-column sketches
+(see sketches.py) and the monthly time-series rollups. Appended
+attrition events and monthly metric rows update them in time proportional to
+the batch instead of recomputing over the whole dataset. `StreamingAggregates`
+builds the same counters and sums in one chunked pass over a CSV that does not
+fit in memory.
+"""
+
+import csv
+import io
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from association import CategoryTables
+from correlation import INDICATOR_SUFFIX, CoMoments
+from filters import AT_RISK_COLUMN, FILTER_COLUMNS, at_risk_mask
+from sketches import DatasetSketch
+from storage import DIMENSIONS, format_attrition, format_summary
+
+# Factors reported by /api/factors-correlation
+FACTORS = [
+    'Age', 'DailyRate', 'DistanceFromHome', 'Education',
+    'EnvironmentSatisfaction', 'JobSatisfaction', 'MonthlyIncome',
+    'RelationshipSatisfaction', 'WorkLifeBalance', 'YearsAtCompany'
+]
+
+# Attrition as a 0/1 column of the correlation matrix
+ATTRITION_INDICATOR = 'Attrition' + INDICATOR_SUFFIX
+
+# Per-month rollup columns for monthly_metrics rows
+METRIC_SUMS = ['rows', 'monthly_income', 'work_hours', 'performance_rating', 'overtime']
+
+# Count cube cells: one per distinct combination of the filtered columns
+CUBE_KEYS = FILTER_COLUMNS + [AT_RISK_COLUMN]
+CUBE_COUNTS = ['count', 'yes', 'no']
+
+
+def dimension_codes(values: pd.Series, spec: Dict[str, Any]):
+    """Return integer codes (-1 for unmapped) and labels for one of DIMENSIONS."""
+    if 'scale' in spec:
+        values = values * spec['scale']
+    if 'bins' in spec:
+        codes = pd.cut(values, bins=spec['bins'], labels=spec['labels']).cat.codes.to_numpy()
+        return codes.astype(np.int64), list(spec['labels'])
+    if 'mapping' in spec:
+        values = values.map(spec['mapping'])
+    codes, labels = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), labels.tolist()
+
+
+def month_keys(values: pd.Series) -> pd.Series:
+    """Return 'YYYY-MM' keys (NaN where unparseable) for a column of dates."""
+    dates = pd.to_datetime(values, errors='coerce')
+    # .dt.strftime formats row by row; only the distinct months need a string
+    codes, months = pd.factorize(dates.dt.year * 100 + dates.dt.month)
+    labels = np.array([f'{int(m) // 100:04d}-{int(m) % 100:02d}' for m in months] + [np.nan], dtype=object)
+    return pd.Series(labels[codes], index=values.index)
+
+
+class AggregateState:
+    """Counters, correlation sums and time-series rollups for one dataset."""
+
+    def __init__(self, dataframe: pd.DataFrame):
+        self.dataframe = dataframe
+        attrited = (dataframe['Attrition'] == 'Yes').to_numpy()
+        retained = (dataframe['Attrition'] == 'No').to_numpy()
+
+        self.total = len(dataframe)
+        self.attrition_count = int(attrited.sum())
+        self.retention_count = int(retained.sum())
+
+        # Per-row dimension codes plus (yes, no) counts per label
+        self.codes: Dict[str, np.ndarray] = {}
+        self.labels: Dict[str, List[Any]] = {}
+        self.counts: Dict[str, np.ndarray] = {}
+        for name, spec in DIMENSIONS.items():
+            codes, labels = dimension_codes(dataframe[spec['column']], spec)
+            valid = codes >= 0
+            self.codes[name] = codes
+            self.labels[name] = labels
+            self.counts[name] = np.stack([
+                np.bincount(codes[valid & attrited], minlength=len(labels)),
+                np.bincount(codes[valid & retained], minlength=len(labels)),
+            ], axis=1)
+
+        # Co-moment sums for the correlation matrix of every numeric and Yes/No column
+        self.comoments = CoMoments.of(dataframe)
+
+        # Per-column statistics for /api/dataset-metadata and the chat context
+        self.sketches = DatasetSketch.of(dataframe)
+
+        # Employee id -> row position, for applying events
+        self.employee_ids = dataframe['EmployeeNumber'].to_numpy()
+        self._id_sorter = np.argsort(self.employee_ids, kind='stable')
+        self._attrition_col = dataframe.columns.get_loc('Attrition')
+
+        # Time-series rollups keyed by month ('YYYY-MM')
+        self.monthly_metrics: Dict[str, np.ndarray] = {}
+        self.monthly_exits: Dict[str, int] = {}
+        self.exit_reasons: Dict[str, int] = {}
+
+    def _positions(self, employee_ids: np.ndarray) -> np.ndarray:
+        """Row positions for employee ids, -1 where unknown."""
+        if len(self.employee_ids) == 0:
+            return np.full(len(employee_ids), -1)
+        pos = np.searchsorted(self.employee_ids, employee_ids, sorter=self._id_sorter)
+        pos = self._id_sorter[pos.clip(0, len(self.employee_ids) - 1)]
+        return np.where(self.employee_ids[pos] == employee_ids, pos, -1)
+
+    def attrition_by(self, dimension: str) -> Dict[str, Any]:
+        counts = self.counts[dimension]
+        return format_attrition(self.labels[dimension], counts[:, 0].tolist(), counts[:, 1].tolist())
+
+    def overall_statistics(self) -> Dict[str, Any]:
+        return format_summary(self.total, self.attrition_count, self.retention_count)
+
+    def correlation_matrix(self) -> pd.DataFrame:
+        return self.comoments.correlation()
+
+    def factor_correlations(self) -> pd.Series:
+        """Pearson correlation of each factor with AttritionBinary, from the co-moment sums."""
+        factors = [col for col in FACTORS if col in self.comoments.columns]
+        return self.correlation_matrix().loc[factors, ATTRITION_INDICATOR].rename(None)
+
+    def apply_attrition_events(self, events: pd.DataFrame):
+        """
+        Mark employees in `events` (employee_id, exit_date, exit_reason) as attrited.
+
+        Unknown employees and employees already marked as attrited are skipped,
+        so re-delivered events are harmless. Returns a summary of the batch and
+        the events that were applied.
+        """
+        if events.empty:
+            return {'applied': 0, 'unknown': 0, 'duplicate': 0}, events
+
+        ids = pd.to_numeric(events['employee_id'], errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+        pos = self._positions(ids)
+        known = pos >= 0
+        _, first = np.unique(pos, return_index=True)
+        unique = np.zeros(len(pos), dtype=bool)
+        unique[first] = True
+
+        attrition = self.dataframe['Attrition'].to_numpy()
+        flip = known & unique & (attrition[pos.clip(0)] != 'Yes')
+        rows = pos[flip]
+        was_retained = attrition[rows] == 'No'
+
+        # Move each flipped row from its (no) bucket to the (yes) bucket
+        for name, codes in self.codes.items():
+            row_codes = codes[rows]
+            valid = row_codes >= 0
+            size = len(self.labels[name])
+            self.counts[name][:, 0] += np.bincount(row_codes[valid], minlength=size)
+            self.counts[name][:, 1] -= np.bincount(row_codes[valid & was_retained], minlength=size)
+
+        self.attrition_count += len(rows)
+        self.retention_count -= int(was_retained.sum())
+
+        old_values = self.comoments.values(self.dataframe, rows)
+        self.sketches.replace('Attrition', attrition[rows], np.full(len(rows), 'Yes', dtype=object))
+        self.dataframe.iloc[rows, self._attrition_col] = 'Yes'
+        if 'Attrition_Binary' in self.dataframe.columns:
+            column = self.dataframe.columns.get_loc('Attrition_Binary')
+            self.sketches.replace('Attrition_Binary', self.dataframe.iloc[rows, column].to_numpy(), np.ones(len(rows)))
+            self.dataframe.iloc[rows, column] = 1
+        self.comoments.replace(old_values, self.comoments.values(self.dataframe, rows))
+
+        applied = events[flip]
+        self._add_exits(applied)
+
+        summary = {
+            'applied': int(flip.sum()),
+            'unknown': int((~known).sum()),
+            'duplicate': int((known & ~flip).sum()),
+        }
+        return summary, applied
+
+    def _add_exits(self, events: pd.DataFrame):
+        if 'exit_date' in events.columns:
+            months = month_keys(events['exit_date']).dropna()
+            for month, count in months.value_counts().items():
+                self.monthly_exits[month] = self.monthly_exits.get(month, 0) + int(count)
+        if 'exit_reason' in events.columns:
+            for reason, count in events['exit_reason'].value_counts().items():
+                self.exit_reasons[reason] = self.exit_reasons.get(reason, 0) + int(count)
+
+    def append_monthly_metrics(self, metrics: pd.DataFrame) -> int:
+        """Fold monthly_metrics rows into the per-month rollups."""
+        if metrics.empty:
+            return 0
+
+        batch = pd.DataFrame({
+            'month': month_keys(metrics['month']),
+            'rows': 1,
+            'monthly_income': pd.to_numeric(metrics.get('monthly_income'), errors='coerce'),
+            'work_hours': pd.to_numeric(metrics.get('work_hours'), errors='coerce'),
+            'performance_rating': pd.to_numeric(metrics.get('performance_rating'), errors='coerce'),
+            'overtime': (metrics.get('overtime') == 'Yes').astype(int),
+        }).dropna(subset=['month'])
+
+        sums = batch.groupby('month')[METRIC_SUMS].sum()
+        for month, values in zip(sums.index, sums.to_numpy(dtype=float)):
+            if month in self.monthly_metrics:
+                self.monthly_metrics[month] += values
+            else:
+                self.monthly_metrics[month] = values
+        return len(batch)
+
+    def load_history(self, monthly_metrics_path: Optional[str] = None,
+                     attrition_events_path: Optional[str] = None, chunksize: int = 100000):
+        """Seed the time-series rollups from the generated CSV files."""
+        if monthly_metrics_path and os.path.exists(monthly_metrics_path):
+            for chunk in pd.read_csv(monthly_metrics_path, chunksize=chunksize):
+                self.append_monthly_metrics(chunk)
+        if attrition_events_path and os.path.exists(attrition_events_path):
+            self._add_exits(pd.read_csv(attrition_events_path))
+
+    def monthly_trends(self) -> Dict[str, Any]:
+        """Return the monthly rollups as parallel lists ordered by month."""
+        months = sorted(set(self.monthly_metrics) | set(self.monthly_exits))
+        sums = np.array([self.monthly_metrics.get(month, np.zeros(len(METRIC_SUMS))) for month in months])
+        rows = sums[:, 0] if len(months) else np.zeros(0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = {
+                col: np.where(rows > 0, sums[:, i] / rows, np.nan) if len(months) else np.zeros(0)
+                for i, col in enumerate(METRIC_SUMS) if col != 'rows'
+            }
+
+        def clean(values):
+            return [None if np.isnan(v) else round(float(v), 2) for v in values]
+
+        return {
+            'months': months,
+            'activeEmployees': [int(v) for v in rows],
+            'avgMonthlyIncome': clean(averages['monthly_income']),
+            'avgWorkHours': clean(averages['work_hours']),
+            'avgPerformanceRating': clean(averages['performance_rating']),
+            'overtimeRate': clean(averages['overtime'] * 100),
+            'exits': [self.monthly_exits.get(month, 0) for month in months],
+            'exitReasons': dict(sorted(self.exit_reasons.items())),
+        }
+
+
+class StreamingAggregates(AggregateState):
+    """
+    AggregateState built from a CSV read in chunks, for datasets larger than memory.
+
+    One pass accumulates the per-dimension counters, the co-moment sums, the
+    column sketches, the categorical columns' contingency tables against
+    attrition and a count cube over the filtered columns (see StreamingBackend); memory is
+    bounded by the chunk size and the number of distinct cube cells, not by
+    the number of rows. A uniform random sample of `sample_rows` rows is kept
+    for the features that need rows. No per-row state is kept, so attrition
+    events cannot be applied; monthly metric rows can.
+    """
+
+    def __init__(self, path: str, chunksize: int = 100000, sample_rows: int = 100000, seed: int = 0):
+        self.path = path
+        self.total = 0
+        self.attrition_count = 0
+        self.retention_count = 0
+        self.chunks = 0
+
+        self.sketches = DatasetSketch()
+        self.category_tables = CategoryTables()
+        dimension_counts: Dict[str, pd.DataFrame] = {}
+        cube: Optional[pd.DataFrame] = None
+        sample: Optional[pd.DataFrame] = None
+        sample_keys = np.zeros(0)
+        sample_rows = max(sample_rows, 1)
+        rng = np.random.default_rng(seed)
+
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            attrited = (chunk['Attrition'] == 'Yes').to_numpy()
+            retained = (chunk['Attrition'] == 'No').to_numpy()
+            self.chunks += 1
+            self.total += len(chunk)
+            self.attrition_count += int(attrited.sum())
+            self.retention_count += int(retained.sum())
+            self.sketches.update(chunk)
+            self.category_tables.update(chunk)
+
+            # Chunks only see some labels; add their counts up by label
+            for name, spec in DIMENSIONS.items():
+                codes, labels = dimension_codes(chunk[spec['column']], spec)
+                valid = codes >= 0
+                counts = pd.DataFrame({
+                    'yes': np.bincount(codes[valid & attrited], minlength=len(labels)),
+                    'no': np.bincount(codes[valid & retained], minlength=len(labels)),
+                }, index=labels)
+                previous = dimension_counts.get(name)
+                dimension_counts[name] = counts if previous is None else previous.add(counts, fill_value=0)
+
+            # The first chunk fixes the matrix columns and the shift
+            if sample is None:
+                self.comoments = CoMoments.of(chunk)
+            else:
+                self.comoments.update(chunk)
+
+            cells = chunk[FILTER_COLUMNS].assign(**{
+                AT_RISK_COLUMN: at_risk_mask(chunk), 'count': 1,
+                'yes': attrited.astype(np.int64), 'no': retained.astype(np.int64),
+            })
+            if cube is not None:
+                cells = pd.concat([cube, cells], ignore_index=True)
+            cube = cells.groupby(CUBE_KEYS, dropna=False, sort=False)[CUBE_COUNTS].sum().reset_index()
+
+            # Bottom-k sampling: keep the rows with the smallest random keys, in file order
+            keys = rng.random(len(chunk))
+            if len(sample_keys) >= sample_rows:
+                candidates = keys < sample_keys.max()
+                chunk, keys = chunk[candidates], keys[candidates]
+            sample = chunk if sample is None else pd.concat([sample, chunk])
+            sample_keys = np.concatenate([sample_keys, keys])
+            if len(sample_keys) > sample_rows:
+                kept = np.sort(np.argpartition(sample_keys, sample_rows - 1)[:sample_rows])
+                sample, sample_keys = sample.iloc[kept], sample_keys[kept]
+
+        if sample is None:
+            sample = pd.read_csv(path, nrows=0)
+            self.comoments = CoMoments.of(sample)
+            cube = pd.DataFrame(columns=CUBE_KEYS + CUBE_COUNTS)
+        self.sample = sample.reset_index(drop=True)
+        self.cube = cube
+
+        self.labels: Dict[str, List[Any]] = {}
+        self.counts: Dict[str, np.ndarray] = {}
+        for name, spec in DIMENSIONS.items():
+            counts = dimension_counts.get(name, pd.DataFrame(columns=['yes', 'no']))
+            counts = counts.reindex(spec['labels'], fill_value=0) if 'bins' in spec else counts.sort_index()
+            self.labels[name] = counts.index.tolist()
+            self.counts[name] = counts[['yes', 'no']].to_numpy(dtype=np.int64)
+
+        self.monthly_metrics: Dict[str, np.ndarray] = {}
+        self.monthly_exits: Dict[str, int] = {}
+        self.exit_reasons: Dict[str, int] = {}
+
+    def apply_attrition_events(self, events: pd.DataFrame):
+        raise NotImplementedError("Attrition events need per-row state, which streaming aggregation doesn't keep")
+
+
+class FileTailer:
+    """
+    Follow appended CSV files and feed new rows to a callback.
+
+    Only complete lines are consumed; the header is read from the top of the
+    file. By default tailing starts at the current end of each file, so rows
+    already loaded at startup are not applied twice.
+    """
+
+    def __init__(self, sources: Dict[str, str], callback: Callable[[str, pd.DataFrame], Any],
+                 interval: float = 5.0, from_start: bool = False):
+        self.sources = sources
+        self.callback = callback
+        self.interval = interval
+        self.offsets: Dict[str, int] = {}
+        self.headers: Dict[str, List[str]] = {}
+        for kind, path in sources.items():
+            self.offsets[kind] = 0 if from_start or not os.path.exists(path) else os.path.getsize(path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _read_header(self, path: str) -> Optional[List[str]]:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            line = f.readline()
+        return next(csv.reader([line])) if line.endswith('\n') else None
+
+    def poll(self):
+        """Read any complete new lines from each source and hand them to the callback."""
+        for kind, path in self.sources.items():
+            if not os.path.exists(path):
+                continue
+            if os.path.getsize(path) < self.offsets[kind]:
+                # File was truncated or replaced; start over after its header
+                self.offsets[kind] = 0
+            if kind not in self.headers:
+                header = self._read_header(path)
+                if header is None:
+                    continue
+                self.headers[kind] = header
+
+            with open(path, 'rb') as f:
+                f.seek(self.offsets[kind])
+                data = f.read()
+            end = data.rfind(b'\n')
+            if end < 0:
+                continue
+            chunk = data[:end + 1]
+            self.offsets[kind] += len(chunk)
+
+            text = chunk.decode('utf-8-sig')
+            lines = text.splitlines()
+            if lines and next(csv.reader([lines[0]])) == self.headers[kind]:
+                lines = lines[1:]
+            if not lines:
+                continue
+            batch = pd.read_csv(io.StringIO('\n'.join(lines)), header=None, names=self.headers[kind])
+            self.callback(kind, batch)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error tailing files: {str(e)}")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='append-tailer', daemon=True)
+        self._thread.start()
+        print(f"Tailing {', '.join(self.sources.values())} every {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -1,170 +1,207 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import os
-from chatbot import get_chatbot_instance
+import atexit
+import json
+import threading
+import time
+from aggregates import ATTRITION_INDICATOR, AggregateState, FileTailer, StreamingAggregates
+from chat_batch import answer_batch
+from chatbot import plot_columns, plot_response, render_plot_of, render_shared_plot, warm_up
+from datasets import Dataset, DatasetRegistry, UnknownDatasetError, dataset_paths
+from employee_index import LISTING_COLUMNS, decode_cursor
+import export
+from filters import filter_mask, parse_filter_args
+from jobs import JobScheduler, current_job
+import metrics
+import profiling
+from simulation import Intervention, simulation_workers
+from shared_dataset import SharedDataset, attach_or_publish, read_manifest, release
+from storage import PandasBackend, create_backend
+from survival import DEFAULT_COHORTS, survival_curves
+from werkzeug.datastructures import MultiDict
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
+profiling.init_app(app)
 
-# Load the dataset
-dataset_path = './HR-Employee-Attrition-All.csv'
-df = pd.read_csv(dataset_path)
+# Load the dataset (paths can be overridden, e.g. to point the benchmarks at generated data)
+dataset_path = os.getenv('DATASET_PATH', './HR-Employee-Attrition-All.csv')
 
-# Initialize chatbot with the dataset
-chatbot = get_chatbot_instance(df)
+# Streaming mode: aggregate the CSV in one chunked pass and keep only a sample of its rows
+streaming = os.getenv('STORAGE_BACKEND', 'pandas').lower() == 'streaming'
+
+# Shared-memory mode: the columns live in a named segment mapped by every worker process
+shared_manifest_path = os.getenv('SHARED_DATASET_MANIFEST')
+shared_dataset = None
+if streaming:
+    aggregates = StreamingAggregates(dataset_path, chunksize=int(os.getenv('STREAMING_CHUNK_ROWS', 100000)),
+                                     sample_rows=int(os.getenv('STREAMING_SAMPLE_ROWS', 100000)))
+    print(f"Streamed {aggregates.total} rows in {aggregates.chunks} chunks: "
+          f"{len(aggregates.cube)} count cells, {len(aggregates.sample)} sampled rows")
+    df = aggregates.sample
+elif shared_manifest_path:
+    shared_dataset, published = attach_or_publish(shared_manifest_path, dataset_path)
+    if published:
+        # The process that published the segment removes it on exit (forked workers exit without atexit)
+        owner_pid = os.getpid()
+        atexit.register(lambda: os.getpid() == owner_pid and release(shared_manifest_path))
+    print(f"Attached shared dataset version {shared_dataset.version} ({shared_dataset.rows} rows)")
+    df = shared_dataset.frame()
+else:
+    df = pd.read_csv(dataset_path)
+
+# Generated HRIS tables (see Datasets/Dataset_gen_new.py)
+monthly_metrics_path = os.getenv('MONTHLY_METRICS_PATH', '../Datasets/monthly_metrics.csv')
+attrition_events_path = os.getenv('ATTRITION_EVENTS_PATH', '../Datasets/attrition_events.csv')
+
+# Counters, correlation sums and monthly rollups, updated in place by /api/append
+if not streaming:
+    aggregates = AggregateState(df)
+aggregates.load_history(monthly_metrics_path, attrition_events_path)
+
+# Hire/exit dates and manager links generated by Datasets/Dataset_gen_new.py
+employees_path = os.getenv('EMPLOYEES_PATH', '../Datasets/employees.csv')
+employee_records = None
+if os.path.exists(employees_path):
+    employee_records = pd.read_csv(employees_path, usecols=['EmployeeNumber', 'hire_date', 'exit_date', 'manager_id'])
+
+# Result cache sizes, per dataset
+dataset_options = {
+    'filter_cache_size': int(os.getenv('FILTER_CACHE_SIZE', 256)),
+    'correlation_cache_size': int(os.getenv('CORRELATION_CACHE_SIZE', 64)),
+}
+
+# The default dataset; aggregations go through its storage backend (in-process pandas or SQL pushdown)
+default_dataset = Dataset(os.getenv('DEFAULT_DATASET', 'default'), dataset_path, df, aggregates,
+                          create_backend(df, aggregates), employee_records, **dataset_options)
+del df, aggregates
+
+# Further datasets selected with ?dataset=<name>: loaded on first use into memory, least recently
+# used ones evicted to stay within the budget
+registry = DatasetRegistry(
+    dataset_paths(os.getenv('DATASETS'), os.getenv('DATASETS_DIR')),
+    lambda name, path: Dataset.from_csv(name, path, cache_suffix=f':{name}', **dataset_options),
+    budget_bytes=int(float(os.getenv('DATASET_MEMORY_BUDGET_MB', 2048)) * 2 ** 20),
+    default=default_dataset,
+)
+# Version of the default dataset whose rows are the ones in the shared segment (appends change them)
+shared_frame_version = default_dataset.version if shared_dataset is not None else None
+del default_dataset
+
+# Background jobs for requests sent with async: a pool per class, plots optionally in worker processes
+scheduler = JobScheduler({
+    'chat': (int(os.getenv('JOB_CHAT_WORKERS', 4)), False),
+    'plot': (int(os.getenv('JOB_PLOT_WORKERS', 1)), os.getenv('JOB_PLOT_PROCESSES', 'false').lower() == 'true'),
+    'simulation': (int(os.getenv('JOB_SIMULATION_WORKERS', 1)), False),
+}, ttl=float(os.getenv('JOB_TTL_SECONDS', 600)))
+# Seconds between keep-alive comments on /api/jobs/<id>/events
+job_heartbeat = float(os.getenv('JOB_EVENTS_HEARTBEAT', 15))
+
+# Import the plotting and HTTP stack off the startup path; the first plot or chat waits for it
+warmup_thread = warm_up() if os.getenv('CHAT_WARMUP', 'true').lower() == 'true' else None
+
+# How often workers look for a newly published shared dataset version (seconds)
+shared_dataset_poll = float(os.getenv('SHARED_DATASET_POLL', 2))
+shared_dataset_checked = time.monotonic()
+reload_lock = threading.Lock()
+
+def current_dataset():
+    """Return the dataset selected with ?dataset= (or "dataset" in a JSON body), the default one otherwise"""
+    name = request.args.get('dataset')
+    if name is None:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            name = data.get('dataset')
+    return registry.get(name)
+
+@app.errorhandler(UnknownDatasetError)
+def unknown_dataset(e):
+    """Answer 404 for a dataset name that isn't configured"""
+    return jsonify({"error": e.args[0]}), 404
+
+def reload_shared_dataset():
+    """Switch to the latest published shared dataset version and rebuild derived state"""
+    global shared_dataset, shared_frame_version
+    
+    current = registry.get()
+    latest = SharedDataset.attach(shared_manifest_path)
+    frame = latest.frame()
+    new_aggregates = AggregateState(frame)
+    new_aggregates.load_history(monthly_metrics_path, attrition_events_path)
+    new_storage = PandasBackend(frame, new_aggregates) if current.storage.name == 'pandas' else current.storage
+    # Keeps the chatbot and its conversation; the version continues from the one replaced
+    replacement = Dataset(current.name, current.path, frame, new_aggregates, new_storage,
+                          current.employee_records, chatbot=current.chatbot,
+                          version=current.version + 1, **dataset_options)
+    
+    with current.append_lock:
+        replacement.version = max(replacement.version, current.version + 1)
+        registry.replace(replacement)
+        shared_dataset = latest
+        shared_frame_version = replacement.version
+    print(f"Switched to shared dataset version {latest.version} ({latest.rows} rows)")
+
+@app.before_request
+def follow_shared_dataset():
+    """Pick up a newly published shared dataset version"""
+    global shared_dataset_checked
+    if shared_dataset is None or time.monotonic() - shared_dataset_checked < shared_dataset_poll:
+        return
+    # One request per worker does the reload; the others keep serving the current version
+    if not reload_lock.acquire(blocking=False):
+        return
+    try:
+        shared_dataset_checked = time.monotonic()
+        manifest = read_manifest(shared_manifest_path)
+        if manifest is not None and manifest['version'] != shared_dataset.version:
+            reload_shared_dataset()
+    finally:
+        reload_lock.release()
 
 @app.route('/api/attrition-by-age', methods=['GET'])
 def attrition_by_age():
     """Return attrition data grouped by age"""
-    age_groups = pd.cut(df['Age'], bins=[18, 25, 35, 45, 55, 65], labels=['18-25', '26-35', '36-45', '46-55', '56-65'])
-    attrition_by_age = df.groupby([age_groups, 'Attrition']).size().unstack().fillna(0)
-    
-    # Calculate percentages
-    attrition_by_age['Total'] = attrition_by_age['Yes'] + attrition_by_age['No']
-    attrition_by_age['AttritionRate'] = (attrition_by_age['Yes'] / attrition_by_age['Total'] * 100).round(2)
-    
-    result = {
-        'labels': attrition_by_age.index.tolist(),
-        'yesCount': attrition_by_age['Yes'].tolist(),
-        'noCount': attrition_by_age['No'].tolist(),
-        'rates': attrition_by_age['AttritionRate'].tolist()
-    }
-    return jsonify(result)
+    return jsonify(current_dataset().storage.attrition_by('age'))
 
 @app.route('/api/attrition-by-gender', methods=['GET'])
 def attrition_by_gender():
     """Return attrition data grouped by gender"""
-    attrition_by_gender = df.groupby(['Gender', 'Attrition']).size().unstack().fillna(0)
-    
-    # Calculate percentages
-    attrition_by_gender['Total'] = attrition_by_gender['Yes'] + attrition_by_gender['No']
-    attrition_by_gender['AttritionRate'] = (attrition_by_gender['Yes'] / attrition_by_gender['Total'] * 100).round(2)
-    
-    result = {
-        'labels': attrition_by_gender.index.tolist(),
-        'yesCount': attrition_by_gender['Yes'].tolist(),
-        'noCount': attrition_by_gender['No'].tolist(),
-        'rates': attrition_by_gender['AttritionRate'].tolist()
-    }
-    return jsonify(result)
+    return jsonify(current_dataset().storage.attrition_by('gender'))
 
 @app.route('/api/attrition-by-department', methods=['GET'])
 def attrition_by_department():
     """Return attrition data grouped by department"""
-    attrition_by_dept = df.groupby(['Department', 'Attrition']).size().unstack().fillna(0)
-    
-    # Calculate percentages
-    attrition_by_dept['Total'] = attrition_by_dept['Yes'] + attrition_by_dept['No']
-    attrition_by_dept['AttritionRate'] = (attrition_by_dept['Yes'] / attrition_by_dept['Total'] * 100).round(2)
-    
-    result = {
-        'labels': attrition_by_dept.index.tolist(),
-        'yesCount': attrition_by_dept['Yes'].tolist(),
-        'noCount': attrition_by_dept['No'].tolist(),
-        'rates': attrition_by_dept['AttritionRate'].tolist()
-    }
-    return jsonify(result)
+    return jsonify(current_dataset().storage.attrition_by('department'))
 
 @app.route('/api/attrition-by-education', methods=['GET'])
 def attrition_by_education():
     """Return attrition data grouped by education level"""
-    # Map numeric education levels to descriptions if needed
-    education_mapping = {1: 'Below College', 2: 'College', 3: 'Bachelor', 4: 'Master', 5: 'Doctor'}
-    df['EducationLevel'] = df['Education'].map(education_mapping)
-    
-    attrition_by_edu = df.groupby(['EducationLevel', 'Attrition']).size().unstack().fillna(0)
-    
-    # Calculate percentages
-    attrition_by_edu['Total'] = attrition_by_edu['Yes'] + attrition_by_edu['No']
-    attrition_by_edu['AttritionRate'] = (attrition_by_edu['Yes'] / attrition_by_edu['Total'] * 100).round(2)
-    
-    result = {
-        'labels': attrition_by_edu.index.tolist(),
-        'yesCount': attrition_by_edu['Yes'].tolist(),
-        'noCount': attrition_by_edu['No'].tolist(),
-        'rates': attrition_by_edu['AttritionRate'].tolist()
-    }
-    return jsonify(result)
+    return jsonify(current_dataset().storage.attrition_by('education'))
 
 @app.route('/api/attrition-by-job-satisfaction', methods=['GET'])
 def attrition_by_job_satisfaction():
     """Return attrition data grouped by job satisfaction"""
-    satisfaction_mapping = {1: 'Low', 2: 'Medium', 3: 'High', 4: 'Very High'}
-    df['SatisfactionLevel'] = df['JobSatisfaction'].map(satisfaction_mapping)
-    
-    attrition_by_sat = df.groupby(['SatisfactionLevel', 'Attrition']).size().unstack().fillna(0)
-    
-    # Calculate percentages
-    attrition_by_sat['Total'] = attrition_by_sat['Yes'] + attrition_by_sat['No']
-    attrition_by_sat['AttritionRate'] = (attrition_by_sat['Yes'] / attrition_by_sat['Total'] * 100).round(2)
-    
-    result = {
-        'labels': attrition_by_sat.index.tolist(),
-        'yesCount': attrition_by_sat['Yes'].tolist(),
-        'noCount': attrition_by_sat['No'].tolist(),
-        'rates': attrition_by_sat['AttritionRate'].tolist()
-    }
-    return jsonify(result)
+    return jsonify(current_dataset().storage.attrition_by('job-satisfaction'))
 
 @app.route('/api/attrition-by-salary', methods=['GET'])
 def attrition_by_salary():
     """Return attrition data grouped by salary bands"""
-    # Convert MonthlyIncome to annual
-    df['AnnualIncome'] = df['MonthlyIncome'] * 12
-    
-    # Create salary bands
-    salary_bins = [0, 50000, 100000, 150000, 200000, float('inf')]
-    salary_labels = ['<50K', '50K-100K', '100K-150K', '150K-200K', '>200K']
-    df['SalaryBand'] = pd.cut(df['AnnualIncome'], bins=salary_bins, labels=salary_labels)
-    
-    attrition_by_salary = df.groupby(['SalaryBand', 'Attrition']).size().unstack().fillna(0)
-    
-    # Calculate percentages
-    attrition_by_salary['Total'] = attrition_by_salary['Yes'] + attrition_by_salary['No']
-    attrition_by_salary['AttritionRate'] = (attrition_by_salary['Yes'] / attrition_by_salary['Total'] * 100).round(2)
-    
-    result = {
-        'labels': attrition_by_salary.index.tolist(),
-        'yesCount': attrition_by_salary['Yes'].tolist(),
-        'noCount': attrition_by_salary['No'].tolist(),
-        'rates': attrition_by_salary['AttritionRate'].tolist()
-    }
-    return jsonify(result)
+    return jsonify(current_dataset().storage.attrition_by('salary'))
 
 @app.route('/api/overall-statistics', methods=['GET'])
 def overall_statistics():
     """Return overall attrition statistics"""
-    total_employees = len(df)
-    attrition_count = len(df[df['Attrition'] == 'Yes'])
-    retention_count = len(df[df['Attrition'] == 'No'])
-    attrition_rate = round((attrition_count / total_employees * 100), 2)
-    
-    result = {
-        'totalEmployees': int(total_employees),
-        'attritionCount': int(attrition_count),
-        'retentionCount': int(retention_count),
-        'attritionRate': float(attrition_rate)
-    }
-    return jsonify(result)
+    return jsonify(current_dataset().storage.overall_statistics())
 
 @app.route('/api/factors-correlation', methods=['GET'])
 def factors_correlation():
     """Return correlation between factors and attrition"""
-    # Convert categorical to numeric
-    df_numeric = df.copy()
-    df_numeric['AttritionBinary'] = df_numeric['Attrition'].map({'Yes': 1, 'No': 0})
-    
-    # Select relevant columns
-    factors = [
-        'Age', 'DailyRate', 'DistanceFromHome', 'Education', 
-        'EnvironmentSatisfaction', 'JobSatisfaction', 'MonthlyIncome',
-        'RelationshipSatisfaction', 'WorkLifeBalance', 'YearsAtCompany'
-    ]
-    
-    # Calculate correlation
-    correlations = df_numeric[factors].corrwith(df_numeric['AttritionBinary']).sort_values(ascending=False)
+    # Maintained from running sums, so appended events are already reflected
+    correlations = current_dataset().aggregates.factor_correlations().sort_values(ascending=False)
     
     result = {
         'factors': correlations.index.tolist(),
@@ -174,151 +211,358 @@ def factors_correlation():
 
 @app.route('/api/predictive-factors', methods=['GET'])
 def predictive_factors():
-    """Return key factors that predict attrition"""
-    # Create a copy of the dataframe for processing
-    df_encoded = df.copy()
-    
-    # Convert Attrition to binary
-    df_encoded['AttritionBinary'] = df_encoded['Attrition'].map({'Yes': 1, 'No': 0})
-    
-    # Handle categorical variables
-    # One-hot encode categorical columns
-    categorical_cols = df_encoded.select_dtypes(include=['object']).columns.tolist()
-    categorical_cols.remove('Attrition')  # Already handled
-    
-    # Select only numeric columns to avoid conversion errors
-    numeric_df = df_encoded.select_dtypes(include=['number'])
-    
-    # Exclude columns that aren't meaningful predictors
-    exclude_cols = ['EmployeeNumber', 'StandardHours', 'EmployeeCount', 'Over18']
-    for col in exclude_cols:
-        if col in numeric_df.columns:
-            numeric_df = numeric_df.drop(col, axis=1)
-    
-    # Add AttritionBinary for correlation calculation
-    numeric_df['AttritionBinary'] = df_encoded['AttritionBinary']
+    """Return the columns most associated with attrition, optionally for filtered rows"""
+    # Numeric columns by |r| and categorical ones by Cramér's V, cached per version and filters
+    try:
+        factors, rows = current_dataset().factor_associations(parse_filter_args(request.args))
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 409
     
-    # Calculate correlation with Attrition
-    correlation_matrix = numeric_df.corr()
-    attrition_correlations = correlation_matrix['AttritionBinary'].drop('AttritionBinary')
-    
-    # Sort by absolute correlation values
-    abs_correlations = attrition_correlations.abs()
-    sorted_correlations = abs_correlations.sort_values(ascending=False)
-    
-    top_factors = sorted_correlations.head(10)
+    top_factors = factors[:request.args.get('limit', 10, type=int)]
     
     result = {
-        'factors': top_factors.index.tolist(),
-        'importance': top_factors.values.tolist()
+        'rows': rows,
+        'factors': [factor['factor'] for factor in top_factors],
+        'importance': [factor['importance'] for factor in top_factors],
+        'measures': [factor['measure'] for factor in top_factors],
+        'mutualInformation': [factor['mutualInformation'] for factor in top_factors]
+    }
+    return jsonify(result)
+
+@app.route('/api/correlation-matrix', methods=['GET'])
+def correlation_matrix():
+    """Return the correlation matrix of the numeric and Yes/No columns, optionally for filtered rows"""
+    ds = current_dataset()
+    filters = parse_filter_args(request.args)
+    requested = request.args.getlist('column')
+    
+    try:
+        matrix, rows = ds.correlation_matrix(filters)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 409
+    
+    if requested:
+        unknown = [col for col in requested if col not in matrix.columns]
+        if unknown:
+            return jsonify({"error": f"Unknown or non-numeric columns: {', '.join(unknown)}"}), 400
+        matrix = matrix.loc[requested, requested]
+    
+    values = matrix.to_numpy()
+    result = {
+        'rows': rows,
+        'columns': matrix.columns.tolist(),
+        'matrix': [[None if np.isnan(v) else float(v) for v in row] for row in values]
     }
     return jsonify(result)
 
 @app.route('/api/employee-count', methods=['GET'])
 def employee_count():
     """Return employee count statistics"""
+    aggregates = current_dataset().aggregates
     result = {
-        'total': len(df),
-        'attrited': len(df[df['Attrition'] == 'Yes']),
-        'active': len(df[df['Attrition'] == 'No'])
+        'total': aggregates.total,
+        'attrited': aggregates.attrition_count,
+        'active': aggregates.retention_count
     }
     return jsonify(result)
 
 @app.route('/api/filtered-data', methods=['GET'])
 def filtered_data():
     """Return data based on applied filters"""
-    # Get filter parameters from request
-    tenure_min = request.args.get('tenureMin', 0, type=float)
-    tenure_max = request.args.get('tenureMax', 100, type=float)
-    
-    satisfaction_min = request.args.get('satisfactionMin', 1, type=float)
-    satisfaction_max = request.args.get('satisfactionMax', 5, type=float)
-    
-    performance_min = request.args.get('performanceMin', 1, type=float)
-    performance_max = request.args.get('performanceMax', 5, type=float)
+    filters = parse_filter_args(request.args)
+    return jsonify(current_dataset().filtered_summary(filters))
+
+def prewarm_filter_cache(source):
+    """Fill the default dataset's filtered-data cache with common filter combinations"""
+    from urllib.parse import parse_qsl
+    
+    ds = registry.get()
+    if os.path.exists(source):
+        # One query string per line, e.g. the most requested ones from the access log
+        with open(source) as f:
+            combinations = [parse_qsl(line.strip().lstrip('?')) for line in f if line.strip()]
+    else:
+        departments = sorted(ds.df['Department'].dropna().unique())
+        combinations = (
+            [[], [('atRisk', 'true')], [('gender', 'male')], [('gender', 'female')]]
+            + [[('departments', d)] for d in departments]
+            + [[('departments', d), ('atRisk', 'true')] for d in departments]
+        )
+    
+    started = time.perf_counter()
+    for args in combinations:
+        ds.filtered_summary(parse_filter_args(MultiDict(args)))
+    print(f"Pre-warmed {len(combinations)} filter combinations in {time.perf_counter() - started:.1f}s")
+
+# FILTER_CACHE_PREWARM=true warms the built-in combinations; a file path warms the query strings in it
+filter_cache_prewarm = os.getenv('FILTER_CACHE_PREWARM', 'false')
+prewarm_thread = None
+if filter_cache_prewarm.lower() != 'false':
+    prewarm_thread = threading.Thread(target=prewarm_filter_cache, args=(filter_cache_prewarm,),
+                                      name='filter-cache-warmup', daemon=True)
+    prewarm_thread.start()
+
+@app.route('/api/employees', methods=['GET'])
+def employees():
+    """List employees matching the filters, sorted by an indexed column, one keyset page at a time"""
+    # The index and the frame it was built over are swapped together on reload
+    ds = current_dataset()
+    if ds.storage.name == 'streaming':
+        return jsonify({"error": "Needs every row in memory; not available with STORAGE_BACKEND=streaming"}), 409
+    
+    index = ds.employee_index
+    frame = index.dataframe
+    
+    sort = request.args.get('sort', 'RiskScore')
+    if sort not in index.order:
+        return jsonify({"error": f"Cannot sort by {sort}; indexed columns are {', '.join(index.order)}"}), 400
+    order = request.args.get('order', 'asc').lower()
+    if order not in ('asc', 'desc'):
+        return jsonify({"error": "order must be asc or desc"}), 400
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    
+    after = None
+    if request.args.get('cursor'):
+        try:
+            cursor = decode_cursor(request.args['cursor'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if cursor['sort'] != sort or cursor['order'] != order:
+            return jsonify({"error": "Cursor belongs to a different sort; start again without it"}), 400
+        after = (cursor['value'], cursor['id'], cursor['row'])
+    
+    try:
+        columns = export.parse_columns(request.args, frame.columns.tolist()) if request.args.get('columns') \
+            else [name for name in LISTING_COLUMNS if name in frame.columns]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    mask = filter_mask(frame, parse_filter_args(request.args))
+    rows, has_more = index.page(sort, mask, limit, order == 'desc', after)
+    
+    records = frame.take(rows).iloc[:, [frame.columns.get_loc(name) for name in columns]].to_dict('records')
+    if index.risk_scores is not None:
+        for record, score in zip(records, index.risk_scores[rows]):
+            record['RiskScore'] = round(float(score), 4)
+    if sort not in columns and sort != 'RiskScore':
+        for record, value in zip(records, index.values[sort][rows]):
+            record[sort] = value.item()
     
-    departments = request.args.getlist('departments')
-    at_risk = request.args.get('atRisk', 'false').lower() == 'true'
+    return jsonify({
+        'employees': records,
+        'sort': sort,
+        'order': order,
+        'limit': limit,
+        'matched': int(mask.sum()),
+        'nextCursor': index.cursor_after(sort, rows[-1], order == 'desc') if has_more else None,
+        'datasetVersion': ds.version,
+    })
+
+# Largest simulation a request may ask for, and its default and maximum time budget (seconds);
+# async requests run as jobs and may ask for up to the job budget
+simulation_max_draws = int(os.getenv('SIMULATION_MAX_DRAWS', 20000))
+simulation_budget = float(os.getenv('SIMULATION_BUDGET_SECONDS', 5))
+simulation_job_budget = float(os.getenv('SIMULATION_JOB_BUDGET_SECONDS', 60))
+
+@app.route('/api/simulate', methods=['POST'])
+def simulate():
+    """Simulate attrition per department under what-if interventions"""
+    ds = current_dataset()
+    if ds.storage.name == 'streaming':
+        return jsonify({"error": "Needs every row in memory; not available with STORAGE_BACKEND=streaming"}), 409
+    
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    model_simulator = ds.simulator
+    
+    specs = data.get('interventions')
+    if not isinstance(specs, list) or not specs:
+        return jsonify({"error": "Expected a non-empty list of interventions"}), 400
+    try:
+        interventions = [Intervention.parse(spec, model_simulator.df, model_simulator.model) for spec in specs]
+        draws = int(data.get('draws', 2000))
+        budget = float(data.get('budgetSeconds', simulation_budget))
+        seed = data.get('seed')
+        seed = None if seed is None else int(seed)
+        if seed is not None and seed < 0:
+            raise ValueError("seed must be a non-negative integer")
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if not 1 <= draws <= simulation_max_draws:
+        return jsonify({"error": f"draws must be between 1 and {simulation_max_draws}"}), 400
+    
+    if wants_async(data):
+        # A job holds no request thread, so it may use the longer job budget
+        key = ('simulate', ds.name, ds.version, json.dumps(job_params(data), sort_keys=True))
+        return submit_job('simulation', run_simulation, model_simulator, interventions, draws, seed,
+                          min(max(budget, 0.1), simulation_job_budget), ds.version, key=key)
+    
+    try:
+        result = run_simulation(model_simulator, interventions, draws, seed,
+                                min(max(budget, 0.1), simulation_budget), ds.version)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+def run_simulation(model_simulator, interventions, draws, seed, budget, version):
+    """Run a what-if simulation, stopping early when its job is cancelled"""
+    job = current_job()
+    result = model_simulator.run(interventions, draws, seed, budget, simulation_workers(),
+                                 should_stop=None if job is None else (lambda: job.cancelled))
+    result['datasetVersion'] = version
+    return result
+
+# Rows per chunk of a streamed export
+export_chunk_rows = int(os.getenv('EXPORT_CHUNK_ROWS', 5000))
+
+@app.route('/api/export', methods=['GET'])
+def export_rows():
+    """Stream the rows matching the /api/filtered-data filters as CSV, NDJSON or Arrow"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in export.FORMATS:
+        return jsonify({"error": f"Unsupported format {fmt}; expected one of {', '.join(export.FORMATS)}"}), 400
+    if fmt == 'arrow' and not export.arrow_available():
+        return jsonify({"error": "Arrow export requires pyarrow to be installed"}), 400
+    ds = current_dataset()
+    if ds.storage.name == 'streaming':
+        return jsonify({"error": "Needs every row in memory; not available with STORAGE_BACKEND=streaming"}), 409
+    
+    # Keep streaming from this version even if the dataset is swapped mid-export
+    frame = ds.df
+    try:
+        columns = export.parse_columns(request.args, frame.columns.tolist())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    mask = filter_mask(frame, parse_filter_args(request.args))
+    mimetype, extension = export.FORMATS[fmt]
+    return Response(
+        export.stream_rows(frame, mask, columns, fmt, export_chunk_rows),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename=employees.{extension}',
+            'X-Export-Rows': str(int(mask.sum())),
+            'X-Dataset-Version': str(ds.version),
+        },
+    )
+
+@app.route('/api/survival', methods=['GET'])
+def survival():
+    """Return Kaplan-Meier tenure survival curves per cohort"""
+    cohorts = request.args.getlist('cohort') or DEFAULT_COHORTS
+    confidence = request.args.get('confidence', 0.95, type=float)
+    
+    if not 0 < confidence < 1:
+        return jsonify({"error": "confidence must be between 0 and 1"}), 400
+    
+    ds = current_dataset()
+    if ds.storage.name == 'streaming':
+        return jsonify({"error": "Needs every row in memory; not available with STORAGE_BACKEND=streaming"}), 409
+    
+    version = ds.version
+    tenure_df = ds.tenure_frame()
+    unknown = [cohort for cohort in cohorts if cohort != 'All' and cohort not in tenure_df.columns]
+    if unknown:
+        return jsonify({"error": f"Unknown cohort columns: {', '.join(unknown)}"}), 400
+    
+    survival_cache = ds.survival_cache
+    result = {'datasetVersion': version, 'timeUnit': 'years', 'cohorts': {}}
+    for cohort in cohorts:
+        key = (version, cohort, confidence)
+        if key not in survival_cache:
+            # Drop curves computed for older dataset versions
+            for stale in [k for k in survival_cache if k[0] != version]:
+                del survival_cache[stale]
+            try:
+                survival_cache[key] = survival_curves(tenure_df, None if cohort == 'All' else cohort, confidence)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        result['cohorts'][cohort] = survival_cache[key]
     
-    gender = request.args.get('gender', 'all')
-    education = request.args.get('education', 'all')
-    role_level = request.args.get('role', 'all')
+    return jsonify(result)
+
+@app.route('/api/managers/<int:manager_id>/team-stats', methods=['GET'])
+def manager_team_stats(manager_id):
+    """Return headcount, attrition and satisfaction for a manager's whole reporting subtree"""
+    ds = current_dataset()
+    if ds.storage.name == 'streaming':
+        return jsonify({"error": "Needs every row in memory; not available with STORAGE_BACKEND=streaming"}), 409
+    
+    hierarchy = ds.current_hierarchy()
+    if hierarchy is None:
+        return jsonify({"error": "Manager hierarchy is not available for this dataset"}), 404
+    
+    stats = hierarchy.team_stats(manager_id)
+    if stats is None:
+        return jsonify({"error": f"Employee {manager_id} not found"}), 404
+    
+    return jsonify(stats)
+
+@app.route('/api/managers/worst-teams', methods=['GET'])
+def worst_teams():
+    """Return the teams with the highest attrition rates"""
+    ds = current_dataset()
+    if ds.storage.name == 'streaming':
+        return jsonify({"error": "Needs every row in memory; not available with STORAGE_BACKEND=streaming"}), 409
     
-    # Filter the dataframe
-    filtered_df = df.copy()
+    hierarchy = ds.current_hierarchy()
+    if hierarchy is None:
+        return jsonify({"error": "Manager hierarchy is not available for this dataset"}), 404
     
-    # Apply tenure filter (YearsAtCompany)
-    filtered_df = filtered_df[(filtered_df['YearsAtCompany'] >= tenure_min) & 
-                             (filtered_df['YearsAtCompany'] <= tenure_max)]
+    k = request.args.get('k', 10, type=int)
+    min_team_size = request.args.get('minTeamSize', 5, type=int)
     
-    # Apply satisfaction filter
-    filtered_df = filtered_df[(filtered_df['JobSatisfaction'] >= satisfaction_min) & 
-                             (filtered_df['JobSatisfaction'] <= satisfaction_max)]
+    return jsonify({
+        'teams': hierarchy.worst_teams(k=k, min_team_size=min_team_size),
+        'minTeamSize': min_team_size
+    })
+
+def apply_appended_rows(kind, batch, ds=None):
+    """Fold a batch of appended rows into a dataset (the default one for the file tailer)"""
+    ds = ds or registry.get()
+    result, _ = ds.append_rows(kind, batch)
     
-    # Apply performance filter (using PerformanceRating)
-    filtered_df = filtered_df[(filtered_df['PerformanceRating'] >= performance_min) & 
-                             (filtered_df['PerformanceRating'] <= performance_max)]
+    print(f"Appended {kind} to {ds.name}: {result}")
+    return result
+
+@app.route('/api/append', methods=['POST'])
+def append_data():
+    """Append attrition events and monthly metric rows without reloading the dataset"""
+    data = request.json
     
-    # Apply department filter if specified
-    if departments:
-        filtered_df = filtered_df[filtered_df['Department'].isin(departments)]
+    if not data or not any(key in data for key in ('attrition_events', 'monthly_metrics')):
+        return jsonify({"error": "Expected attrition_events and/or monthly_metrics"}), 400
     
-    # Apply gender filter if not 'all'
-    if gender != 'all':
-        filtered_df = filtered_df[filtered_df['Gender'] == gender.capitalize()]
+    ds = current_dataset()
+    if ds.storage.name != 'pandas':
+        return jsonify({"error": "Appends apply to the in-process dataset; load the database with ingest.py"}), 409
     
-    # Apply education filter if not 'all'
-    if education != 'all':
-        education_mapping = {'highschool': 1, 'bachelors': 2, 'masters': 3, 'phd': 4}
-        if education in education_mapping:
-            filtered_df = filtered_df[filtered_df['Education'] == education_mapping[education]]
+    if app.config.get('WORKERS', 1) > 1:
+        return jsonify({"error": "Appends would only reach one worker; use APPEND_TAIL with serve.py"}), 409
     
-    # Apply role filter if not 'all'
-    if role_level != 'all':
-        role_mapping = {
-            'entrylevel': 1, 'midlevel': 2, 'seniorlevel': 3, 
-            'lead': 4, 'manager': 5, 'director': 6, 'vp': 7, 'executive': 8
-        }
-        if role_level in role_mapping:
-            filtered_df = filtered_df[filtered_df['JobLevel'] == role_mapping[role_level]]
-    
-    # Apply at-risk filter if enabled
-    if at_risk:
-        # Define at-risk criteria (example: low satisfaction + high overtime + low performance)
-        filtered_df = filtered_df[(filtered_df['JobSatisfaction'] <= 2) | 
-                                 (filtered_df['WorkLifeBalance'] <= 2) |
-                                 (filtered_df['OverTime'] == 'Yes')]
-    
-    # Calculate summary statistics
-    total_employees = len(filtered_df)
-    attrition_count = len(filtered_df[filtered_df['Attrition'] == 'Yes'])
-    retention_count = len(filtered_df[filtered_df['Attrition'] == 'No'])
-    attrition_rate = round((attrition_count / total_employees * 100), 2) if total_employees > 0 else 0
-    
-    # Calculate department-wise stats for filtered data
-    dept_stats = filtered_df.groupby('Department').size().to_dict()
-    dept_attrition = filtered_df[filtered_df['Attrition'] == 'Yes'].groupby('Department').size().to_dict()
-    
-    # Format department stats
-    dept_data = [
-        {
-            'name': dept,
-            'count': count,
-            'attrition': dept_attrition.get(dept, 0),
-            'rate': round((dept_attrition.get(dept, 0) / count * 100), 2) if count > 0 else 0
-        }
-        for dept, count in dept_stats.items()
-    ]
+    result = {}
+    if data.get('attrition_events'):
+        events = pd.DataFrame(data['attrition_events'])
+        if 'employee_id' not in events.columns:
+            return jsonify({"error": "attrition_events rows need an employee_id"}), 400
+        result['attritionEvents'] = apply_appended_rows('attrition_events', events, ds)
     
-    result = {
-        'totalEmployees': int(total_employees),
-        'attritionCount': int(attrition_count),
-        'retentionCount': int(retention_count),
-        'attritionRate': float(attrition_rate),
-        'filteredData': True,
-        'departmentStats': dept_data
-    }
+    if data.get('monthly_metrics'):
+        metrics = pd.DataFrame(data['monthly_metrics'])
+        if 'month' not in metrics.columns:
+            return jsonify({"error": "monthly_metrics rows need a month"}), 400
+        result['monthlyMetrics'] = apply_appended_rows('monthly_metrics', metrics, ds)
     
+    result['datasetVersion'] = ds.version
+    return jsonify(result)
+
+@app.route('/api/monthly-trends', methods=['GET'])
+def monthly_trends():
+    """Return monthly workforce metrics and exits"""
+    ds = current_dataset()
+    result = ds.aggregates.monthly_trends()
+    result['datasetVersion'] = ds.version
     return jsonify(result)
 
 @app.route('/api/chat', methods=['POST'])
@@ -330,55 +574,112 @@ def chat():
         return jsonify({"error": "Missing message parameter"}), 400
     
     message = data['message']
+    chatbot = current_dataset().chatbot
+    
+    if wants_async(data):
+        # Turns share the conversation history, so identical messages are not merged
+        return submit_job('chat', chatbot.process_query, message)
     
     # Process the query using the chatbot
     response = chatbot.process_query(message)
     
     return jsonify(response)
 
+# Most questions one batch may hold, and the most answered at once per batch
+chat_batch_max_questions = int(os.getenv('CHAT_BATCH_MAX_QUESTIONS', 500))
+chat_batch_concurrency = int(os.getenv('CHAT_BATCH_CONCURRENCY', 8))
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer independent questions concurrently, streaming each answer as an NDJSON line"""
+    data = request.json or {}
+    
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions or \
+            not all(isinstance(question, str) and question.strip() for question in questions):
+        return jsonify({"error": "Expected a non-empty list of question strings"}), 400
+    if len(questions) > chat_batch_max_questions:
+        return jsonify({"error": f"At most {chat_batch_max_questions} questions per batch"}), 400
+    try:
+        concurrency = min(max(int(data.get('concurrency', chat_batch_concurrency)), 1), chat_batch_concurrency)
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency must be an integer"}), 400
+    
+    chatbot = current_dataset().chatbot
+    
+    def stream():
+        started = time.perf_counter()
+        answered = 0
+        for answer in answer_batch(chatbot, questions, concurrency):
+            answered += 1
+            yield app.json.dumps(answer) + '\n'
+        yield app.json.dumps({'done': True, 'questions': len(questions), 'answered': answered,
+                              'seconds': round(time.perf_counter() - started, 3)}) + '\n'
+    
+    return Response(stream(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
 @app.route('/api/chat/reset', methods=['POST'])
 def reset_chat():
     """Reset the chat conversation history."""
-    chatbot.clear_conversation()
+    current_dataset().chatbot.clear_conversation()
     return jsonify({"status": "success", "message": "Chat conversation reset"})
 
+@app.route('/api/datasets', methods=['GET'])
+def list_datasets():
+    """List the datasets that can be selected with ?dataset= and which of them are loaded"""
+    return jsonify({
+        'default': registry.default,
+        'datasets': registry.describe(),
+        'memoryBudgetBytes': registry.budget_bytes,
+        'residentBytes': sum(ds.memory_bytes for ds in registry.resident()),
+    })
+
 @app.route('/api/dataset-metadata', methods=['GET'])
 def dataset_metadata():
     """Return metadata about the loaded dataset"""
+    # Answered from the column sketches, so the cost doesn't depend on the number of rows
+    ds = current_dataset()
+    sketches = ds.aggregates.sketches
+    numeric_columns = sketches.numeric_columns()
+    categorical_columns = sketches.categorical_columns()
     result = {
-        'name': os.path.basename(dataset_path),
-        'rows': len(df),
-        'columns': len(df.columns),
-        'column_list': df.columns.tolist(),
-        'numeric_columns': df.select_dtypes(include=['number']).columns.tolist(),
-        'categorical_columns': df.select_dtypes(include=['object']).columns.tolist(),
-        'last_updated': os.path.getmtime(dataset_path),
+        'dataset': ds.name,
+        'name': os.path.basename(ds.path),
+        'rows': sketches.rows,
+        'columns': len(sketches.columns),
+        'column_list': list(sketches.columns),
+        'numeric_columns': numeric_columns,
+        'categorical_columns': categorical_columns,
+        'last_updated': os.path.getmtime(ds.path),
     }
     
     # Get sample values for categorical columns (limited to top 5)
     categorical_preview = {}
-    for col in df.select_dtypes(include=['object']).columns[:5]:
-        categorical_preview[col] = df[col].value_counts().head(5).to_dict()
+    for col in categorical_columns[:5]:
+        categorical_preview[col] = sketches.top_values(col, 5)
     
-    # Get basic stats for numeric columns
+    # Get basic stats for numeric columns (the median is approximate for high-cardinality columns)
     numeric_preview = {}
-    for col in df.select_dtypes(include=['number']).columns[:5]:
+    for col in numeric_columns[:5]:
+        sketch = sketches.columns[col]
         numeric_preview[col] = {
-            'min': float(df[col].min()),
-            'max': float(df[col].max()),
-            'mean': float(df[col].mean()),
-            'median': float(df[col].median())
+            'min': sketch.min,
+            'max': sketch.max,
+            'mean': sketch.mean,
+            'median': sketch.quantile(0.5)
         }
         
     result['categorical_preview'] = categorical_preview
     result['numeric_preview'] = numeric_preview
+    result['distinct_values'] = {col: sketch.distinct_count() for col, sketch in sketches.columns.items()}
     
     # Evaluate data quality
-    missing_values = df.isnull().sum().sum()
+    missing_values = sketches.missing_values()
+    total_cells = sketches.rows * len(sketches.columns)
     result['quality'] = {
-        'rating': 'Good' if missing_values == 0 else 'Fair' if missing_values < len(df) * 0.05 else 'Poor',
+        'rating': 'Good' if missing_values == 0 else 'Fair' if missing_values < sketches.rows * 0.05 else 'Poor',
         'missing_values': int(missing_values),
-        'missing_percentage': float(missing_values / (len(df) * len(df.columns)) * 100)
+        'missing_percentage': float(missing_values / total_cells * 100) if total_cells else 0.0
     }
     
     return jsonify(result)
@@ -386,13 +687,16 @@ def dataset_metadata():
 @app.route('/api/quick-insights', methods=['GET'])
 def quick_insights():
     """Return quick insights about the dataset for the sidebar"""
+    # From the counters and column sketches, which cover every row in streaming mode too
+    aggregates = current_dataset().aggregates
+    sketches = aggregates.sketches
     insights = {
-        'attrition_rate': float(len(df[df['Attrition'] == 'Yes']) / len(df) * 100),
-        'avg_satisfaction': float(df['JobSatisfaction'].mean()),
-        'avg_years': float(df['YearsAtCompany'].mean()),
-        'avg_age': float(df['Age'].mean()),
-        'top_department': df['Department'].value_counts().index[0],
-        'overtime_percentage': float(len(df[df['OverTime'] == 'Yes']) / len(df) * 100)
+        'attrition_rate': float(aggregates.attrition_count / aggregates.total * 100),
+        'avg_satisfaction': float(sketches.columns['JobSatisfaction'].mean),
+        'avg_years': float(sketches.columns['YearsAtCompany'].mean),
+        'avg_age': float(sketches.columns['Age'].mean),
+        'top_department': next(iter(sketches.top_values('Department', 1))),
+        'overtime_percentage': float(sketches.columns['OverTime'].values.counts.get('Yes', 0) / sketches.rows * 100)
     }
     
     return jsonify(insights)
@@ -414,25 +718,145 @@ def debug_plot():
     if not plot_type or not x_column:
         return jsonify({"error": "Missing required parameters"}), 400
     
-    # Try to generate the plot
-    plot_image = chatbot.generate_plot(
-        plot_type=plot_type,
-        x_column=x_column,
-        y_column=y_column,
-        title=title,
-        hue=hue
-    )
+    ds = current_dataset()
+    params = {'plot_type': plot_type, 'x_column': x_column, 'y_column': y_column, 'title': title, 'hue': hue}
+    if wants_async(data):
+        key = ('debug-plot', ds.name, ds.version, json.dumps(params, sort_keys=True))
+        if scheduler.classes['plot'].processes:
+            # A worker process has none of the data: it attaches the shared segment when the rows are
+            # the published ones, otherwise the job carries the columns the plot reads
+            if ds.name == registry.default and ds.version == shared_frame_version:
+                return submit_job('plot', render_shared_plot, shared_manifest_path, shared_dataset.version, params,
+                                  key=key)
+            frame = ds.chatbot.dataframe
+            return submit_job('plot', render_plot_of, frame[plot_columns(frame, params)], params, key=key)
+        return submit_job('plot', render_plot, ds.name, params, key=key)
     
-    if not plot_image:
+    # Try to generate the plot
+    try:
+        return jsonify(render_plot(ds.name, params))
+    except RuntimeError as e:
         return jsonify({
             "status": "error", 
-            "message": "Failed to generate plot"
+            "message": str(e)
         }), 500
-    
+
+def render_plot(dataset_name, params):
+    """Render a plot with a dataset's chatbot; plot jobs on threads call this too"""
+    return plot_response(registry.get(dataset_name).chatbot.generate_plot(**params))
+
+# Request options that choose how a request runs rather than what it computes
+JOB_OPTIONS = ('async', 'priority')
+
+def wants_async(data=None):
+    """Whether the request asks to run as a background job (?async=true or "async": true)"""
+    value = request.args.get('async', (data or {}).get('async', False))
+    return str(value).lower() in ('true', '1')
+
+def job_params(data):
+    """The request body without the job options, for deduplication keys"""
+    return {key: value for key, value in data.items() if key not in JOB_OPTIONS}
+
+def submit_job(kind, fn, *args, key=None):
+    """Queue fn(*args) as a background job and answer 202 with its status"""
+    data = request.get_json(silent=True) or {}
+    try:
+        priority = int(request.args.get('priority', data.get('priority', 5)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "priority must be an integer (lower runs first)"}), 400
+    
+    job, created = scheduler.submit(kind, fn, *args, key=key, priority=priority)
+    status = job.to_dict()
+    status['deduplicated'] = not created
+    status['links'] = {'status': f'/api/jobs/{job.id}', 'events': f'/api/jobs/{job.id}/events'}
+    return jsonify(status), 202, {'Location': f'/api/jobs/{job.id}'}
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return a background job's status, with its result once it has succeeded"""
+    job = scheduler.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}; finished jobs are kept for {scheduler.ttl:g}s"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running background job"""
+    job = scheduler.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a background job's status changes as server-sent events until it finishes"""
+    job = scheduler.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    
+    def stream():
+        revision = -1
+        while True:
+            current, status = job.snapshot()
+            if current == revision:
+                # Keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+            else:
+                revision = current
+                yield f"event: {status['status']}\ndata: {app.json.dumps(status)}\n\n"
+                if job.done:
+                    return
+            job.wait(revision, job_heartbeat)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness check: the default dataset and its derived structures are loaded"""
+    ds = registry.get()
     return jsonify({
-        "status": "success",
-        "plot_image": plot_image
+        "status": "ok",
+        "pid": os.getpid(),
+        "dataset": ds.name,
+        "rows": len(ds.df),
+        "datasetVersion": ds.version,
+        "sharedDatasetVersion": shared_dataset.version if shared_dataset is not None else None,
+        "storage": ds.storage.name,
+        "residentDatasets": len(registry.resident())
     })
 
+# File-tail mode: follow the HRIS CSVs and apply rows as they are appended
+tailer = None
+if os.getenv('APPEND_TAIL', 'false').lower() == 'true':
+    tail_sources = {'attrition_events': attrition_events_path, 'monthly_metrics': monthly_metrics_path}
+    if streaming:
+        # Exits move employees between counters, which needs the per-row state streaming doesn't keep
+        del tail_sources['attrition_events']
+    tailer = FileTailer(
+        tail_sources,
+        apply_appended_rows,
+        interval=float(os.getenv('APPEND_TAIL_INTERVAL', 5))
+    )
+    tailer.start()
+
+def before_fork():
+    """Quiesce background threads before serve.py forks workers"""
+    # Finish warming up so workers inherit the imported plotting stack and the filled caches
+    if warmup_thread is not None:
+        warmup_thread.join()
+    if prewarm_thread is not None:
+        prewarm_thread.join()
+    if tailer is not None:
+        tailer.stop()
+
+def after_fork():
+    """Restart per-process resources in a forked worker (threads don't survive fork)"""
+    ds = registry.get()
+    if ds.storage.name == 'sql':
+        ds.storage = create_backend(ds.df, ds.aggregates)
+    if tailer is not None:
+        tailer.start()
+
 if __name__ == '__main__':
     app.run(debug=True, port=8000,host="0.0.0.0")
@@ -0,0 +1,164 @@
+"""
+Association of each column with attrition, ranked on one scale.
+
+Numeric columns are scored by |r|, the absolute Pearson correlation with the
+0/1 attrition indicator, read from the maintained correlation matrix.
+Categorical columns are scored by Cramér's V of their contingency table
+against Attrition. For a two-level column V equals |phi|, which is |r| of its
+0/1 indicator, so both kinds rank together. A Yes/No column is scored as a
+category in place of its <column>_Binary indicator. Categorical columns also
+get the mutual information (in bits) between them and attrition.
+
+Category values are factorized to integer codes once per dataset, since
+appends only change Attrition. Each contingency table is then a single
+bincount of code * 2 + attrition over the selected rows. A dataset read in
+chunks (streaming mode) adds up each chunk's tables instead.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from correlation import INDICATOR_SUFFIX
+
+TARGET = 'Attrition'
+# Columns that identify rows or are constant by construction
+EXCLUDED_COLUMNS = ('EmployeeNumber', 'StandardHours', 'EmployeeCount', 'Over18')
+# String columns with more distinct values than this are identifiers, not categories
+MAX_LEVELS = 64
+
+
+class CategoryCodes:
+    """Integer codes (-1 where missing) and level names of the categorical columns of a frame."""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.codes: Dict[str, np.ndarray] = {}
+        self.levels: Dict[str, List[str]] = {}
+        for name in frame.columns:
+            if name == TARGET or name in EXCLUDED_COLUMNS or frame[name].dtype.kind not in 'OSU':
+                continue
+            codes, levels = pd.factorize(frame[name], sort=True)
+            if 2 <= len(levels) <= MAX_LEVELS:
+                self.codes[name] = codes.astype(np.int16 if len(levels) > 127 else np.int8)
+                self.levels[name] = [str(level) for level in levels]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.codes)
+
+    def nbytes(self) -> int:
+        return sum(codes.nbytes for codes in self.codes.values())
+
+
+class CategoryTables:
+    """
+    Contingency tables of the categorical columns against attrition, added up chunk by chunk.
+
+    Columns are picked as CategoryCodes picks them, from their values over every
+    chunk; a column is dropped for good once it has more than MAX_LEVELS values.
+    """
+
+    def __init__(self):
+        # Column -> counts indexed by value, columns 0 (No) and 1 (Yes); None once dropped
+        self.counts: Dict[str, Optional[pd.DataFrame]] = {}
+
+    def update(self, chunk: pd.DataFrame):
+        target = attrition_codes(chunk)
+        for name in chunk.columns:
+            if name == TARGET or name in EXCLUDED_COLUMNS or chunk[name].dtype.kind not in 'OSU':
+                continue
+            previous = self.counts.get(name, 0)
+            if previous is None:
+                continue
+            codes, levels = pd.factorize(chunk[name])
+            if len(levels) > MAX_LEVELS:
+                self.counts[name] = None
+                continue
+            counts = pd.DataFrame(contingency_table(codes, len(levels), target), index=levels, columns=[0, 1])
+            if isinstance(previous, pd.DataFrame):
+                counts = previous.add(counts, fill_value=0)
+            self.counts[name] = counts if len(counts) <= MAX_LEVELS else None
+
+    def tables(self) -> Dict[str, np.ndarray]:
+        """levels x 2 table of every column with 2 to MAX_LEVELS values."""
+        return {name: counts.to_numpy() for name, counts in self.counts.items()
+                if counts is not None and len(counts) >= 2}
+
+
+def attrition_codes(frame: pd.DataFrame) -> np.ndarray:
+    """1 where Attrition is Yes, 0 where No, -1 otherwise."""
+    values = frame[TARGET].to_numpy()
+    return np.where(values == 'Yes', 1, np.where(values == 'No', 0, -1)).astype(np.int8)
+
+
+def contingency_table(codes: np.ndarray, levels: int, target: np.ndarray) -> np.ndarray:
+    """levels x 2 counts of (code, attrition) over the rows where both are present."""
+    present = (codes >= 0) & (target >= 0)
+    cells = codes[present].astype(np.intp) * 2 + target[present]
+    return np.bincount(cells, minlength=levels * 2).reshape(levels, 2).astype(float)
+
+
+def cramers_v(table: np.ndarray) -> float:
+    """Cramér's V of a contingency table; NaN when a side has fewer than two observed values."""
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    if min(table.shape) < 2:
+        return float('nan')
+    n = table.sum()
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0))
+    # chi² = n (Σ O² / (row total * column total) - 1)
+    chi2 = n * ((table ** 2 / expected).sum() - 1)
+    return float(np.sqrt(max(chi2, 0.0) / (n * (min(table.shape) - 1))))
+
+
+def mutual_information(table: np.ndarray) -> float:
+    """Mutual information, in bits, between the row and column variables of a contingency table."""
+    n = table.sum()
+    if n == 0:
+        return float('nan')
+    joint = table / n
+    independent = np.outer(joint.sum(axis=1), joint.sum(axis=0))
+    observed = joint > 0
+    return float((joint[observed] * np.log2(joint[observed] / independent[observed])).sum())
+
+
+def rank_factors(correlations: pd.Series, categories: CategoryCodes, target: np.ndarray,
+                 rows: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Every scoreable column with its score, strongest first.
+
+    `correlations` is the attrition column of the correlation matrix for the
+    selected rows; `rows` selects the same rows (a boolean mask) for the
+    categorical columns, every row when None.
+
+    Columns constant within the selected rows are left out. A Yes/No column
+    with two levels in the whole frame stays a category (its indicator is
+    skipped) even where the rows hold one level; V is then NaN, as |r| of the
+    indicator would be, so the column is dropped rather than scored twice.
+    """
+    if rows is not None:
+        target = target[rows]
+    tables = {}
+    for name in categories.columns:
+        codes = categories.codes[name] if rows is None else categories.codes[name][rows]
+        tables[name] = contingency_table(codes, len(categories.levels[name]), target)
+    return rank_tables(correlations, tables)
+
+
+def rank_tables(correlations: pd.Series, tables: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """rank_factors with the categorical columns' contingency tables already counted."""
+    factors = []
+    for name, table in tables.items():
+        factors.append({'factor': name, 'kind': 'categorical', 'measure': 'cramers_v',
+                        'importance': cramers_v(table), 'mutualInformation': mutual_information(table)})
+
+    # Yes/No indicators of scored categories would repeat them; the attrition indicator is the target itself
+    skipped = {TARGET + INDICATOR_SUFFIX, *EXCLUDED_COLUMNS, *(name + INDICATOR_SUFFIX for name in tables)}
+    for name, r in correlations.items():
+        if name not in skipped:
+            factors.append({'factor': name, 'kind': 'numeric', 'measure': 'abs_r',
+                            'importance': abs(float(r)), 'mutualInformation': None})
+
+    # Columns without a defined score (constant within the rows) are left out
+    factors = [factor for factor in factors if not np.isnan(factor['importance'])]
+    factors.sort(key=lambda factor: factor['importance'], reverse=True)
+    return factors
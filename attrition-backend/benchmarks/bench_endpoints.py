@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+"""
+Endpoint benchmark suite.
+
+Drives every app.py route and HRAnalyticsChatbot.generate_plot through the
+Flask test client against generated datasets, recording p50/p95 latency,
+peak RSS and allocations per endpoint. Each dataset size runs in a fresh
+subprocess so startup cost and memory are measured independently.
+
+    python benchmarks/bench_endpoints.py --rows 1000 100000
+    python benchmarks/bench_endpoints.py --compare results/old.json results/new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+DEFAULT_SIZES = [1000, 100000, 1000000, 5000000]
+# Fewer timed iterations as the datasets grow
+DEFAULT_ITERATIONS = {1000: 30, 100000: 10, 1000000: 5, 5000000: 3}
+
+# Request cases per Flask endpoint: (case name, method, path, JSON body)
+ROUTE_CASES = {
+    'attrition_by_age': [('attrition-by-age', 'GET', '/api/attrition-by-age', None)],
+    'attrition_by_gender': [('attrition-by-gender', 'GET', '/api/attrition-by-gender', None)],
+    'attrition_by_department': [('attrition-by-department', 'GET', '/api/attrition-by-department', None)],
+    'attrition_by_education': [('attrition-by-education', 'GET', '/api/attrition-by-education', None)],
+    'attrition_by_job_satisfaction': [
+        ('attrition-by-job-satisfaction', 'GET', '/api/attrition-by-job-satisfaction', None)],
+    'attrition_by_salary': [('attrition-by-salary', 'GET', '/api/attrition-by-salary', None)],
+    'overall_statistics': [('overall-statistics', 'GET', '/api/overall-statistics', None)],
+    'factors_correlation': [('factors-correlation', 'GET', '/api/factors-correlation', None)],
+    'predictive_factors': [
+        ('predictive-factors[all]', 'GET', '/api/predictive-factors', None),
+        ('predictive-factors[sales,female]', 'GET', '/api/predictive-factors?departments=Sales&gender=Female', None),
+    ],
+    'correlation_matrix': [
+        ('correlation-matrix[all]', 'GET', '/api/correlation-matrix', None),
+        ('correlation-matrix[sales,columns]', 'GET',
+         '/api/correlation-matrix?departments=Sales&column=Age&column=MonthlyIncome&column=Attrition_Binary', None),
+    ],
+    'employee_count': [('employee-count', 'GET', '/api/employee-count', None)],
+    'filtered_data': [
+        ('filtered-data[default]', 'GET', '/api/filtered-data', None),
+        ('filtered-data[sales,at-risk]', 'GET',
+         '/api/filtered-data?departments=Sales&atRisk=true&gender=female', None),
+        ('filtered-data[ranges,role]', 'GET',
+         '/api/filtered-data?tenureMin=2&tenureMax=10&satisfactionMin=2&role=midlevel&education=masters', None),
+    ],
+    'employees': [
+        ('employees[risk,desc]', 'GET', '/api/employees?sort=RiskScore&order=desc', None),
+        ('employees[satisfaction,sales,at-risk]', 'GET',
+         '/api/employees?sort=JobSatisfaction&departments=Sales&atRisk=true&limit=100', None),
+    ],
+    'export_rows': [
+        ('export[csv,all]', 'GET', '/api/export', None),
+        ('export[ndjson,sales,columns]', 'GET',
+         '/api/export?format=ndjson&departments=Sales&columns=EmployeeNumber,Age,MonthlyIncome,Attrition', None),
+    ],
+    'survival': [
+        ('survival[default]', 'GET', '/api/survival', None),
+        ('survival[all]', 'GET', '/api/survival?cohort=All', None),
+    ],
+    'manager_team_stats': [('manager-team-stats', 'GET', '/api/managers/{manager_id}/team-stats', None)],
+    'worst_teams': [('worst-teams', 'GET', '/api/managers/worst-teams?k=10&minTeamSize=5', None)],
+    'monthly_trends': [('monthly-trends', 'GET', '/api/monthly-trends', None)],
+    'dataset_metadata': [('dataset-metadata', 'GET', '/api/dataset-metadata', None)],
+    'quick_insights': [('quick-insights', 'GET', '/api/quick-insights', None)],
+    'list_datasets': [('datasets', 'GET', '/api/datasets', None)],
+    'metrics': [('metrics', 'GET', '/metrics', None)],
+    'healthz': [('healthz', 'GET', '/healthz', None)],
+    'reset_chat': [('chat-reset', 'POST', '/api/chat/reset', {})],
+    'simulate': [
+        ('simulate[sales-overtime]', 'POST', '/api/simulate',
+         {'interventions': [{'where': {'Department': ['Sales']}, 'set': {'OverTime': 'No'}, 'fraction': 0.5}],
+          'draws': 2000, 'seed': 1}),
+        # Submitting only; the job runs on the simulation pool
+        ('simulate[sales-overtime,async]', 'POST', '/api/simulate',
+         {'interventions': [{'where': {'Department': ['Sales']}, 'set': {'OverTime': 'No'}, 'fraction': 0.5}],
+          'draws': 2000, 'seed': 1, 'async': True}),
+    ],
+    'debug_plot': [
+        ('debug-plot[bar-rate]', 'POST', '/api/debug-plot',
+         {'type': 'bar', 'x_column': 'Department', 'y_column': 'Attrition Rate', 'title': 'Attrition Rate'}),
+    ],
+    # Mutates the dataset, so it runs last
+    'append_data': [
+        ('append[events]', 'POST', '/api/append',
+         {'attrition_events': [{'employee_id': i, 'exit_date': '2025-07-01'} for i in range(1, 101)]}),
+    ],
+}
+
+# Endpoints that cannot run offline
+SKIPPED_ROUTES = {
+    'static': 'static files',
+    'chat': 'requires the LLM API',
+    'chat_batch': 'requires the LLM API',
+    'list_profiles': 'requires PROFILE_SECRET',
+    'get_profile': 'requires PROFILE_SECRET',
+    'job_status': 'needs a job id from an async request',
+    'cancel_job': 'needs a job id from an async request',
+    'job_events': 'needs a job id from an async request',
+}
+
+# Direct HRAnalyticsChatbot.generate_plot cases
+PLOT_CASES = [
+    ('plot[histogram-age]', {'plot_type': 'histogram', 'x_column': 'Age'}),
+    ('plot[bar-count-department]', {'plot_type': 'bar', 'x_column': 'Department'}),
+    ('plot[bar-rate-department]', {'plot_type': 'bar', 'x_column': 'Department', 'y_column': 'Attrition Rate'}),
+    ('plot[bar-rate-age-group]', {'plot_type': 'bar', 'x_column': 'Age Group', 'y_column': 'Attrition Rate'}),
+    ('plot[box-income-department]', {'plot_type': 'box', 'x_column': 'Department', 'y_column': 'MonthlyIncome'}),
+    ('plot[pie-department]', {'plot_type': 'pie', 'x_column': 'Department'}),
+    ('plot[heatmap]', {'plot_type': 'heatmap', 'x_column': 'Age'}),
+]
+
+
+class RSSSampler:
+    """Track peak resident set size while a block of work runs."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            # ru_maxrss is in kilobytes on Linux, bytes on macOS
+            scale = 1 if sys.platform == 'darwin' else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def drain(response) -> int:
+    response.get_data()
+    return response.status_code
+
+
+def measure(call, iterations: int) -> Dict[str, Any]:
+    """Time `call` and record memory; `call` returns an HTTP-like status code."""
+    status = call()  # warm-up
+
+    timings = []
+    rss_before = RSSSampler.current()
+    with RSSSampler() as sampler:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+
+    # One extra traced call for allocation figures (tracing slows it down)
+    tracemalloc.start()
+    call()
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+
+    return {
+        'status': status,
+        'iterations': iterations,
+        'p50_ms': round(float(np.percentile(timings, 50)), 3),
+        'p95_ms': round(float(np.percentile(timings, 95)), 3),
+        'mean_ms': round(float(np.mean(timings)), 3),
+        'peak_rss_mb': round(sampler.peak / 2 ** 20, 1),
+        'rss_growth_mb': round((sampler.peak - rss_before) / 2 ** 20, 1),
+        'alloc_peak_kb': round(peak / 1024, 1),
+        'alloc_retained_kb': round(current / 1024, 1),
+        'alloc_retained_blocks': blocks,
+    }
+
+
+def run_worker(rows: int, iterations: int, output: str, only: Optional[List[str]] = None):
+    """Benchmark one dataset size in this process and write the results to `output`."""
+    sys.path.insert(0, BENCH_DIR)
+    from generate_dataset import generate
+
+    paths = generate(rows)
+    os.environ['DATASET_PATH'] = paths['dataset']
+    os.environ['EMPLOYEES_PATH'] = paths['employees']
+    # The monthly history is only generated for the real dataset
+    os.environ['MONTHLY_METRICS_PATH'] = ''
+    os.environ['ATTRITION_EVENTS_PATH'] = ''
+    os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    started = time.perf_counter()
+    import app as app_module
+    startup = time.perf_counter() - started
+    startup_rss = RSSSampler.current()
+
+    client = app_module.app.test_client()
+    dataset = app_module.registry.get()
+    manager_id = int(dataset.df['EmployeeNumber'].iloc[0])
+    if dataset.hierarchy is not None:
+        manager_id = int(dataset.hierarchy.employee_ids[int(np.argmax(dataset.hierarchy.size))])
+
+    def selected(name: str) -> bool:
+        return not only or any(pattern in name for pattern in only)
+
+    results = []
+    endpoints = {rule.endpoint for rule in app_module.app.url_map.iter_rules()}
+    ordered = [name for name in ROUTE_CASES if name in endpoints]
+    for endpoint in sorted(endpoints - set(ROUTE_CASES)):
+        if endpoint not in SKIPPED_ROUTES:
+            print(f"  warning: no benchmark case for endpoint '{endpoint}'")
+        else:
+            results.append({'name': endpoint, 'skipped': SKIPPED_ROUTES[endpoint]})
+
+    # generate_plot first, before the append case changes the data
+    chatbot = dataset.chatbot
+    for name, kwargs in PLOT_CASES:
+        if not selected(name):
+            continue
+        result = measure(lambda: 200 if chatbot.generate_plot(**kwargs) else 500, iterations)
+        results.append({'name': name, 'method': 'generate_plot', 'path': None, **result})
+        print(f"  {name}: p50 {result['p50_ms']}ms p95 {result['p95_ms']}ms")
+
+    for endpoint in ordered:
+        for name, method, path, body in ROUTE_CASES[endpoint]:
+            if not selected(name):
+                continue
+            path = path.format(manager_id=manager_id)
+            # Read the body so streamed responses are timed in full
+            if method == 'GET':
+                call = lambda: drain(client.get(path))
+            else:
+                call = lambda: drain(client.post(path, json=body))
+            result = measure(call, iterations)
+            results.append({'name': name, 'method': method, 'path': path, **result})
+            print(f"  {name}: p50 {result['p50_ms']}ms p95 {result['p95_ms']}ms "
+                  f"peak RSS {result['peak_rss_mb']}MB status {result['status']}")
+
+    with open(output, 'w') as f:
+        json.dump({
+            'rows': rows,
+            'startup_seconds': round(startup, 3),
+            'startup_rss_mb': round(startup_rss / 2 ** 20, 1),
+            'results': results,
+        }, f)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes: List[int], iterations: Optional[int], output: Optional[str],
+              only: Optional[List[str]] = None) -> str:
+    """Run every size in its own subprocess and write the combined results file."""
+    import pandas as pd
+
+    commit = git_commit()
+    runs = []
+    for rows in sizes:
+        print(f"Benchmarking {rows} rows")
+        count = iterations or DEFAULT_ITERATIONS.get(rows, 5)
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+            worker_output = tmp.name
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--rows', str(rows),
+                   '--iterations', str(count), '--output', worker_output]
+        if only:
+            command += ['--only', *only]
+        subprocess.run(command, check=True)
+        with open(worker_output) as f:
+            runs.append(json.load(f))
+        os.unlink(worker_output)
+
+    results = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'runs': runs,
+    }
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{stamp}-{commit or "nogit"}.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return output
+
+
+def compare(baseline_path: str, candidate_path: str, threshold: float) -> bool:
+    """Print p50/p95 changes between two result files; return True if nothing regressed."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+
+    def index(results):
+        return {
+            (run['rows'], entry['name']): entry
+            for run in results['runs'] for entry in run['results'] if 'p50_ms' in entry
+        }
+
+    before, after = index(baseline), index(candidate)
+    regressions = 0
+    print(f"{'rows':>9}  {'case':<40} {'p50 before':>11} {'p50 after':>10} {'change':>8}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key]['p50_ms'], after[key]['p50_ms']
+        change = (new - old) / old * 100 if old > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{key[0]:>9}  {key[1]:<40} {old:>11.3f} {new:>10.3f} {change:>7.1f}%{flag}")
+
+    print(f"{regressions} regression(s) above {threshold}%")
+    return regressions == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the attrition API endpoints")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SIZES, help="Dataset sizes")
+    parser.add_argument('--iterations', type=int, help="Timed iterations per case (default depends on size)")
+    parser.add_argument('--only', nargs='+', help="Only run cases whose name contains one of these strings")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help="Compare two results files instead of running")
+    parser.add_argument('--threshold', type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(0 if compare(args.compare[0], args.compare[1], args.threshold) else 1)
+    if args.worker:
+        run_worker(args.rows[0], args.iterations, args.output, args.only)
+    else:
+        run_suite(args.rows, args.iterations, args.output, args.only)
+
+
+if __name__ == '__main__':
+    main()
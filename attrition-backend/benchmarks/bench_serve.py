@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Per-worker memory of the preforked server.
+
+Starts serve.py with each worker count against a generated dataset, sends
+every read-only endpoint a few rounds of traffic so each worker touches the
+data it serves, then reads /proc/<pid>/smaps_rollup for the master and each
+worker. PSS divides shared pages between the processes mapping them, so the
+sum of PSS is the real footprint; N x the master's RSS is what N independently
+loaded processes would cost. --shared serves the dataset columns from a
+shared memory segment (SHARED_DATASET_MANIFEST) instead of the forked heap.
+
+    python benchmarks/bench_serve.py --rows 100000 --workers 4 8 16
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from bench_endpoints import ROUTE_CASES  # noqa: E402
+from generate_dataset import generate  # noqa: E402
+from serve import memory_rollup  # noqa: E402
+
+
+def warm_paths() -> List[str]:
+    return [path for cases in ROUTE_CASES.values() for _, method, path, _ in cases
+            if method == 'GET' and '{' not in path]
+
+
+def fetch(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=300) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def measure_workers(rows: int, workers: int, threads: int, rounds: int, shared: bool = False) -> Dict[str, Any]:
+    paths = generate(rows)
+    env = dict(os.environ, DATASET_PATH=paths['dataset'], EMPLOYEES_PATH=paths['employees'],
+               MONTHLY_METRICS_PATH='', ATTRITION_EVENTS_PATH='')
+    env.setdefault('GROQ_API_KEY', 'benchmark')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if shared:
+            env['SHARED_DATASET_MANIFEST'] = os.path.join(tmp, 'dataset.json')
+        ready_file = os.path.join(tmp, 'ready.json')
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, 'serve.py'), '--workers', str(workers),
+             '--threads', str(threads), '--port', '0', '--host', '127.0.0.1', '--ready-file', ready_file],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            started = time.perf_counter()
+            while not os.path.exists(ready_file) or os.path.getsize(ready_file) == 0:
+                if process.poll() is not None:
+                    raise RuntimeError(f"serve.py exited with {process.returncode}")
+                time.sleep(0.2)
+            ready_seconds = time.perf_counter() - started
+            with open(ready_file) as f:
+                ready = json.load(f)
+
+            idle = [memory_rollup(pid) for pid in ready['workers']]
+
+            base = f"http://127.0.0.1:{ready['port']}"
+            urls = [base + path for path in warm_paths()] * rounds * workers
+            with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+                statuses = list(pool.map(fetch, urls))
+
+            master = memory_rollup(ready['master'])
+            per_worker = [memory_rollup(pid) for pid in ready['workers']]
+        finally:
+            process.terminate()
+            process.wait()
+
+    def average(key: str, rollups=per_worker) -> float:
+        return sum(m.get(key, 0) for m in rollups) / len(rollups) / 1024
+
+    total_pss = (master.get('Pss', 0) + sum(m.get('Pss', 0) for m in per_worker)) / 1024
+    return {
+        'rows': rows,
+        'workers': workers,
+        'shared_dataset': shared,
+        'threads': threads,
+        'ready_seconds': round(ready_seconds, 1),
+        'requests': len(statuses),
+        'errors': sum(status >= 500 for status in statuses),
+        'master_rss_mb': round(master.get('Rss', 0) / 1024, 1),
+        'worker_rss_mb': round(average('Rss'), 1),
+        'worker_pss_mb': round(average('Pss'), 1),
+        'worker_shared_mb': round(average('Shared_Clean') + average('Shared_Dirty'), 1),
+        'worker_private_mb': round(average('Private_Clean') + average('Private_Dirty'), 1),
+        'worker_idle_private_mb': round(average('Private_Clean', idle) + average('Private_Dirty', idle), 1),
+        'total_pss_mb': round(total_pss, 1),
+        'unshared_estimate_mb': round(master.get('Rss', 0) / 1024 * workers, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-worker memory of serve.py")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--rounds', type=int, default=3, help="Passes over the endpoints per worker")
+    parser.add_argument('--shared', action='store_true', help="Serve the dataset from shared memory")
+    parser.add_argument('--output', help="Write the measurements as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'workers':>7} {'master RSS':>10} {'worker RSS':>10} {'worker PSS':>10} {'idle private':>12} "
+          f"{'private':>8} {'total PSS':>10} {'N x RSS':>9}  (MB)")
+    for workers in args.workers:
+        result = measure_workers(args.rows, workers, args.threads, args.rounds, args.shared)
+        results.append(result)
+        print(f"{workers:>7} {result['master_rss_mb']:>10} {result['worker_rss_mb']:>10} "
+              f"{result['worker_pss_mb']:>10} {result['worker_idle_private_mb']:>12} "
+              f"{result['worker_private_mb']:>8} {result['total_pss_mb']:>10} {result['unshared_estimate_mb']:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
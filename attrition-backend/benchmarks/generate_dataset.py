@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Generate synthetic HR datasets of arbitrary size for the benchmarks.
+
+Rows are resampled from HR-Employee-Attrition-All.csv and given fresh
+EmployeeNumbers. A matching employees.csv (hire/exit dates, manager_id) is
+written alongside, following the same rules as Datasets/Dataset_gen_new.py
+but vectorized so millions of rows generate in seconds.
+
+    python benchmarks/generate_dataset.py --rows 100000
+"""
+
+import argparse
+import os
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_PATH = os.path.join(BACKEND_DIR, 'HR-Employee-Attrition-All.csv')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+TODAY = pd.Timestamp(2025, 6, 10)
+
+
+def dataset_paths(rows: int, data_dir: str = DATA_DIR) -> Dict[str, str]:
+    """Return the file paths used for a generated dataset of `rows` rows."""
+    return {
+        'dataset': os.path.join(data_dir, f'hr_{rows}.csv'),
+        'employees': os.path.join(data_dir, f'employees_{rows}.csv'),
+    }
+
+
+def generate(rows: int, data_dir: str = DATA_DIR, seed: int = 42, force: bool = False) -> Dict[str, str]:
+    """Generate (or reuse) a synthetic dataset and return its paths."""
+    paths = dataset_paths(rows, data_dir)
+    if not force and all(os.path.exists(path) for path in paths.values()):
+        return paths
+
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(SOURCE_PATH)
+
+    df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+    df['EmployeeNumber'] = np.arange(1, rows + 1)
+    # Jitter income so the resampled rows are not exact duplicates
+    df['MonthlyIncome'] = (df['MonthlyIncome'] * rng.uniform(0.9, 1.1, rows)).round().astype(int)
+
+    # Hire dates from tenure; leavers exit somewhere after their first six months
+    tenure_days = (df['YearsAtCompany'].to_numpy() * 365.25).astype(int)
+    short = tenure_days <= 180
+    tenure_days = np.where(short, rng.integers(30, 181, rows), tenure_days)
+    hire = TODAY - pd.to_timedelta(tenure_days, unit='D')
+    left = (df['Attrition'] == 'Yes').to_numpy()
+    exit_offset = np.where(short, 0, (rng.uniform(0, 1, rows) * np.maximum(tenure_days - 180, 0)).astype(int) + 180)
+    exit_date = pd.Series(hire + pd.to_timedelta(exit_offset, unit='D')).where(left)
+    exit_date = exit_date.where(exit_date <= TODAY, TODAY)
+
+    # Managers drawn from JobLevel >= 3; level 1 employees have none
+    manager_pool = df.loc[df['JobLevel'] >= 3, 'EmployeeNumber'].to_numpy()
+    managers = manager_pool[rng.integers(0, len(manager_pool), rows)].astype(float)
+    managers[df['JobLevel'].to_numpy() <= 1] = np.nan
+
+    employees = df.drop(columns=['MonthlyIncome', 'PerformanceRating', 'PercentSalaryHike',
+                                 'EmployeeCount', 'StandardHours', 'Over18'], errors='ignore')
+    employees['hire_date'] = pd.Series(hire).dt.strftime('%Y-%m-%d')
+    employees['exit_date'] = exit_date.dt.strftime('%Y-%m-%d')
+    employees['manager_id'] = managers
+
+    df.to_csv(paths['dataset'], index=False)
+    employees.to_csv(paths['employees'], index=False)
+    print(f"Generated {rows} rows in {data_dir}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic HR datasets")
+    parser.add_argument('--rows', type=int, nargs='+', required=True, help="Dataset sizes to generate")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="Regenerate even if the files exist")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        generate(rows, args.data_dir, args.seed, args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+"""
+End-to-end load test of the preforked server against a stub LLM, offline.
+
+Starts stub_llm.py in this process and serve.py against a generated dataset,
+with GROQ_API_URL pointing the chatbot at the stub. It then sends an open-loop
+mix of dashboard, filter and chat traffic at a target rate. Requests are
+scheduled at fixed intervals whether or not earlier ones have returned. Each
+latency is measured from the scheduled send time, so a server that falls
+behind shows up as queueing rather than as a lower request rate (no
+coordinated omission). The report gives throughput, p50/p99 latency and error
+rate per route and overall. --url tests an already running server instead;
+its chatbot must then be pointed at a stub (or the real API) by hand.
+
+    python benchmarks/load_test.py --rows 100000 --workers 4 --rps 50 --duration 60
+    python benchmarks/load_test.py --mix dashboard=1 chat=1 --latency 2 --tokens-per-second 100
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from generate_dataset import generate  # noqa: E402
+from stub_llm import add_stub_arguments, start_stub, stub_config  # noqa: E402
+
+DASHBOARD_PATHS = [
+    '/api/attrition-by-age',
+    '/api/attrition-by-gender',
+    '/api/attrition-by-department',
+    '/api/attrition-by-education',
+    '/api/attrition-by-job-satisfaction',
+    '/api/attrition-by-salary',
+    '/api/overall-statistics',
+    '/api/employee-count',
+    '/api/factors-correlation',
+    '/api/predictive-factors',
+    '/api/quick-insights',
+    '/api/dataset-metadata',
+]
+
+DEPARTMENTS = ['Sales', 'Research & Development', 'Human Resources']
+SORT_COLUMNS = ['RiskScore', 'MonthlyIncome', 'JobSatisfaction', 'YearsAtCompany', 'Age']
+
+QUESTIONS = [
+    "Which department has the highest attrition rate?",
+    "How does overtime affect attrition?",
+    "Show me attrition by job role",
+    "What is the age distribution of employees who left?",
+    "Compare monthly income across departments",
+    "Which factors are most correlated with attrition?",
+    "How does job satisfaction relate to leaving?",
+    "What share of employees work overtime?",
+]
+
+# Relative weight of each kind of traffic when --mix is not given
+DEFAULT_MIX = {'dashboard': 6, 'filter': 3, 'chat': 1}
+
+Request = Tuple[str, str, str, Optional[Dict[str, Any]]]
+
+
+def random_filters(rng: random.Random) -> Dict[str, Any]:
+    """Query parameters of a random dashboard filter; parameters are left out as often as not."""
+    params: Dict[str, Any] = {}
+    if rng.random() < 0.5:
+        params['departments'] = rng.sample(DEPARTMENTS, rng.randint(1, 2))
+    if rng.random() < 0.3:
+        params['gender'] = rng.choice(['Male', 'Female'])
+    if rng.random() < 0.3:
+        params['atRisk'] = 'true'
+    if rng.random() < 0.4:
+        low = rng.randint(0, 10)
+        params['tenureMin'], params['tenureMax'] = low, low + rng.randint(2, 20)
+    if rng.random() < 0.3:
+        params['satisfactionMin'] = rng.randint(1, 3)
+    return params
+
+
+def build_request(kind: str, rng: random.Random) -> Request:
+    """(route, method, path, body) of one request of the given kind."""
+    if kind == 'dashboard':
+        path = rng.choice(DASHBOARD_PATHS)
+        return path, 'GET', path, None
+    if kind == 'filter':
+        params = random_filters(rng)
+        route = rng.choices(['/api/filtered-data', '/api/employees', '/api/correlation-matrix'], [3, 2, 1])[0]
+        if route == '/api/employees':
+            params.update(sort=rng.choice(SORT_COLUMNS), order=rng.choice(['asc', 'desc']), limit=50)
+        query = urllib.parse.urlencode(params, doseq=True)
+        return route, 'GET', f"{route}?{query}" if query else route, None
+    if kind == 'chat':
+        return '/api/chat', 'POST', '/api/chat', {'message': rng.choice(QUESTIONS)}
+    if kind == 'batch':
+        questions = rng.sample(QUESTIONS, 4) * 2
+        return '/api/chat/batch', 'POST', '/api/chat/batch', {'questions': questions}
+    raise ValueError(f"Unknown traffic kind {kind!r}")
+
+
+def send(base: str, method: str, path: str, body: Optional[Dict[str, Any]], timeout: float) -> Tuple[int, str]:
+    """(status, error) of one request; the status is 0 when no response came back."""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        return e.code, f"HTTP {e.code}"
+    except (urllib.error.URLError, OSError) as e:
+        return 0, type(getattr(e, 'reason', e)).__name__
+    # The chatbot answers LLM failures with a 200 whose status is "error" (one per line for a batch)
+    if path.startswith('/api/chat'):
+        answers = [json.loads(line) for line in payload.splitlines() if line.strip()]
+        if any(answer.get('status') == 'error' for answer in answers):
+            return status, 'chat error'
+    return status, ''
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(samples: List[Tuple[str, float, int, str]], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    """Per-route and overall counts, throughput, latency percentiles and error rates."""
+    routes: Dict[str, List[Tuple[float, int, str]]] = {}
+    for route, latency, status, error in samples:
+        routes.setdefault(route, []).append((latency, status, error))
+        routes.setdefault('all', []).append((latency, status, error))
+
+    report = {}
+    for route, results in sorted(routes.items(), key=lambda item: (item[0] == 'all', item[0])):
+        latencies = [latency for latency, _, _ in results]
+        errors = [error for _, _, error in results if error]
+        report[route] = {
+            'requests': len(results),
+            'throughput_rps': round(len(results) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(max(latencies) * 1000, 1),
+            'error_rate': round(len(errors) / len(results), 4),
+            'errors': {error: errors.count(error) for error in sorted(set(errors))},
+        }
+    return report
+
+
+def run_load(base: str, mix: Dict[str, float], rps: float, duration: float, concurrency: int,
+             timeout: float, seed: Optional[int]) -> Dict[str, Any]:
+    """Send `rps` requests per second for `duration` seconds and summarize the results."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    count = int(rps * duration)
+    # The whole schedule is drawn up front, so the sender only sleeps and submits
+    schedule = [build_request(kind, rng) for kind in rng.choices(kinds, weights, k=count)]
+
+    samples: List[Tuple[str, float, int, str]] = []
+    lock = threading.Lock()
+
+    def run(scheduled: float, request: Request):
+        route, method, path, body = request
+        status, error = send(base, method, path, body, timeout)
+        if not error and status >= 400:
+            error = f"HTTP {status}"
+        with lock:
+            samples.append((route, time.perf_counter() - scheduled, status, error))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as pool:
+        for index, request in enumerate(schedule):
+            scheduled = started + index / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, scheduled, request)
+    elapsed = time.perf_counter() - started
+
+    return {'offered_rps': rps, 'duration_seconds': round(elapsed, 1), 'routes': summarize(samples, elapsed)}
+
+
+@contextmanager
+def running_server(rows: int, workers: int, threads: int, llm_url: str) -> Iterator[str]:
+    """serve.py on a generated dataset, with chat answered by `llm_url`; yields its base URL."""
+    paths = generate(rows)
+    env = dict(os.environ, DATASET_PATH=paths['dataset'], EMPLOYEES_PATH=paths['employees'],
+               MONTHLY_METRICS_PATH='', ATTRITION_EVENTS_PATH='', GROQ_API_URL=llm_url, GROQ_API_KEY='stub')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ready_file = os.path.join(tmp, 'ready.json')
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, 'serve.py'), '--workers', str(workers),
+             '--threads', str(threads), '--port', '0', '--host', '127.0.0.1', '--ready-file', ready_file],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+        )
+        try:
+            while not os.path.exists(ready_file) or os.path.getsize(ready_file) == 0:
+                if process.poll() is not None:
+                    raise RuntimeError(f"serve.py exited with {process.returncode}")
+                time.sleep(0.2)
+            with open(ready_file) as f:
+                ready = json.load(f)
+            yield f"http://127.0.0.1:{ready['port']}"
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def parse_mix(items: List[str]) -> Dict[str, float]:
+    mix = {}
+    for item in items:
+        kind, _, weight = item.partition('=')
+        if kind not in ('dashboard', 'filter', 'chat', 'batch'):
+            raise argparse.ArgumentTypeError(f"Unknown traffic kind {kind!r}")
+        mix[kind] = float(weight or 1)
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+
+def print_report(result: Dict[str, Any]):
+    print(f"{'route':<34} {'requests':>8} {'rps':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for route, stats in result['routes'].items():
+        print(f"{route:<34} {stats['requests']:>8} {stats['throughput_rps']:>7} {stats['p50_ms']:>8} "
+              f"{stats['p99_ms']:>8} {stats['max_ms']:>8} {stats['error_rate']:>7.2%}")
+        for error, count in stats['errors'].items():
+            print(f"{'':<36}{count} x {error}")
+    if 'stub' in result:
+        print("stub LLM: " + ', '.join(f"{key}={value}" for key, value in result['stub'].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with mixed dashboard, filter and chat traffic")
+    parser.add_argument('--url', help="Test this running server instead of starting serve.py")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=20, help="Requests per second to offer")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to send traffic for")
+    parser.add_argument('--mix', nargs='+', default=[f"{kind}={weight}" for kind, weight in DEFAULT_MIX.items()],
+                        help="Traffic weights as kind=weight; kinds are dashboard, filter, chat and batch")
+    parser.add_argument('--concurrency', type=int, default=64, help="Most requests in flight at once")
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--llm-url', help="Chat completions URL to use instead of starting the stub")
+    parser.add_argument('--output', help="Write the report as JSON")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    stub = None
+    llm_url = args.llm_url
+    if llm_url is None:
+        stub = start_stub(stub_config(args))
+        llm_url = f"http://127.0.0.1:{stub.server_port}/v1/chat/completions"
+
+    try:
+        if args.url:
+            result = run_load(args.url.rstrip('/'), mix, args.rps, args.duration, args.concurrency,
+                              args.timeout, args.seed)
+        else:
+            with running_server(args.rows, args.workers, args.threads, llm_url) as base:
+                result = run_load(base, mix, args.rps, args.duration, args.concurrency, args.timeout, args.seed)
+        if stub is not None:
+            result['stub'] = dict(stub.RequestHandlerClass.config.counts)
+    finally:
+        if stub is not None:
+            stub.shutdown()
+
+    result['mix'] = mix
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
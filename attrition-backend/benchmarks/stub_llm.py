@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Offline stand-in for the OpenAI-compatible chat completions API.
+
+Answers POST /v1/chat/completions (and /openai/v1/chat/completions, the Groq
+path) with a canned markdown answer after a configurable delay. The delay is
+a base latency with jitter plus the answer's tokens at a given token rate.
+A fraction of answers ends in a plot_request block that names real dataset
+columns, so the chatbot's plot extraction and rendering run as they would
+against the real model. Configurable fractions of requests fail with a 5xx or
+with a 429 and a Retry-After header, to exercise the client's backoff. Point
+the backend at it with GROQ_API_URL:
+
+    python benchmarks/stub_llm.py --port 8900 --latency 0.8 --tokens-per-second 250 --plot-rate 0.5
+    GROQ_API_URL=http://127.0.0.1:8900/v1/chat/completions GROQ_API_KEY=stub python app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+# Plot requests the stub appends to answers; all name columns of the HR dataset
+PLOT_REQUESTS = [
+    {"type": "bar", "x_column": "Department", "y_column": "Attrition Rate", "title": "Attrition Rate by Department"},
+    {"type": "bar", "x_column": "JobRole", "y_column": "Attrition Rate", "title": "Attrition Rate by Job Role"},
+    {"type": "histogram", "x_column": "Age", "title": "Employee Age Distribution"},
+    {"type": "box", "x_column": "Department", "y_column": "MonthlyIncome", "title": "Monthly Income by Department"},
+    {"type": "pie", "x_column": "OverTime", "title": "Overtime Share"},
+    {"type": "scatter", "x_column": "Age", "y_column": "MonthlyIncome", "title": "Age vs Monthly Income"},
+]
+
+ANSWER_SENTENCES = [
+    "Attrition is concentrated among employees who work overtime.",
+    "Sales and Human Resources lose a larger share of their staff than Research & Development.",
+    "Employees in their first two years leave at roughly twice the average rate.",
+    "Lower job satisfaction scores go together with noticeably higher attrition.",
+    "Monthly income rises with job level, and attrition falls as it does.",
+    "Long commutes add a small but consistent increase in the likelihood of leaving.",
+]
+
+
+def approximate_tokens(text: str) -> int:
+    """About four characters per token; the stub only needs a plausible usage figure."""
+    return max(len(text) // 4, 1)
+
+
+class StubConfig:
+    """Latency, throughput and failure settings of a stub server."""
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, tokens_per_second: float = 0,
+                 answer_tokens: int = 300, plot_rate: float = 0.5, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: float = 1.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.plot_rate = plot_rate
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'answers': 0, 'plots': 0, 'errors': 0, 'rate_limited': 0}
+
+    def draw(self) -> float:
+        with self.lock:
+            return self.random.random()
+
+    def count(self, key: str):
+        with self.lock:
+            self.counts[key] += 1
+
+
+def build_answer(config: StubConfig, question: str) -> Dict[str, Any]:
+    """A markdown answer of about `answer_tokens` tokens, ending in a plot request for `plot_rate` of them."""
+    with config.lock:
+        sentences = []
+        while approximate_tokens(' '.join(sentences)) < config.answer_tokens:
+            sentences.append(config.random.choice(ANSWER_SENTENCES))
+        plot = config.random.choice(PLOT_REQUESTS) if config.random.random() < config.plot_rate else None
+    content = f"## Analysis\n\nAbout: {question[:80]}\n\n" + '\n'.join(f"- {sentence}" for sentence in sentences)
+    if plot is not None:
+        content += f"\n\n```plot_request\n{json.dumps(plot, indent=2)}\n```"
+    return {'content': content, 'plot': plot is not None}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config: StubConfig = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self.send_json(200, {'object': 'list', 'data': [{'id': 'stub', 'object': 'model'}]})
+        elif self.path == '/stats':
+            with self.config.lock:
+                self.send_json(200, dict(self.config.counts))
+        else:
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        try:
+            request = json.loads(body)
+            messages = request['messages']
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'error': {'message': 'Expected a JSON body with messages'}})
+            return
+
+        config = self.config
+        config.count('requests')
+        roll = config.draw()
+        if roll < config.rate_limit_rate:
+            config.count('rate_limited')
+            self.send_json(429, {'error': {'message': 'Rate limit reached (stub)', 'type': 'rate_limit'}},
+                           {'Retry-After': f'{config.retry_after:g}'})
+            return
+        if roll < config.rate_limit_rate + config.error_rate:
+            config.count('errors')
+            time.sleep(config.latency)
+            self.send_json(503, {'error': {'message': 'Service unavailable (stub)'}})
+            return
+
+        question = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+        answer = build_answer(config, question)
+        completion_tokens = approximate_tokens(answer['content'])
+        delay = max(config.latency + config.jitter * (2 * config.draw() - 1), 0)
+        if config.tokens_per_second > 0:
+            delay += completion_tokens / config.tokens_per_second
+        time.sleep(delay)
+
+        prompt_tokens = sum(approximate_tokens(m.get('content', '')) for m in messages)
+        config.count('answers')
+        if answer['plot']:
+            config.count('plots')
+        self.send_json(200, {
+            'id': f'chatcmpl-stub-{config.counts["requests"]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer['content']},
+                         'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        })
+
+
+def start_stub(config: StubConfig, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Serve the stub on a background thread; the URL is f'http://{host}:{server.server_port}/v1/chat/completions'."""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-llm', daemon=True).start()
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', type=float, default=0.5, help="Base seconds before answering")
+    parser.add_argument('--jitter', type=float, default=0.2, help="Uniform +/- seconds around the latency")
+    parser.add_argument('--tokens-per-second', type=float, default=0,
+                        help="Generation rate; adds answer tokens / rate to the delay (0: no extra delay)")
+    parser.add_argument('--answer-tokens', type=int, default=300, help="Approximate tokens per answer")
+    parser.add_argument('--plot-rate', type=float, default=0.5, help="Fraction of answers with a plot request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests failing with 503")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help="Fraction of requests answered 429 with Retry-After")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def stub_config(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+                      answer_tokens=args.answer_tokens, plot_rate=args.plot_rate, error_rate=args.error_rate,
+                      rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub OpenAI-compatible chat completions API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_stub(stub_config(args), args.host, args.port)
+    print(f"Stub LLM listening on http://{args.host}:{server.server_port}/v1/chat/completions")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
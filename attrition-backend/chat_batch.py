@@ -0,0 +1,80 @@
+"""
+Answers to many independent chat questions, computed concurrently.
+
+Questions that differ only in case or whitespace are asked once; each answer
+lists the positions of every question it covers. Answers are stateless (no
+conversation history), so they run in any order on up to `concurrency`
+threads, while the shared LLM client keeps the whole process within its
+concurrency and rate limits. Plots draw on their own figures, so they render
+on the same threads; a plot requested by several answers is rendered once.
+Answers are yielded as they complete.
+"""
+
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+REGISTRY.counter('chat_batch_questions_total', 'Questions received in chat batches, by whether they were '
+                 'unique or repeated an earlier one')
+REGISTRY.counter('chat_batch_plots_total', 'Plots requested by chat batch answers, by whether they were '
+                 'rendered or shared')
+
+
+def question_key(question: str) -> str:
+    """Questions with the same key get the same answer."""
+    return ' '.join(question.split()).casefold()
+
+
+def group_questions(questions: List[str]) -> List[Tuple[str, List[int]]]:
+    """Distinct questions, in first-seen order, with the positions each occurs at."""
+    groups: Dict[str, Tuple[str, List[int]]] = {}
+    for position, question in enumerate(questions):
+        groups.setdefault(question_key(question), (question, []))[1].append(position)
+    return list(groups.values())
+
+
+class PlotMemo:
+    """Renders each distinct plot once; concurrent requests for it wait for the first render."""
+
+    def __init__(self, render: Callable[..., Optional[str]]):
+        self.render = render
+        self._plots: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, **params) -> Optional[str]:
+        key = json.dumps(params, sort_keys=True, default=str)
+        with self._lock:
+            plot = self._plots.get(key)
+            owner = plot is None
+            if owner:
+                plot = self._plots[key] = Future()
+        REGISTRY.inc('chat_batch_plots_total', result='rendered' if owner else 'shared')
+        if owner:
+            try:
+                plot.set_result(self.render(**params))
+            except Exception as e:
+                plot.set_exception(e)
+        return plot.result()
+
+
+def answer_batch(chatbot, questions: List[str], concurrency: int) -> Iterator[Dict[str, Any]]:
+    """Yield the answer to each distinct question as it completes."""
+    groups = group_questions(questions)
+    REGISTRY.inc('chat_batch_questions_total', len(groups), result='unique')
+    REGISTRY.inc('chat_batch_questions_total', len(questions) - len(groups), result='duplicate')
+
+    plots = PlotMemo(chatbot.generate_plot)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(groups))),
+                                  thread_name_prefix='chat-batch')
+    try:
+        answers = {executor.submit(chatbot.process_query, question, True, plots): (question, positions)
+                   for question, positions in groups}
+        for answer in as_completed(answers):
+            question, positions = answers[answer]
+            yield {'positions': positions, 'question': question, **answer.result()}
+    finally:
+        # When the client goes away, questions not yet started are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,142 @@
+"""
+Token-budgeted conversation context for the chatbot.
+
+Tokens are counted locally. Text is split into words, numbers, punctuation
+and whitespace, the way the pre-tokenizers of BPE models split it. A run of
+whitespace costs one token, and any other piece one token per four characters
+(at least one). This errs a little high for English and JSON, so a packed
+prompt stays within the model's limit.
+
+Each prompt starts with the system prompt. If turns have been dropped, a
+digest of their questions comes next, then the kept turns verbatim. Messages
+are trimmed once, when they are stored, so every turn is sent byte for byte
+the same on later requests and the prompt of one turn is a prefix of the next.
+That lets upstream prefix caches reuse it. When the history outgrows the
+budget, the window jumps forward until the kept turns fill only `low_water` of
+the room left. Later turns then extend an unchanged prefix until it overflows
+again, instead of the window sliding (and the cache missing) on every message.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+# Prompt sizes in tokens
+TOKEN_BUCKETS = (256, 512, 1024, 2048, 4096, 6144, 8192, 16384, 32768)
+
+REGISTRY.histogram('chat_prompt_tokens', 'Prompt tokens sent per chat turn (estimated locally, or reported '
+                   'by the API)', buckets=TOKEN_BUCKETS)
+REGISTRY.counter('chat_turns_dropped_total', 'Conversation messages dropped from the chat context to fit the budget')
+
+# Words (with their leading space), short digit runs, punctuation runs and whitespace
+TOKEN_PATTERN = re.compile(r"'(?:s|t|re|ve|m|ll|d)\b| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+|_+")
+# Framing tokens the chat template adds around each message
+MESSAGE_OVERHEAD = 4
+# Marker appended to a trimmed message
+TRIMMED = ' [...]'
+# Dropped questions listed in the digest, and the tokens each keeps
+DIGEST_QUESTIONS = 5
+DIGEST_QUESTION_TOKENS = 40
+
+
+def _piece_tokens(piece: str) -> int:
+    return 1 if piece.isspace() else (len(piece) + 3) // 4
+
+
+def count_tokens(text: str) -> int:
+    """Estimated tokens in `text`."""
+    return sum(map(_piece_tokens, TOKEN_PATTERN.findall(text)))
+
+
+def trim_tokens(text: str, limit: int) -> str:
+    """`text` cut after about `limit` tokens, marked as trimmed; unchanged when it fits."""
+    used = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > limit:
+            return text[:match.start()].rstrip() + TRIMMED
+    return text
+
+
+class ChatContext:
+    """Conversation history packed into a prompt of at most `budget` tokens."""
+
+    def __init__(self, budget: int = 6000, message_tokens: int = 1000, low_water: float = 0.6):
+        self.budget = budget
+        self.message_tokens = message_tokens
+        self.low_water = low_water
+        # (message, tokens) for every stored message, oldest first
+        self.turns: List[Tuple[Dict[str, str], int]] = []
+        # Index of the first turn sent; the ones before it are in the digest
+        self.start = 0
+        self._digest: Optional[Tuple[Dict[str, str], int]] = None
+        self._system: Tuple[str, int] = ('', 0)
+        self._lock = threading.Lock()
+
+    def add(self, role: str, content: str) -> Dict[str, str]:
+        """Store a message, trimmed to `message_tokens`; returns the stored message."""
+        message = {"role": role, "content": trim_tokens(content, self.message_tokens)}
+        with self._lock:
+            self.turns.append((message, count_tokens(message["content"]) + MESSAGE_OVERHEAD))
+        return message
+
+    def clear(self):
+        with self._lock:
+            self.turns = []
+            self.start = 0
+            self._digest = None
+
+    @property
+    def history(self) -> List[Dict[str, str]]:
+        """Every stored message, including the ones no longer sent."""
+        with self._lock:
+            return [message for message, _ in self.turns]
+
+    def messages(self, system_prompt: str) -> Tuple[List[Dict[str, str]], int]:
+        """The messages to send after `system_prompt` and their estimated prompt tokens."""
+        with self._lock:
+            system_tokens = self._system_tokens(system_prompt)
+            kept = sum(tokens for _, tokens in self.turns[self.start:])
+            if system_tokens + self._digest_tokens() + kept > self.budget:
+                self._advance(system_tokens)
+                kept = sum(tokens for _, tokens in self.turns[self.start:])
+
+            messages = [{"role": "system", "content": system_prompt}]
+            if self._digest is not None:
+                messages.append(self._digest[0])
+            messages.extend(message for message, _ in self.turns[self.start:])
+            return messages, system_tokens + self._digest_tokens() + kept
+
+    def _system_tokens(self, system_prompt: str) -> int:
+        # The system prompt only changes with the data, so its count is reused between turns
+        if self._system[0] != system_prompt:
+            self._system = (system_prompt, count_tokens(system_prompt) + MESSAGE_OVERHEAD)
+        return self._system[1]
+
+    def _digest_tokens(self) -> int:
+        return self._digest[1] if self._digest is not None else 0
+
+    def _advance(self, system_tokens: int):
+        """Drop the oldest sent turns until the rest fill `low_water` of the room (keeping the newest)."""
+        room = self.budget - system_tokens - DIGEST_QUESTIONS * DIGEST_QUESTION_TOKENS
+        kept = sum(tokens for _, tokens in self.turns[self.start:])
+        dropped = 0
+        while self.start < len(self.turns) - 1 and kept > room * self.low_water:
+            kept -= self.turns[self.start][1]
+            self.start += 1
+            dropped += 1
+        # Start the window on a user message, as chat templates expect
+        while self.start < len(self.turns) - 1 and self.turns[self.start][0]["role"] != "user":
+            self.start += 1
+            dropped += 1
+        REGISTRY.inc('chat_turns_dropped_total', dropped)
+
+        questions = [trim_tokens(message["content"], DIGEST_QUESTION_TOKENS)
+                     for message, _ in self.turns[:self.start] if message["role"] == "user"]
+        if questions:
+            lines = [f"Earlier in this conversation ({self.start} messages not shown), the user asked:"]
+            lines += [f"- {question}" for question in questions[-DIGEST_QUESTIONS:]]
+            content = '\n'.join(lines)
+            self._digest = ({"role": "system", "content": content}, count_tokens(content) + MESSAGE_OVERHEAD)
@@ -1,41 +1,100 @@
 import os
 import json
+import threading
 import pandas as pd
-import requests
 import dotenv
-import matplotlib.pyplot as plt
-import seaborn as sns
 import io
 import base64
 import numpy as np
-from typing import Dict, Any, List, Optional, Tuple, Union
+from typing import Dict, Any, Callable, List, Optional, Tuple, Union
 import warnings
+from chat_context import ChatContext
+from llm_client import shared_client
+from metrics import REGISTRY, stage_timer
+from shared_dataset import SharedDataset
 warnings.filterwarnings('ignore')
 
 # Load environment variables
 dotenv.load_dotenv()
 
+# matplotlib/seaborn (and requests) are imported on first use, so importing this
+# module -- and starting the dashboard API -- doesn't pay for them
+_plotting = None
+_plotting_lock = threading.Lock()
+
+def _load_plotting():
+    """Import pyplot (on the Agg backend) and seaborn once, on first use."""
+    global _plotting
+    if _plotting is None:
+        with _plotting_lock:
+            if _plotting is None:
+                import matplotlib
+                matplotlib.use('Agg')
+                import matplotlib.pyplot as plt
+                import seaborn as sns
+                # Global style, set once rather than on every plot
+                plt.style.use('default')
+                sns.set_palette("husl")
+                _plotting = (plt, sns)
+    return _plotting
+
+def _warm_up():
+    _load_plotting()
+    import requests  # noqa: F401
+
+def warm_up() -> threading.Thread:
+    """Import the plotting and HTTP stack on a background thread."""
+    thread = threading.Thread(target=_warm_up, name='chatbot-warmup', daemon=True)
+    thread.start()
+    return thread
+
 class HRAnalyticsChatbot:
     """
     Enhanced Chatbot for HR Analytics using Groq API with improved plotting functionality
     """
     def __init__(self, dataframe=None):
+        # Without a key the chatbot still plots; chat answers that it is unavailable
         self.api_key = os.getenv("GROQ_API_KEY")
         if not self.api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
+            print("GROQ_API_KEY not found in environment variables; chat is disabled")
         
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.model = "llama3-70b-8192"
+        # Any OpenAI-compatible endpoint works, e.g. benchmarks/stub_llm.py for offline load tests
+        self.api_url = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+        self.model = os.getenv("GROQ_MODEL", "llama3-70b-8192")
         self.dataframe = dataframe
-        self.conversation_history = []
-        
-        # Set matplotlib backend for better compatibility
-        plt.switch_backend('Agg')
+        # Column sketches (sketches.DatasetSketch) the dataset context is read from when set
+        self.sketches = None
+        # Callable returning the maintained correlation matrix, used by heatmaps when set
+        self.correlations = None
+        # Conversation turns packed into a prompt budget; the model's 8192-token window less the
+        # 1500-token reply, with some margin for the estimate
+        self.context = ChatContext(budget=int(os.getenv("CHAT_CONTEXT_TOKENS", 6500)),
+                                   message_tokens=int(os.getenv("CHAT_MESSAGE_TOKENS", 600)))
+        # Held through a turn of the conversation, so concurrent turns take it in order
+        self._turn_lock = threading.Lock()
         
         # Preprocess dataframe if provided
         if self.dataframe is not None:
             self._preprocess_dataframe()
         
+    def set_dataframe(self, dataframe):
+        """Swap in a new dataframe, keeping the conversation history."""
+        self.dataframe = dataframe
+        self._preprocess_dataframe()
+        
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """Every stored message of the conversation, including those no longer sent."""
+        return self.context.history
+        
+    def set_sketches(self, sketches):
+        """Answer the dataset context from column sketches instead of scanning the dataframe."""
+        self.sketches = sketches
+        
+    def set_correlations(self, provider):
+        """Draw heatmaps from a maintained correlation matrix (a callable returning a DataFrame)."""
+        self.correlations = provider
+        
     def _preprocess_dataframe(self):
         """Preprocess the dataframe to handle common data issues."""
         if self.dataframe is None:
@@ -56,27 +115,36 @@ class HRAnalyticsChatbot:
         if self.dataframe is None:
             return "No dataframe is currently loaded."
             
+        # The sketches cover every row, also when only a sample of them is loaded
+        rows = self.sketches.rows if self.sketches is not None else self.dataframe.shape[0]
         df_info = {
-            "shape": f"{self.dataframe.shape[0]} rows, {self.dataframe.shape[1]} columns",
+            "shape": f"{rows} rows, {self.dataframe.shape[1]} columns",
             "columns": list(self.dataframe.columns),
             "data_types": {col: str(dtype) for col, dtype in self.dataframe.dtypes.items()},
             "sample": self.dataframe.head(3).to_dict(orient='records')
         }
         
         # Get basic statistics for numeric columns
-        numeric_columns = self.dataframe.select_dtypes(include=['number']).columns
+        # Pick the columns by dtype; select_dtypes would copy them
+        dtypes = self.dataframe.dtypes
+        numeric_columns = [col for col, dtype in dtypes.items() if dtype.kind in 'iufc']
         if len(numeric_columns) > 0:
-            stats = self.dataframe[numeric_columns].describe().to_dict()
+            if self.sketches is not None:
+                stats = self.sketches.describe(numeric_columns)
+            else:
+                stats = self.dataframe[numeric_columns].describe().to_dict()
             df_info["numeric_stats"] = {col: {k: round(v, 2) if isinstance(v, float) else v 
                                             for k, v in stats[col].items()} for col in stats}
             
         # Get value counts for categorical columns (limit to top 5 values)
-        categorical_columns = self.dataframe.select_dtypes(include=['object']).columns
+        categorical_columns = [col for col, dtype in dtypes.items() if dtype == object]
         if len(categorical_columns) > 0:
             df_info["categorical_values"] = {}
             for col in categorical_columns[:5]:  # Limit to first 5 categorical columns
-                value_counts = self.dataframe[col].value_counts().head(5)
-                df_info["categorical_values"][col] = value_counts.to_dict()
+                if self.sketches is not None:
+                    df_info["categorical_values"][col] = self.sketches.top_values(col, 5)
+                else:
+                    df_info["categorical_values"][col] = self.dataframe[col].value_counts().head(5).to_dict()
                 
         return json.dumps(df_info, indent=2)
     
@@ -129,7 +197,7 @@ class HRAnalyticsChatbot:
             return False, f"Plot type '{plot_type}' requires both x and y columns"
         
         if plot_type == 'heatmap' and x_column:
-            numeric_cols = df.select_dtypes(include=['number']).columns
+            numeric_cols = [col for col in df.columns if df[col].dtype.kind in 'iuf']
             if len(numeric_cols) < 2:
                 return False, "Heatmap requires at least 2 numeric columns"
         
@@ -189,7 +257,12 @@ class HRAnalyticsChatbot:
                       columns: List[str] = None) -> Optional[str]:
         """
         Generate a plot with improved error handling and data preparation.
+        
+        Each plot draws on its own Figure rather than pyplot's current figure,
+        so plots can be rendered from several threads at once.
         """
+        plt, sns = _load_plotting()
+        from matplotlib.figure import Figure
         try:
             if self.dataframe is None:
                 print("No dataframe available for plotting")
@@ -219,12 +292,9 @@ class HRAnalyticsChatbot:
                 print(f"Plot validation failed: {error_msg}")
                 return None
             
-            # Set style
-            plt.style.use('default')
-            sns.set_palette("husl")
-            
-            # Create figure
-            fig, ax = plt.subplots(figsize=figsize)
+            # Create figure (not registered with pyplot, so nothing to close)
+            fig = Figure(figsize=figsize)
+            ax = fig.subplots()
             
             # Generate plot based on type
             if plot_type == 'bar':
@@ -237,10 +307,12 @@ class HRAnalyticsChatbot:
                 
                 # Rotate x-axis labels if needed
                 if len(df[x_column].unique()) > 5:
-                    plt.xticks(rotation=45, ha='right')
+                    for label in ax.get_xticklabels():
+                        label.set_rotation(45)
+                        label.set_horizontalalignment('right')
             
             elif plot_type == 'histogram':
-                df[x_column].hist(bins=20, ax=ax, alpha=0.7, edgecolor='black')
+                df[x_column].hist(bins=20, ax=ax, figure=fig, alpha=0.7, edgecolor='black')
                 ax.set_xlabel(x_column)
                 ax.set_ylabel('Frequency')
             
@@ -261,7 +333,9 @@ class HRAnalyticsChatbot:
                     sns.boxplot(data=df, y=x_column, ax=ax)
                 
                 if len(df[x_column].unique()) > 5:
-                    plt.xticks(rotation=45, ha='right')
+                    for label in ax.get_xticklabels():
+                        label.set_rotation(45)
+                        label.set_horizontalalignment('right')
             
             elif plot_type == 'violin':
                 if y_column:
@@ -276,19 +350,17 @@ class HRAnalyticsChatbot:
                     if not heatmap_cols:
                         print(f"None of the specified columns found: {columns}")
                         return None
-                    heatmap_df = df[heatmap_cols]
                 else:
                     # Use all numeric columns
-                    heatmap_df = df.select_dtypes(include=['number'])
+                    heatmap_cols = [col for col in df.columns if df[col].dtype.kind in 'iuf']
                 
-                # Ensure we have numeric data
-                for col in heatmap_df.columns:
-                    if heatmap_df[col].dtype == 'object':
-                        # Try to convert to numeric
-                        heatmap_df[col] = pd.to_numeric(heatmap_df[col], errors='coerce')
-                
-                # Create correlation matrix
-                corr_matrix = heatmap_df.corr()
+                matrix = self.correlations() if self.correlations is not None else None
+                if matrix is not None and all(col in matrix.columns for col in heatmap_cols):
+                    corr_matrix = matrix.loc[heatmap_cols, heatmap_cols]
+                else:
+                    # Convert into a new frame rather than assigning into a slice of df
+                    heatmap_df = df[heatmap_cols].apply(pd.to_numeric, errors='coerce')
+                    corr_matrix = heatmap_df.corr()
                 
                 # Create heatmap
                 sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', center=0, 
@@ -302,7 +374,6 @@ class HRAnalyticsChatbot:
             
             else:
                 print(f"Unsupported plot type: {plot_type}")
-                plt.close(fig)
                 return None
             
             # Customize plot
@@ -310,17 +381,16 @@ class HRAnalyticsChatbot:
                 ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
             
             # Improve layout
-            plt.tight_layout()
+            fig.tight_layout()
             
             # Convert to base64
             buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+            fig.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
             buffer.seek(0)
             
             plot_base64 = base64.b64encode(buffer.read()).decode('utf-8')
             
             # Clean up
-            plt.close(fig)
             buffer.close()
             
             print(f"Successfully generated {plot_type} plot")
@@ -330,9 +400,6 @@ class HRAnalyticsChatbot:
             print(f"Error generating plot: {str(e)}")
             import traceback
             traceback.print_exc()
-            
-            # Clean up on error
-            plt.close('all')
             return None
     
     def _extract_plot_request(self, text: str) -> Optional[Dict[str, Any]]:
@@ -461,24 +528,43 @@ Format your analysis with:
 - Always conclude with actionable recommendations
 """
     
-    def process_query(self, query: str) -> Dict[str, Any]:
-        """Process user query with enhanced plot generation."""
+    def process_query(self, query: str, stateless: bool = False,
+                      render_plot: Optional[Callable[..., Optional[str]]] = None) -> Dict[str, Any]:
+        """
+        Process user query with enhanced plot generation.
+        
+        A stateless query is answered without the conversation and isn't added to
+        it, so independent questions can be answered concurrently. Other queries
+        run one at a time, each after the turns before it. `render_plot`
+        stands in for generate_plot (a batch uses it to share identical plots).
+        """
+        if stateless:
+            return self._answer(query, stateless, render_plot)
+        with self._turn_lock:
+            return self._answer(query, stateless, render_plot)
+    
+    def _answer(self, query: str, stateless: bool,
+                render_plot: Optional[Callable[..., Optional[str]]]) -> Dict[str, Any]:
+        """Answer one query, as process_query describes."""
+        if not self.api_key:
+            return {
+                "response": "The AI assistant is not configured (GROQ_API_KEY is not set). "
+                            "The dashboards and plots are still available.",
+                "status": "unavailable"
+            }
+        
+        render_plot = render_plot or self.generate_plot
         try:
             # Add user message to conversation history
-            self.conversation_history.append({"role": "user", "content": query})
-            
-            # Prepare messages for API
-            messages = [
-                {"role": "system", "content": self._create_system_prompt()},
-                *self.conversation_history[-10:]  # Last 10 messages for context
-            ]
+            context = ChatContext(self.context.budget, self.context.message_tokens) if stateless else self.context
+            context.add("user", query)
             
-            # Make API request
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            # Prepare messages for API: the system prompt and as much history as fits the budget
+            with stage_timer('prompt_build'):
+                messages, prompt_tokens = context.messages(self._create_system_prompt())
+            REGISTRY.observe('chat_prompt_tokens', prompt_tokens, source='estimate')
             
+            # Make API request (shared concurrency and rate limits, retried with backoff)
             data = {
                 "model": self.model,
                 "messages": messages,
@@ -486,30 +572,33 @@ Format your analysis with:
                 "max_tokens": 1500
             }
             
-            response = requests.post(self.api_url, headers=headers, json=data)
-            response.raise_for_status()
-            
-            response_data = response.json()
+            with stage_timer('llm_call'):
+                response_data = shared_client().complete(self.api_url, self.api_key, data)
+            usage = response_data.get("usage") or {}
+            if usage.get("prompt_tokens") is not None:
+                REGISTRY.observe('chat_prompt_tokens', usage["prompt_tokens"], source='api')
             assistant_message = response_data["choices"][0]["message"]["content"]
             
             print(f"Assistant response length: {len(assistant_message)}")
             print(f"Looking for plot request in: {assistant_message[-200:]}")  # Last 200 chars
             
             # Extract plot request
-            plot_request = self._extract_plot_request(assistant_message)
+            with stage_timer('plot_extraction'):
+                plot_request = self._extract_plot_request(assistant_message)
             plot_image = None
             
             if plot_request:
                 print(f"Found plot request: {plot_request}")
                 
                 # Generate plot
-                plot_image = self.generate_plot(
-                    plot_type=plot_request.get("type"),
-                    x_column=plot_request.get("x_column"),
-                    y_column=plot_request.get("y_column"),
-                    title=plot_request.get("title", ""),
-                    hue=plot_request.get("hue")
-                )
+                with stage_timer('plot_render'):
+                    plot_image = render_plot(
+                        plot_type=plot_request.get("type"),
+                        x_column=plot_request.get("x_column"),
+                        y_column=plot_request.get("y_column"),
+                        title=plot_request.get("title", ""),
+                        hue=plot_request.get("hue")
+                    )
                 
                 if plot_image:
                     print("Plot successfully generated!")
@@ -532,18 +621,25 @@ Format your analysis with:
                             "y_column": "Attrition Rate",
                             "title": "Attrition Rate by Department"
                         }
-                        plot_image = self.generate_plot(**auto_plot_request)
+                        with stage_timer('plot_render'):
+                            plot_image = render_plot(
+                                plot_type=auto_plot_request["type"],
+                                x_column=auto_plot_request["x_column"],
+                                y_column=auto_plot_request["y_column"],
+                                title=auto_plot_request["title"]
+                            )
                         if plot_image:
                             plot_request = auto_plot_request
                             print("Auto-generated department attrition plot")
             
-            # Add to conversation history
-            self.conversation_history.append({"role": "assistant", "content": assistant_message})
+            # Add to conversation history (long answers are stored trimmed)
+            context.add("assistant", assistant_message)
             
             # Prepare result
             result = {
                 "response": assistant_message,
-                "status": "success"
+                "status": "success",
+                "prompt_tokens": usage.get("prompt_tokens", prompt_tokens)
             }
             
             if plot_request:
@@ -569,7 +665,7 @@ Format your analysis with:
     
     def clear_conversation(self):
         """Clear conversation history."""
-        self.conversation_history = []
+        self.context.clear()
     
     def get_available_columns(self) -> List[str]:
         """Get list of available columns in the dataframe."""
@@ -583,6 +679,77 @@ def get_chatbot_instance(dataframe=None):
     """Create and return a chatbot instance."""
     return HRAnalyticsChatbot(dataframe)
 
+def plot_response(plot_image: Optional[str]) -> Dict[str, str]:
+    """The /api/debug-plot answer for a rendered plot; raises RuntimeError when there is none."""
+    if not plot_image:
+        raise RuntimeError("Failed to generate plot")
+    return {
+        "status": "success",
+        "plot_image": plot_image
+    }
+
+def plot_columns(dataframe: pd.DataFrame, params: Dict[str, Any]) -> List[str]:
+    """The columns of a chatbot's dataframe that generate_plot reads for these parameters."""
+    x_column, y_column = params.get('x_column'), params.get('y_column')
+    if ((x_column and 'factor' in x_column.lower()) or (y_column and 'correlation' in y_column.lower())
+            or (params.get('plot_type') == 'heatmap' and not params.get('columns'))):
+        # Correlations against attrition and heatmaps span every numeric column
+        wanted = {col for col in dataframe.columns if dataframe[col].dtype.kind in 'iuf'} | {'Attrition'}
+    else:
+        wanted = set(params.get('columns') or [])
+        if y_column and 'rate' in y_column.lower():
+            wanted.add('Attrition')
+        for name in (x_column, y_column, params.get('hue')):
+            if not name:
+                continue
+            # Derived features (see _create_derived_features) are rebuilt from their source column
+            name = 'Age' if name in ('Age Group', 'AgeGroup') else name
+            for suffix in ('_Band', '_Group'):
+                if name.endswith(suffix) and name[:-len(suffix)] in dataframe.columns:
+                    name = name[:-len(suffix)]
+            wanted.add(name)
+    return [col for col in dataframe.columns if col in wanted]
+
+# Plotting chatbot of a plot worker process, made on its first job
+_worker_chatbot = None
+# (version, preprocessed frame) of the shared dataset a plot worker process last attached
+_worker_shared = None
+
+def render_plot_of(dataframe: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Plot a chatbot's (already preprocessed) dataframe; plot jobs in worker processes run this.
+
+    The workers start from a fresh interpreter, so without a shared dataset the
+    data travels with each job: only the plot_columns of the frame.
+    """
+    global _worker_chatbot
+    if _worker_chatbot is None:
+        _worker_chatbot = HRAnalyticsChatbot()
+    _worker_chatbot.dataframe = dataframe
+    try:
+        return plot_response(_worker_chatbot.generate_plot(**params))
+    finally:
+        _worker_chatbot.dataframe = None
+
+def render_shared_plot(manifest_path: str, version: int, params: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Plot the shared-memory dataset; the job carries only its manifest path and version.
+
+    The worker process attaches the segment once per version, so the numeric
+    columns are read from the same pages as every web worker.
+    """
+    global _worker_chatbot, _worker_shared
+    if _worker_shared is None or _worker_shared[0] != version:
+        # Let go of the previous version's mapping before attaching the next
+        _worker_shared = None
+        shared = SharedDataset.attach(manifest_path)
+        if _worker_chatbot is None:
+            _worker_chatbot = HRAnalyticsChatbot()
+        # Preprocessing adds the <column>_Binary indicators, as it did for the web worker's chatbot
+        _worker_chatbot.set_dataframe(shared.frame())
+        _worker_shared = (shared.version, _worker_chatbot.dataframe)
+    return render_plot_of(_worker_shared[1], params)
+
 # Test function to debug plotting issues
 def test_plot_generation(dataframe, plot_type="bar", x_col="Department", y_col="Attrition Rate"):
     """Test plot generation directly without LLM interaction."""
@@ -0,0 +1,128 @@
+"""
+Pearson correlation matrix maintained from co-moment sums.
+
+`CoMoments` covers every numeric column plus a 0/1 indicator for each Yes/No
+column (named <column>_Binary, as the chatbot derives them). It keeps k x k
+pairwise sums -- counts, Σx, Σx² and Σxy over the rows where both columns
+have a value -- so the matrix is read from the sums without touching any row,
+and rows can be added or replaced (an attrition flip) in time proportional to
+the batch. Correlations match DataFrame.corr(): each pair uses the rows where
+both values are present.
+
+Values are shifted by the column means of the first block before they are
+summed, which keeps Σx² - (Σx)²/n from cancelling for columns whose mean is
+large next to their spread.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+INDICATOR_SUFFIX = '_Binary'
+# Rows per block when summing, to bound the temporary row matrix
+BLOCK_ROWS = 65536
+
+
+def indicator_sources(frame: pd.DataFrame) -> List[str]:
+    """String columns whose values are all Yes or No."""
+    sources = []
+    for name in frame.columns:
+        if frame[name].dtype == object:
+            # Most string columns are ruled out by their first rows, without a full scan
+            if not set(map(str, frame[name].head(100).dropna())) <= {'Yes', 'No'}:
+                continue
+            values = frame[name].dropna().unique()
+            if len(values) and set(map(str, values)) <= {'Yes', 'No'}:
+                sources.append(name)
+    return sources
+
+
+class CoMoments:
+    """Pairwise co-moment sums over a fixed set of columns."""
+
+    def __init__(self, numeric: List[str], indicators: List[str], shift: Optional[np.ndarray] = None):
+        self.numeric = list(numeric)
+        self.indicators = list(indicators)
+        self.columns = self.numeric + [name + INDICATOR_SUFFIX for name in self.indicators]
+        k = len(self.columns)
+        self.shift = np.zeros(k) if shift is None else shift
+        self.rows = 0
+        # [i, j] sums run over the rows where both column i and column j have a value
+        self.count = np.zeros((k, k))
+        self.sum = np.zeros((k, k))
+        self.sum_squares = np.zeros((k, k))
+        self.cross = np.zeros((k, k))
+
+    @classmethod
+    def of(cls, frame: pd.DataFrame) -> 'CoMoments':
+        numeric = [name for name in frame.columns if frame[name].dtype.kind in 'iuf']
+        indicators = [name for name in indicator_sources(frame) if name + INDICATOR_SUFFIX not in numeric]
+        moments = cls(numeric, indicators)
+        first = moments.values(frame, slice(0, BLOCK_ROWS))
+        if len(first):
+            with np.errstate(invalid='ignore'):
+                shift = np.nanmean(first, axis=0) if np.isnan(first).any() else first.mean(axis=0)
+            moments.shift = np.nan_to_num(shift)
+        moments.update(frame)
+        return moments
+
+    def values(self, frame: pd.DataFrame, rows=slice(None)) -> np.ndarray:
+        """Shifted values of `rows` (a slice, positions or boolean mask), NaN where missing."""
+        columns = []
+        for name in self.numeric:
+            columns.append(frame[name].to_numpy()[rows].astype(float))
+        for name in self.indicators:
+            values = frame[name].to_numpy()[rows]
+            columns.append(np.where(values == 'Yes', 1.0, np.where(values == 'No', 0.0, np.nan)))
+        if not columns:
+            return np.zeros((len(frame.index[rows]), 0))
+        x = np.column_stack(columns)
+        x -= self.shift
+        return x
+
+    def add(self, x: np.ndarray, sign: float = 1.0):
+        """Add (or with sign=-1 remove) rows of shifted values."""
+        present = ~np.isnan(x)
+        if present.all():
+            self.count += sign * len(x)
+            self.sum += sign * x.sum(axis=0)[:, None]
+            self.sum_squares += sign * (x * x).sum(axis=0)[:, None]
+        else:
+            x = np.where(present, x, 0.0)
+            m = present.astype(float)
+            self.count += sign * (m.T @ m)
+            self.sum += sign * (x.T @ m)
+            self.sum_squares += sign * ((x * x).T @ m)
+        self.cross += sign * (x.T @ x)
+        self.rows += int(sign) * len(x)
+
+    def update(self, frame: pd.DataFrame, rows: Optional[np.ndarray] = None):
+        """Add the rows of `frame` (or only the row positions `rows`) block by block."""
+        if rows is None:
+            for start in range(0, len(frame), BLOCK_ROWS):
+                self.add(self.values(frame, slice(start, start + BLOCK_ROWS)))
+        else:
+            for start in range(0, len(rows), BLOCK_ROWS):
+                self.add(self.values(frame, rows[start:start + BLOCK_ROWS]))
+
+    def replace(self, old: np.ndarray, new: np.ndarray):
+        """Swap rows whose shifted values changed from `old` to `new`."""
+        self.add(old, -1.0)
+        self.add(new)
+
+    def subset(self, frame: pd.DataFrame, mask: np.ndarray) -> 'CoMoments':
+        """Sums over the rows of `frame` selected by `mask`, with the same columns and shift."""
+        moments = CoMoments(self.numeric, self.indicators, self.shift)
+        moments.update(frame, np.flatnonzero(mask))
+        return moments
+
+    def correlation(self) -> pd.DataFrame:
+        """Pairwise-complete Pearson correlation matrix, NaN where a column doesn't vary."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self.cross - self.sum * self.sum.T / self.count
+            var = self.sum_squares - self.sum * self.sum / self.count
+            corr = np.clip(cov / np.sqrt(var * var.T), -1.0, 1.0)
+        corr[self.count < 2] = np.nan
+        corr[np.diag_indices_from(corr)] = np.where(np.diag(var) > 0, 1.0, np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
@@ -0,0 +1,393 @@
+"""
+Named datasets, the structures derived from each, and a registry that loads them on demand.
+
+A `Dataset` bundles a loaded frame with its aggregates, storage backend,
+manager hierarchy, risk model, employee index, simulator, chatbot and result
+caches, and a version bumped whenever its data changes, so datasets never
+share derived state. `DatasetRegistry` maps names to CSV files and loads a
+dataset the first time a request selects it. After each load it evicts the
+least recently used datasets until the estimated memory of the rest fits the
+budget; the default dataset and the one just loaded are never evicted.
+Loads and evictions are exported through metrics.REGISTRY.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from aggregates import ATTRITION_INDICATOR, AggregateState
+from association import CategoryCodes, attrition_codes, rank_factors, rank_tables
+from chatbot import get_chatbot_instance
+from employee_index import EmployeeIndex
+from filters import canonicalize_filters, filter_domain, filter_mask, filters_key, parse_filter_args
+from hierarchy import build_hierarchy
+from metrics import REGISTRY
+from result_cache import CACHES, ResultCache
+from risk_model import RiskModel
+from simulation import Simulator
+from storage import PandasBackend
+from survival import build_tenure_frame
+from werkzeug.datastructures import MultiDict
+
+REGISTRY.counter('dataset_loads_total', 'Datasets loaded into memory by the registry')
+REGISTRY.counter('dataset_evictions_total', 'Datasets evicted to stay within the memory budget')
+REGISTRY.histogram('dataset_load_seconds', 'Time taken to load a dataset and build its derived structures')
+
+# String values sampled per column when estimating a dataset's memory
+MEMORY_SAMPLE_VALUES = 1000
+
+# Every registry created, for the gauges below
+REGISTRIES: List['DatasetRegistry'] = []
+
+
+class UnknownDatasetError(KeyError):
+    """A request selected a dataset name the registry doesn't know."""
+
+
+def dataset_paths(spec: Optional[str] = None, directory: Optional[str] = None) -> Dict[str, str]:
+    """Dataset names and CSV paths from "name=path,..." and from every CSV in `directory` (named by stem)."""
+    paths = {}
+    if directory and os.path.isdir(directory):
+        for entry in sorted(os.listdir(directory)):
+            stem, extension = os.path.splitext(entry)
+            if extension.lower() == '.csv':
+                paths[stem] = os.path.join(directory, entry)
+    for item in (spec or '').split(','):
+        if item.strip():
+            name, _, path = item.partition('=')
+            if not path.strip():
+                raise ValueError(f"Expected name=path in DATASETS, got {item.strip()!r}")
+            paths[name.strip()] = path.strip()
+    return paths
+
+
+def frame_bytes(frame: pd.DataFrame) -> int:
+    """Estimated memory of `frame`; string columns are sized from a sample of their values."""
+    total = int(frame.memory_usage(index=True, deep=False).sum())
+    for name in frame.columns:
+        column = frame[name]
+        if column.dtype == object and len(column):
+            # memory_usage(deep=True) sizes every string, which takes seconds on millions of rows
+            sample = column.iloc[::max(len(column) // MEMORY_SAMPLE_VALUES, 1)]
+            total += int(sum(map(sys.getsizeof, sample)) / len(sample) * len(column))
+    return total
+
+
+def array_bytes(*objects) -> int:
+    """Bytes of the numpy arrays held in the attributes of `objects` (directly or in a dict or list)."""
+    total = 0
+    for obj in objects:
+        if obj is None:
+            continue
+        for value in vars(obj).values():
+            values = value.values() if isinstance(value, dict) else value if isinstance(value, list) else [value]
+            total += sum(item.nbytes for item in values if isinstance(item, np.ndarray))
+    return total
+
+
+class Dataset:
+    """One loaded dataset with its derived structures, caches and version."""
+
+    def __init__(self, name: str, path: str, frame: pd.DataFrame, aggregates: AggregateState, storage,
+                 employee_records: Optional[pd.DataFrame] = None, chatbot=None, version: int = 1,
+                 filter_cache_size: int = 256, correlation_cache_size: int = 64, cache_suffix: str = ''):
+        self.name = name
+        self.path = path
+        self.df = frame
+        # Counters, correlation sums and monthly rollups, updated in place by appends
+        self.aggregates = aggregates
+        # Aggregations go through the storage backend (in-process pandas, streaming or SQL pushdown)
+        self.storage = storage
+        # Hire/exit dates and manager links generated by Datasets/Dataset_gen_new.py
+        self.employee_records = employee_records
+        self.employee_record_index = None
+        if employee_records is not None:
+            self.employee_record_index = pd.Index(employee_records['EmployeeNumber'])
+
+        # Bumped whenever the data changes so derived caches can be invalidated
+        self.version = version
+        self.append_lock = threading.Lock()
+
+        # Reporting tree index for team-level rollups (needs manager_id from employees.csv)
+        self.hierarchy = build_hierarchy(frame, employee_records)
+        self.hierarchy_version = version
+
+        # Attrition risk scores and per-column sort permutations for /api/employees,
+        # and the per-department baseline risk for /api/simulate
+        self.risk_model = RiskModel.fit(frame)
+        logits = self.risk_model.logit(frame)
+        self.employee_index = EmployeeIndex(frame, RiskModel.probability(logits))
+        self.simulator = Simulator(frame, self.risk_model, logits)
+        del logits
+
+        # Tenure frame and survival curves, keyed by version
+        self.tenure_cache = {}
+        self.survival_cache = {}
+        # Filtered-data results keyed by canonicalized filters, dropped when the version changes
+        self.filtered_cache = ResultCache('filtered_data' + cache_suffix, filter_cache_size)
+        # Range bounds and department names used to canonicalize filters, keyed by version
+        self.filter_domain_cache = {}
+        # Correlation matrices (and their row counts) keyed by canonicalized filters
+        self.correlation_cache = ResultCache('correlation_matrix' + cache_suffix, correlation_cache_size)
+        # Ranked attrition associations keyed by canonicalized filters, and the category codes behind them
+        self.association_cache = ResultCache('predictive_factors' + cache_suffix, correlation_cache_size)
+        self.category_codes = None
+
+        # A reloaded dataset keeps the chatbot (and its conversation) of the version it replaces
+        if chatbot is None:
+            chatbot = get_chatbot_instance(frame)
+        else:
+            chatbot.set_dataframe(frame)
+        # The chatbot adds <column>_Binary indicators for Yes/No columns; sketch those too
+        aggregates.sketches.add_indicators(frame.columns)
+        chatbot.set_sketches(aggregates.sketches)
+        chatbot.set_correlations(lambda: self.correlation_matrix()[0])
+        self.chatbot = chatbot
+
+        # Counted against the registry's memory budget; estimated once, appends barely change it
+        self.memory_bytes = frame_bytes(frame) + array_bytes(
+            aggregates, aggregates.comoments, self.hierarchy, self.employee_index, self.simulator)
+
+    @classmethod
+    def from_csv(cls, name: str, path: str, **options) -> 'Dataset':
+        """Load a CSV into memory and build everything derived from it."""
+        frame = pd.read_csv(path)
+        aggregates = AggregateState(frame)
+        return cls(name, path, frame, aggregates, PandasBackend(frame, aggregates), **options)
+
+    def filter_domain(self):
+        """Return the filter domain of the current version (None when the database answers)"""
+        # The database table may hold other rows than the in-process frame, so only syntax is normalized
+        if self.storage.name == 'sql':
+            return None
+        version = self.version
+        if version not in self.filter_domain_cache:
+            self.filter_domain_cache.clear()
+            # The count cube holds every distinct value of the filtered columns
+            source = self.storage.cube if self.storage.name == 'streaming' else self.df
+            self.filter_domain_cache[version] = filter_domain(source)
+        return self.filter_domain_cache[version]
+
+    def filtered_summary(self, filters):
+        """Return the filtered summary, sharing one cache entry between equivalent filters"""
+        version = self.version
+        backend = self.storage
+        canonical = canonicalize_filters(filters, self.filter_domain())
+        return self.filtered_cache.get_or_compute(version, filters_key(canonical),
+                                                  lambda: backend.filtered_summary(canonical))
+
+    def _subset_key(self, filters):
+        """Return (cache key, canonical filters); the key is None when the filters select every row"""
+        if filters is None:
+            return None, None
+        domain = self.filter_domain()
+        canonical = canonicalize_filters(filters, domain)
+        # Filters that select every row share the unfiltered entry
+        if filters_key(canonical) == filters_key(canonicalize_filters(parse_filter_args(MultiDict()), domain)):
+            return None, canonical
+        return filters_key(canonical), canonical
+
+    def correlation_matrix(self, filters=None):
+        """Return (matrix, rows) for the rows matching filters, every row when None or equivalent"""
+        version = self.version
+        state, frame = self.aggregates, self.df
+        key, canonical = self._subset_key(filters)
+
+        if key is None:
+            # Straight from the co-moment sums, which appends keep current
+            compute = lambda: (state.correlation_matrix(), state.total)
+        elif self.storage.name == 'streaming':
+            raise LookupError("Filtered correlations need every row, which streaming mode doesn't keep")
+        else:
+            # One blocked pass (a GEMM per block) over the matching rows
+            def compute():
+                subset = state.comoments.subset(frame, filter_mask(frame, canonical))
+                return subset.correlation(), subset.rows
+        return self.correlation_cache.get_or_compute(version, key, compute)
+
+    def factor_associations(self, filters=None):
+        """Return (factors, rows): every column ranked by its association with attrition"""
+        version = self.version
+        frame = self.df
+        key, canonical = self._subset_key(filters)
+        if self.storage.name == 'streaming':
+            if key is not None:
+                raise LookupError("Filtered associations need every row, which streaming mode doesn't keep")
+            # The frame is only a sample; the tables were counted over every row in the streaming pass
+            def compute():
+                matrix, rows = self.correlation_matrix()
+                return rank_tables(matrix[ATTRITION_INDICATOR], self.aggregates.category_tables.tables()), rows
+            return self.association_cache.get_or_compute(version, None, compute)
+
+        if self.category_codes is None:
+            # Appends only change Attrition, so the codes of the other columns last for the dataset
+            self.category_codes = CategoryCodes(frame)
+        categories = self.category_codes
+
+        def compute():
+            matrix, rows = self.correlation_matrix(filters)
+            mask = None if key is None else filter_mask(frame, canonical)
+            return rank_factors(matrix[ATTRITION_INDICATOR], categories, attrition_codes(frame), mask), rows
+        return self.association_cache.get_or_compute(version, key, compute)
+
+    def tenure_frame(self) -> pd.DataFrame:
+        """Return the tenure/exit frame for the current version"""
+        version = self.version
+        if version not in self.tenure_cache:
+            self.tenure_cache.clear()
+            self.tenure_cache[version] = build_tenure_frame(self.df, self.employee_records)
+        return self.tenure_cache[version]
+
+    def current_hierarchy(self):
+        """Return the manager hierarchy with prefix sums for the current version"""
+        if self.hierarchy is not None and self.hierarchy_version != self.version:
+            self.hierarchy.set_metrics((self.df['Attrition'] == 'Yes').to_numpy(),
+                                       self.df['JobSatisfaction'].to_numpy())
+            self.hierarchy_version = self.version
+        return self.hierarchy
+
+    def append_rows(self, kind: str, batch: pd.DataFrame):
+        """Fold appended attrition_events or monthly_metrics rows in; returns (result, changed)"""
+        with self.append_lock:
+            if kind == 'attrition_events':
+                result, applied = self.aggregates.apply_attrition_events(batch)
+                records = self.employee_records
+                if records is not None and len(applied) and 'exit_date' in applied.columns:
+                    # Keep the survival analysis in step with the new exits
+                    rows = self.employee_record_index.get_indexer(pd.to_numeric(applied['employee_id']))
+                    found = rows >= 0
+                    records.iloc[rows[found], records.columns.get_loc('exit_date')] = \
+                        applied['exit_date'].to_numpy()[found]
+                changed = result['applied'] > 0
+            else:
+                result = {'rows': self.aggregates.append_monthly_metrics(batch)}
+                changed = result['rows'] > 0
+
+            if changed:
+                self.version += 1
+        return result, changed
+
+    def close(self):
+        """Stop reporting this dataset's caches; called when it is evicted or replaced."""
+        for cache in (self.filtered_cache, self.correlation_cache, self.association_cache):
+            cache.clear()
+            if cache in CACHES:
+                CACHES.remove(cache)
+
+
+class DatasetRegistry:
+    """Datasets by name, loaded on first use and kept resident within a memory budget."""
+
+    def __init__(self, paths: Dict[str, str], loader: Callable[[str, str], Dataset], budget_bytes: int,
+                 default: Dataset):
+        self.paths = dict(paths)
+        self.paths[default.name] = default.path
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.default = default.name
+        # Least recently used first
+        self._resident: 'OrderedDict[str, Dataset]' = OrderedDict([(default.name, default)])
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        REGISTRIES.append(self)
+
+    def names(self) -> List[str]:
+        return sorted(self.paths)
+
+    def resident(self) -> List[Dataset]:
+        with self._lock:
+            return list(self._resident.values())
+
+    def get(self, name: Optional[str] = None) -> Dataset:
+        """The dataset called `name` (the default one when None), loading it if it isn't resident."""
+        name = name or self.default
+        with self._lock:
+            dataset = self._lookup(name)
+            if dataset is not None:
+                return dataset
+            if name not in self.paths:
+                raise UnknownDatasetError(f"Unknown dataset {name}; available: {', '.join(self.names())}")
+            load_lock = self._loading.setdefault(name, threading.Lock())
+
+        # Requests for the same dataset wait for one load; other datasets load in parallel
+        with load_lock:
+            with self._lock:
+                dataset = self._lookup(name)
+                if dataset is not None:
+                    return dataset
+            started = time.perf_counter()
+            dataset = self.loader(name, self.paths[name])
+            elapsed = time.perf_counter() - started
+            REGISTRY.inc('dataset_loads_total', dataset=name)
+            REGISTRY.observe('dataset_load_seconds', elapsed, dataset=name)
+            with self._lock:
+                self._resident[name] = dataset
+                evicted = self._evict(keep=name)
+
+        print(f"Loaded dataset {name} ({len(dataset.df)} rows, ~{dataset.memory_bytes / 2 ** 20:.0f} MB) "
+              f"in {elapsed:.1f}s")
+        for old in evicted:
+            old.close()
+            print(f"Evicted dataset {old.name} to stay within {self.budget_bytes / 2 ** 20:.0f} MB")
+        return dataset
+
+    def replace(self, dataset: Dataset):
+        """Swap in a rebuilt version of a resident dataset (e.g. after a shared-memory reload)."""
+        with self._lock:
+            old = self._resident.get(dataset.name)
+            self._resident[dataset.name] = dataset
+        if old is not None and old is not dataset:
+            old.close()
+
+    def describe(self) -> List[Dict]:
+        """Name, file and, for resident datasets, size and version of every known dataset."""
+        with self._lock:
+            resident = dict(self._resident)
+        listing = []
+        for name in self.names():
+            dataset = resident.get(name)
+            entry = {'name': name, 'file': os.path.basename(self.paths[name]),
+                     'default': name == self.default, 'resident': dataset is not None}
+            if dataset is not None:
+                entry.update({'rows': dataset.aggregates.total, 'datasetVersion': dataset.version,
+                              'memoryBytes': dataset.memory_bytes, 'storage': dataset.storage.name})
+            listing.append(entry)
+        return listing
+
+    def _lookup(self, name: str) -> Optional[Dataset]:
+        dataset = self._resident.get(name)
+        if dataset is not None:
+            self._resident.move_to_end(name)
+        return dataset
+
+    def _evict(self, keep: str) -> List[Dataset]:
+        """Drop least recently used datasets until the rest fit the budget (call with the lock held)."""
+        evicted = []
+        total = sum(dataset.memory_bytes for dataset in self._resident.values())
+        for name in list(self._resident):
+            if total <= self.budget_bytes:
+                break
+            if name in (keep, self.default):
+                continue
+            dataset = self._resident.pop(name)
+            total -= dataset.memory_bytes
+            evicted.append(dataset)
+            REGISTRY.inc('dataset_evictions_total', dataset=name)
+        return evicted
+
+
+REGISTRY.gauge('dataset_rows', 'Rows in each resident dataset',
+               lambda: {(('dataset', dataset.name),): dataset.aggregates.total
+                        for registry in REGISTRIES for dataset in registry.resident()})
+REGISTRY.gauge('dataset_version', 'Current version of each resident dataset',
+               lambda: {(('dataset', dataset.name),): dataset.version
+                        for registry in REGISTRIES for dataset in registry.resident()})
+REGISTRY.gauge('dataset_memory_bytes', 'Estimated memory of each resident dataset',
+               lambda: {(('dataset', dataset.name),): dataset.memory_bytes
+                        for registry in REGISTRIES for dataset in registry.resident()})
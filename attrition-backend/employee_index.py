@@ -0,0 +1,136 @@
+"""
+Sorted indexes for employee-level listings.
+
+Every indexed column gets one sort permutation, built once per dataset
+version: the row positions ordered by (value, EmployeeNumber, row position).
+The row position keeps the key unique even if user-supplied data repeats an
+EmployeeNumber. A page is addressed by a keyset cursor -- the key of the last
+row it returned -- and the next page starts at a binary search through the
+permutation, so page N costs the same as page 1 and no request sorts.
+Filters are applied while walking the permutation, in blocks that grow
+until the page is full.
+"""
+
+import base64
+import json
+import math
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+RISK_COLUMN = 'RiskScore'
+
+# Columns /api/employees can sort by
+INDEXED_COLUMNS = [
+    RISK_COLUMN, 'JobSatisfaction', 'EnvironmentSatisfaction', 'WorkLifeBalance',
+    'YearsSinceLastPromotion', 'YearsAtCompany', 'YearsInCurrentRole', 'YearsWithCurrManager',
+    'TotalWorkingYears', 'MonthlyIncome', 'PerformanceRating', 'Age', 'DistanceFromHome',
+]
+
+# Columns returned for each employee unless the request projects its own
+LISTING_COLUMNS = [
+    'EmployeeNumber', 'Department', 'JobRole', 'JobLevel', 'Gender', 'Age', 'MonthlyIncome',
+    'YearsAtCompany', 'YearsSinceLastPromotion', 'JobSatisfaction', 'OverTime', 'Attrition',
+]
+
+
+class EmployeeIndex:
+    """Sort permutations over one version of the dataset."""
+
+    def __init__(self, dataframe: pd.DataFrame, risk_scores: Optional[np.ndarray] = None,
+                 columns: List[str] = INDEXED_COLUMNS):
+        self.dataframe = dataframe
+        self.risk_scores = risk_scores
+        self.employee_ids = dataframe['EmployeeNumber'].to_numpy()
+        position_dtype = np.int32 if len(dataframe) < 2 ** 31 else np.int64
+
+        self.values: Dict[str, np.ndarray] = {}
+        self.order: Dict[str, np.ndarray] = {}
+        for name in columns:
+            if name == RISK_COLUMN:
+                if risk_scores is None:
+                    continue
+                values = risk_scores
+            elif name in dataframe.columns and dataframe[name].dtype.kind in 'biuf':
+                values = dataframe[name].to_numpy()
+            else:
+                continue
+            # Rows without a value can't be compared against a cursor, so they are left out
+            rows = np.flatnonzero(~np.isnan(values)) if values.dtype.kind == 'f' else np.arange(len(values))
+            order = rows[np.lexsort((rows, self.employee_ids[rows], values[rows]))]
+            self.values[name] = values
+            self.order[name] = order.astype(position_dtype)
+
+    def _start(self, column: str, after: Tuple[Any, Any, int], descending: bool) -> int:
+        """Position in the permutation of the first row past the cursor."""
+        values, ids = self.values[column], self.employee_ids
+        key = lambda row: (values[row], ids[row], row)
+        if descending:
+            # Walking backwards: the last position strictly before the cursor
+            return bisect_left(self.order[column], after, key=key) - 1
+        return bisect_right(self.order[column], after, key=key)
+
+    def page(self, column: str, mask: Optional[np.ndarray] = None, limit: int = 50,
+             descending: bool = False, after: Optional[Tuple[Any, Any, int]] = None) -> Tuple[np.ndarray, bool]:
+        """Return the row positions of one page and whether more rows follow."""
+        order = self.order[column]
+        if after is not None:
+            position = self._start(column, after, descending)
+        else:
+            position = len(order) - 1 if descending else 0
+
+        # One row past the page tells us whether there is a next page
+        needed = limit + 1
+        block_size = max(needed * 4, 256)
+        blocks = []
+        while needed > 0 and 0 <= position < len(order):
+            if descending:
+                block = order[max(position - block_size + 1, 0):position + 1][::-1]
+                position -= len(block)
+            else:
+                block = order[position:position + block_size]
+                position += len(block)
+            if mask is not None:
+                block = block[mask[block]]
+            blocks.append(block[:needed])
+            needed -= len(blocks[-1])
+            # Sparse filters need longer walks; grow the blocks rather than looping row by row
+            block_size *= 2
+
+        rows = np.concatenate(blocks) if blocks else np.zeros(0, dtype=order.dtype)
+        return rows[:limit], len(rows) > limit
+
+    def cursor_after(self, column: str, row: int, descending: bool) -> str:
+        """Opaque cursor for the page that follows `row`."""
+        return encode_cursor({
+            'sort': column,
+            'order': 'desc' if descending else 'asc',
+            'value': self.values[column][row].item(),
+            'id': self.employee_ids[row].item(),
+            'row': int(row),
+        })
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor from encode_cursor; raises ValueError if it is malformed."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(state, dict) or not {'sort', 'order', 'value', 'id', 'row'} <= state.keys():
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor") from None
+    # The key is compared against the indexed values, so it must be numeric
+    if not (_is_number(state['value']) and _is_number(state['id'])
+            and isinstance(state['row'], int) and not isinstance(state['row'], bool) and state['row'] >= 0):
+        raise ValueError("Malformed cursor")
+    return state
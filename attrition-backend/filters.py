@@ -0,0 +1,176 @@
+"""
+Filter parameters shared by /api/filtered-data and the storage backends.
+
+canonicalize_filters() rewrites a filter dict into an equivalent normal form
+(sorted departments, ranges clamped to the data, lower-cased choices), so
+requests that select the same rows share one cache key. A range that selects
+nothing becomes EMPTY_RANGE, which no value falls in.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+EDUCATION_FILTER_MAPPING = {'highschool': 1, 'bachelors': 2, 'masters': 3, 'phd': 4}
+ROLE_FILTER_MAPPING = {
+    'entrylevel': 1, 'midlevel': 2, 'seniorlevel': 3,
+    'lead': 4, 'manager': 5, 'director': 6, 'vp': 7, 'executive': 8
+}
+
+# (filter key prefix, dataset column) for the numeric range filters
+RANGE_FILTERS = [
+    ('tenure', 'YearsAtCompany'),
+    ('satisfaction', 'JobSatisfaction'),
+    ('performance', 'PerformanceRating'),
+]
+
+# Every column filter_mask reads, with the at-risk inputs folded into one AtRisk flag;
+# counts grouped by these columns answer any filter (see StreamingBackend)
+AT_RISK_COLUMN = 'AtRisk'
+FILTER_COLUMNS = [column for _, column in RANGE_FILTERS] + ['Department', 'Gender', 'Education', 'JobLevel']
+
+# (min, max) of a range that selects no rows
+EMPTY_RANGE = (float('inf'), float('-inf'))
+
+
+def parse_filter_args(args) -> Dict[str, Any]:
+    """Read the filter parameters from request args, applying the API defaults."""
+    return {
+        'tenure_min': args.get('tenureMin', 0, type=float),
+        'tenure_max': args.get('tenureMax', 100, type=float),
+        'satisfaction_min': args.get('satisfactionMin', 1, type=float),
+        'satisfaction_max': args.get('satisfactionMax', 5, type=float),
+        'performance_min': args.get('performanceMin', 1, type=float),
+        'performance_max': args.get('performanceMax', 5, type=float),
+        'departments': args.getlist('departments'),
+        'at_risk': args.get('atRisk', 'false').lower() == 'true',
+        'gender': args.get('gender', 'all'),
+        'education': args.get('education', 'all'),
+        'role': args.get('role', 'all'),
+    }
+
+
+def filter_domain(df: pd.DataFrame) -> Dict[str, Any]:
+    """Value bounds of the range columns and the department names, for canonicalize_filters."""
+    bounds = {}
+    for key, column in RANGE_FILTERS:
+        values = df[column]
+        # Missing values never match a range, so the bounds of the present values decide
+        bounds[key] = (float(values.min()), float(values.max())) if values.notna().any() else None
+    departments = df['Department']
+    return {
+        'bounds': bounds,
+        # Only a column without missing values is fully covered by listing every department
+        'departments': frozenset(departments.dropna().unique()) if departments.notna().all() else None,
+    }
+
+
+def canonicalize_filters(filters: Dict[str, Any], domain: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return filters selecting the same rows in a normal form; see filters_key()."""
+    canonical = dict(filters)
+    canonical['departments'] = sorted(set(filters['departments']))
+    for key in ('gender', 'education', 'role'):
+        canonical[key] = str(filters[key]).strip().lower()
+    if canonical['education'] not in EDUCATION_FILTER_MAPPING:
+        canonical['education'] = 'all'
+    if canonical['role'] not in ROLE_FILTER_MAPPING:
+        canonical['role'] = 'all'
+    canonical['at_risk'] = bool(filters['at_risk'])
+
+    if domain is not None:
+        for key, _ in RANGE_FILTERS:
+            bounds = domain['bounds'][key]
+            if bounds is None:
+                continue
+            # Any range reaching past the data on either side selects the same rows
+            low, high = bounds
+            canonical[f'{key}_min'] = max(float(filters[f'{key}_min']), low)
+            canonical[f'{key}_max'] = min(float(filters[f'{key}_max']), high)
+            # Empty ranges share one form that matches nothing; the clamped bounds themselves
+            # can coincide on a single-valued column and would then select every row
+            if canonical[f'{key}_min'] > canonical[f'{key}_max']:
+                canonical[f'{key}_min'], canonical[f'{key}_max'] = EMPTY_RANGE
+        if domain['departments'] is not None and domain['departments'] <= set(canonical['departments']):
+            canonical['departments'] = []
+    return canonical
+
+
+def filters_key(filters: Dict[str, Any]) -> Tuple:
+    """Hashable key for canonicalized filters."""
+    return tuple((name, tuple(value) if isinstance(value, list) else value) for name, value in sorted(filters.items()))
+
+
+def filter_mask(df: pd.DataFrame, filters: Dict[str, Any]) -> np.ndarray:
+    """Return a boolean row mask for the given filters."""
+    mask = np.ones(len(df), dtype=bool)
+
+    for key, column in RANGE_FILTERS:
+        values = df[column].to_numpy()
+        mask &= (values >= filters[f'{key}_min']) & (values <= filters[f'{key}_max'])
+
+    if filters['departments']:
+        mask &= df['Department'].isin(filters['departments']).to_numpy()
+
+    if filters['gender'] != 'all':
+        mask &= (df['Gender'] == filters['gender'].capitalize()).to_numpy()
+
+    if filters['education'] in EDUCATION_FILTER_MAPPING:
+        mask &= (df['Education'] == EDUCATION_FILTER_MAPPING[filters['education']]).to_numpy()
+
+    if filters['role'] in ROLE_FILTER_MAPPING:
+        mask &= (df['JobLevel'] == ROLE_FILTER_MAPPING[filters['role']]).to_numpy()
+
+    if filters['at_risk']:
+        mask &= at_risk_mask(df)
+
+    return mask
+
+
+def at_risk_mask(df: pd.DataFrame) -> np.ndarray:
+    """Rows matching the atRisk filter (precomputed in an AtRisk column when the frame has one)."""
+    if AT_RISK_COLUMN in df.columns:
+        return df[AT_RISK_COLUMN].to_numpy(dtype=bool)
+    # Define at-risk criteria (example: low satisfaction + high overtime + low performance)
+    return ((df['JobSatisfaction'] <= 2) |
+            (df['WorkLifeBalance'] <= 2) |
+            (df['OverTime'] == 'Yes')).to_numpy()
+
+
+def filter_sql(filters: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Return a parameterized WHERE clause (without the keyword) for the given filters."""
+    clauses: List[str] = []
+    params: Dict[str, Any] = {}
+
+    for key, column in RANGE_FILTERS:
+        if filters[f'{key}_min'] > filters[f'{key}_max']:
+            # Infinite bounds don't bind to integer columns in every database
+            clauses.append('1 = 0')
+            continue
+        clauses.append(f'"{column}" BETWEEN :{key}_min AND :{key}_max')
+        params[f'{key}_min'] = filters[f'{key}_min']
+        params[f'{key}_max'] = filters[f'{key}_max']
+
+    if filters['departments']:
+        names = []
+        for i, department in enumerate(filters['departments']):
+            names.append(f':department_{i}')
+            params[f'department_{i}'] = department
+        clauses.append(f'"Department" IN ({", ".join(names)})')
+
+    if filters['gender'] != 'all':
+        clauses.append('"Gender" = :gender')
+        params['gender'] = filters['gender'].capitalize()
+
+    if filters['education'] in EDUCATION_FILTER_MAPPING:
+        clauses.append('"Education" = :education')
+        params['education'] = EDUCATION_FILTER_MAPPING[filters['education']]
+
+    if filters['role'] in ROLE_FILTER_MAPPING:
+        clauses.append('"JobLevel" = :job_level')
+        params['job_level'] = ROLE_FILTER_MAPPING[filters['role']]
+
+    if filters['at_risk']:
+        clauses.append('("JobSatisfaction" <= 2 OR "WorkLifeBalance" <= 2 OR "OverTime" = \'Yes\')')
+
+    return ' AND '.join(clauses), params
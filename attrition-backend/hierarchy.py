@@ -0,0 +1,196 @@
+"""
+Manager hierarchy index for team-level rollups.
+
+The reporting tree is built from parent arrays (employee -> manager) and laid
+out in Euler-tour (pre-order) order, so every manager's subtree occupies the
+contiguous range [tin, tout). Prefix sums over that order turn per-team
+headcount, attrition and satisfaction into O(1) lookups.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class ManagerHierarchy:
+    """Euler-tour index over the employee -> manager tree."""
+
+    def __init__(self, employee_ids, manager_ids):
+        employee_ids = np.asarray(employee_ids, dtype=np.int64)
+        manager_ids = pd.to_numeric(pd.Series(manager_ids), errors='coerce').to_numpy(dtype=float)
+
+        self.employee_ids = employee_ids
+        self.n = len(employee_ids)
+
+        # Resolve manager ids to row positions; unknown or missing managers make roots
+        sorter = np.argsort(employee_ids, kind='stable')
+        has_manager = ~np.isnan(manager_ids)
+        manager_keys = np.where(has_manager, manager_ids, -1).astype(np.int64)
+        pos = np.searchsorted(employee_ids, manager_keys, sorter=sorter).clip(0, max(self.n - 1, 0))
+        candidate = sorter[pos] if self.n else pos
+        found = has_manager & (employee_ids[candidate] == manager_keys) if self.n else has_manager
+
+        self._sorter = sorter
+        self.parent = np.where(found, candidate, -1)
+        self.parent[self.parent == np.arange(self.n)] = -1
+        self.cycles_broken = 0
+
+        self._build()
+
+    def _depths(self) -> np.ndarray:
+        """Assign depths level by level from the roots; unreachable nodes stay -1."""
+        # Children grouped by parent (CSR layout) so each level only touches its own nodes
+        has_parent = self.parent >= 0
+        by_parent = np.flatnonzero(has_parent)
+        by_parent = by_parent[np.argsort(self.parent[by_parent], kind='stable')]
+        counts = np.bincount(self.parent[has_parent], minlength=self.n)
+        offsets = np.r_[0, np.cumsum(counts)]
+
+        depth = np.full(self.n, -1, dtype=np.int64)
+        frontier = np.flatnonzero(~has_parent)
+        level = 0
+        while len(frontier):
+            depth[frontier] = level
+            child_counts = counts[frontier]
+            total = child_counts.sum()
+            # Concatenate the child ranges of every frontier node without a Python loop
+            starts = np.repeat(offsets[frontier] - (np.cumsum(child_counts) - child_counts), child_counts)
+            frontier = by_parent[starts + np.arange(total)]
+            level += 1
+        return depth
+
+    def _break_cycles(self, depth: np.ndarray):
+        """Cut one edge on every manager cycle so each cycle gets a root."""
+        # Walk up from each unreachable node, stamping nodes with the walk that visited them;
+        # meeting a node stamped by the current walk means we went round a cycle
+        stamp = np.where(depth < 0, -1, -2)
+        for start in np.flatnonzero(depth < 0):
+            node = start
+            while stamp[node] == -1:
+                stamp[node] = start
+                node = self.parent[node]
+            if stamp[node] == start:
+                self.parent[node] = -1
+                self.cycles_broken += 1
+
+    def _build(self):
+        depth = self._depths()
+        if (depth < 0).any():
+            self._break_cycles(depth)
+            depth = self._depths()
+        self.depth = depth
+
+        # Group nodes by level once; every pass below walks the levels in order
+        by_depth = np.argsort(depth, kind='stable')
+        bounds = np.r_[0, np.cumsum(np.bincount(depth, minlength=depth.max(initial=0) + 1))]
+        levels = [by_depth[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+        # Subtree sizes, accumulated bottom-up one level at a time
+        size = np.ones(self.n, dtype=np.int64)
+        for nodes in reversed(levels[1:]):
+            size += np.bincount(self.parent[nodes], weights=size[nodes], minlength=self.n).astype(np.int64)
+        self.size = size
+
+        # Pre-order positions: a child starts after its parent and its earlier siblings' subtrees
+        tin = np.zeros(self.n, dtype=np.int64)
+        for level, nodes in enumerate(levels):
+            if level == 0:
+                groups = np.zeros(len(nodes), dtype=np.int64)
+                base = np.zeros(len(nodes), dtype=np.int64)
+            else:
+                nodes = nodes[np.argsort(self.parent[nodes], kind='stable')]
+                groups = self.parent[nodes]
+                base = tin[groups] + 1
+            sizes = size[nodes]
+            before = np.cumsum(sizes) - sizes
+            group_start = np.r_[True, groups[1:] != groups[:-1]]
+            first = np.maximum.accumulate(np.where(group_start, np.arange(len(nodes)), 0))
+            tin[nodes] = base + before - before[first]
+
+        self.tin = tin
+        self.tout = tin + size
+        self.order = np.empty(self.n, dtype=np.int64)
+        self.order[tin] = np.arange(self.n)
+        self.direct_reports = np.bincount(self.parent[self.parent >= 0], minlength=self.n)
+
+    def set_metrics(self, attrited, satisfaction):
+        """(Re)compute the prefix sums used by team lookups."""
+        attrited = np.asarray(attrited, dtype=np.int64)[self.order]
+        satisfaction = np.asarray(satisfaction, dtype=float)[self.order]
+        self._attrition_prefix = np.r_[0, np.cumsum(attrited)]
+        self._satisfaction_prefix = np.r_[0.0, np.cumsum(satisfaction)]
+
+    def position(self, employee_id: int) -> Optional[int]:
+        """Return the row position of an employee id, or None if unknown."""
+        pos = np.searchsorted(self.employee_ids, employee_id, sorter=self._sorter)
+        if pos < self.n and self.employee_ids[self._sorter[pos]] == employee_id:
+            return int(self._sorter[pos])
+        return None
+
+    def _team_arrays(self, nodes: np.ndarray) -> Dict[str, np.ndarray]:
+        """Team rollups (the manager's subtree excluding the manager) for many nodes."""
+        start = self.tin[nodes] + 1
+        stop = self.tout[nodes]
+        headcount = stop - start
+        attrition = self._attrition_prefix[stop] - self._attrition_prefix[start]
+        satisfaction = self._satisfaction_prefix[stop] - self._satisfaction_prefix[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.where(headcount > 0, attrition / headcount * 100, 0.0)
+            avg_satisfaction = np.where(headcount > 0, satisfaction / headcount, np.nan)
+        return {
+            'headcount': headcount,
+            'attrition': attrition,
+            'rate': rate,
+            'satisfaction': avg_satisfaction,
+        }
+
+    def _format(self, nodes: np.ndarray, stats: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        return [
+            {
+                'managerId': int(self.employee_ids[node]),
+                'directReports': int(self.direct_reports[node]),
+                'teamSize': int(stats['headcount'][i]),
+                'attritionCount': int(stats['attrition'][i]),
+                'attritionRate': round(float(stats['rate'][i]), 2),
+                'avgSatisfaction': None if np.isnan(stats['satisfaction'][i])
+                else round(float(stats['satisfaction'][i]), 2),
+                'depth': int(self.depth[node]),
+            }
+            for i, node in enumerate(nodes)
+        ]
+
+    def team_stats(self, employee_id: int) -> Optional[Dict[str, Any]]:
+        """Return headcount, attrition and average satisfaction for one manager's team."""
+        node = self.position(employee_id)
+        if node is None:
+            return None
+        nodes = np.array([node])
+        return self._format(nodes, self._team_arrays(nodes))[0]
+
+    def worst_teams(self, k: int = 10, min_team_size: int = 5) -> List[Dict[str, Any]]:
+        """Return the k teams with the highest attrition rate among teams of at least min_team_size."""
+        managers = np.flatnonzero(self.size - 1 >= max(min_team_size, 1))
+        if len(managers) == 0 or k <= 0:
+            return []
+        stats = self._team_arrays(managers)
+        k = min(k, len(managers))
+        top = np.argpartition(-stats['rate'], k - 1)[:k]
+        # Highest rate first, larger teams break ties
+        top = top[np.lexsort((-stats['headcount'][top], -stats['rate'][top]))]
+        return self._format(managers[top], {key: values[top] for key, values in stats.items()})
+
+
+def build_hierarchy(df: pd.DataFrame, employee_records: Optional[pd.DataFrame]) -> Optional[ManagerHierarchy]:
+    """Build the hierarchy index from employees.csv manager links, if available."""
+    if employee_records is None or 'manager_id' not in employee_records.columns:
+        return None
+
+    links = employee_records[['EmployeeNumber', 'manager_id']].drop_duplicates('EmployeeNumber')
+    managers = df[['EmployeeNumber']].merge(links, on='EmployeeNumber', how='left')['manager_id']
+
+    hierarchy = ManagerHierarchy(df['EmployeeNumber'].to_numpy(), managers.to_numpy())
+    hierarchy.set_metrics((df['Attrition'] == 'Yes').to_numpy(), df['JobSatisfaction'].to_numpy())
+    print(f"Manager hierarchy built: {hierarchy.n} employees, max depth {hierarchy.depth.max(initial=0)}, "
+          f"{hierarchy.cycles_broken} reporting cycles broken")
+    return hierarchy
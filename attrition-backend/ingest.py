@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+Bulk-load the HR CSV files into the database.
+
+Streams each CSV in chunks and writes it with the fastest path the database
+offers: COPY for Postgres, executemany inside one transaction for SQLite.
+Indexes are created after the load. Re-running is idempotent: once a table
+has its unique key index, new chunks are upserted instead of inserted.
+
+Run from the attrition-backend directory:
+    python ingest.py --database-url sqlite:///hr.db
+    python ingest.py --tables monthly_metrics --mode replace
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+import dotenv
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from storage import resolve_database_url
+
+# Table name -> source CSV, unique key, secondary indexes and column dtypes
+TABLES = {
+    'hr_attrition': {
+        'path': './HR-Employee-Attrition-All.csv',
+        'key': ['EmployeeNumber'],
+        'indexes': [['Department']],
+        'dtypes': {},
+        'dates': [],
+    },
+    'employees': {
+        'path': '../Datasets/employees.csv',
+        'key': ['EmployeeNumber'],
+        'indexes': [['manager_id'], ['Department']],
+        'dtypes': {'manager_id': 'Int64'},
+        'dates': ['hire_date', 'exit_date'],
+    },
+    'monthly_metrics': {
+        'path': '../Datasets/monthly_metrics.csv',
+        # The unique key's leading column also serves employee_id lookups
+        'key': ['employee_id', 'month'],
+        'indexes': [['month']],
+        'dtypes': {},
+        'dates': ['month'],
+    },
+    'attrition_events': {
+        'path': '../Datasets/attrition_events.csv',
+        'key': ['employee_id'],
+        'indexes': [['exit_date']],
+        'dtypes': {},
+        'dates': ['exit_date'],
+    },
+}
+
+DEFAULT_CHUNKSIZE = 50000
+
+
+def quote(name: str) -> str:
+    """Quote an identifier (the HR columns are CamelCase)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def column_type(dtype, is_date: bool, dialect: str) -> str:
+    """Map a pandas dtype onto a SQL column type."""
+    if is_date:
+        return 'DATE' if dialect == 'postgresql' else 'TEXT'
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'BOOLEAN'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'BIGINT' if dialect == 'postgresql' else 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'DOUBLE PRECISION' if dialect == 'postgresql' else 'REAL'
+    return 'TEXT'
+
+
+def chunk_records(chunk: pd.DataFrame, dates: List[str], dialect: str) -> List[tuple]:
+    """Convert a chunk into plain Python tuples with NULLs for missing values."""
+    for col in dates:
+        parsed = pd.to_datetime(chunk[col], errors='coerce')
+        # asyncpg needs date objects for DATE columns; SQLite stores ISO text
+        chunk[col] = parsed.dt.date if dialect == 'postgresql' else parsed.dt.strftime('%Y-%m-%d')
+    values = chunk.astype(object).where(chunk.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def upsert_sql(table: str, columns: List[str], key: List[str], source: str) -> str:
+    """Build an INSERT ... ON CONFLICT DO UPDATE statement (Postgres and SQLite)."""
+    updates = [col for col in columns if col not in key]
+    conflict = ', '.join(quote(col) for col in key)
+    if updates:
+        action = 'DO UPDATE SET ' + ', '.join(f'{quote(col)} = excluded.{quote(col)}' for col in updates)
+    else:
+        action = 'DO NOTHING'
+    return f'INSERT INTO {quote(table)} ({", ".join(quote(c) for c in columns)}) {source} ON CONFLICT ({conflict}) {action}'
+
+
+async def table_state(conn, table: str, dialect: str) -> Dict[str, bool]:
+    """Report whether the table and its unique key index already exist."""
+    if dialect == 'postgresql':
+        exists = await conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': quote(table)})
+        keyed = await conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': quote(f'{table}_key')})
+    else:
+        exists = await conn.scalar(
+            text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table})
+        keyed = await conn.scalar(
+            text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name = :name"),
+            {'name': f'{table}_key'})
+    return {'exists': bool(exists), 'keyed': bool(keyed)}
+
+
+async def write_chunk(conn, table: str, columns: List[str], records: List[tuple],
+                      key: List[str], upsert: bool, dialect: str):
+    """Write one chunk using the bulk path for the current database."""
+    if dialect == 'postgresql':
+        raw = await conn.get_raw_connection()
+        pg = raw.driver_connection
+        if not upsert:
+            await pg.copy_records_to_table(table, records=records, columns=columns)
+            return
+        # COPY into a staging table, then merge into the target in one statement
+        stage = f'_stage_{table}'
+        await pg.execute(f'CREATE TEMP TABLE IF NOT EXISTS {quote(stage)} (LIKE {quote(table)}) ON COMMIT DROP')
+        await pg.execute(f'TRUNCATE {quote(stage)}')
+        await pg.copy_records_to_table(stage, records=records, columns=columns)
+        select = f'SELECT {", ".join(quote(c) for c in columns)} FROM {quote(stage)}'
+        await pg.execute(upsert_sql(table, columns, key, select))
+        return
+
+    placeholders = ', '.join('?' for _ in columns)
+    values = f'VALUES ({placeholders})'
+    if upsert:
+        sql = upsert_sql(table, columns, key, values)
+    else:
+        sql = f'INSERT INTO {quote(table)} ({", ".join(quote(c) for c in columns)}) {values}'
+    await conn.exec_driver_sql(sql, records)
+
+
+async def ingest_table(engine, table: str, spec: Dict[str, Any], chunksize: int, mode: str) -> Dict[str, Any]:
+    """Load one CSV into its table inside a single transaction."""
+    dialect = engine.dialect.name
+    started = time.perf_counter()
+    rows = 0
+
+    async with engine.begin() as conn:
+        if mode == 'replace':
+            await conn.execute(text(f'DROP TABLE IF EXISTS {quote(table)}'))
+        state = await table_state(conn, table, dialect)
+        upsert = state['keyed']
+
+        reader = pd.read_csv(spec['path'], chunksize=chunksize, dtype=spec['dtypes'])
+        for chunk in reader:
+            columns = chunk.columns.tolist()
+            if not state['exists']:
+                definitions = ', '.join(
+                    f'{quote(col)} {column_type(chunk[col].dtype, col in spec["dates"], dialect)}'
+                    for col in columns
+                )
+                await conn.execute(text(f'CREATE TABLE {quote(table)} ({definitions})'))
+                state['exists'] = True
+
+            records = chunk_records(chunk, spec['dates'], dialect)
+            await write_chunk(conn, table, columns, records, spec['key'], upsert, dialect)
+            rows += len(records)
+
+        loaded = time.perf_counter()
+
+        # Build indexes once the data is in; the unique key enables upserts on re-runs
+        key_columns = ', '.join(quote(col) for col in spec['key'])
+        await conn.execute(text(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS {quote(table + "_key")} ON {quote(table)} ({key_columns})'))
+        for columns in spec['indexes']:
+            name = quote(f'{table}_{"_".join(columns)}_idx')
+            await conn.execute(text(
+                f'CREATE INDEX IF NOT EXISTS {name} ON {quote(table)} ({", ".join(quote(c) for c in columns)})'))
+
+    finished = time.perf_counter()
+    load_seconds = loaded - started
+    return {
+        'table': table,
+        'rows': rows,
+        'mode': 'upsert' if upsert else 'insert',
+        'load_seconds': round(load_seconds, 3),
+        'index_seconds': round(finished - loaded, 3),
+        'rows_per_second': int(rows / load_seconds) if load_seconds > 0 else rows,
+    }
+
+
+async def ingest(database_url: str, tables: List[str], chunksize: int = DEFAULT_CHUNKSIZE,
+                 mode: str = 'upsert') -> List[Dict[str, Any]]:
+    """Load the requested tables and return per-table timing reports."""
+    engine = create_async_engine(resolve_database_url(database_url))
+    reports = []
+    try:
+        if engine.dialect.name == 'sqlite':
+            async with engine.begin() as conn:
+                await conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+        for table in tables:
+            spec = TABLES[table]
+            if not os.path.exists(spec['path']):
+                print(f"Skipping {table}: {spec['path']} not found")
+                continue
+            report = await ingest_table(engine, table, spec, chunksize, mode)
+            print(f"{report['table']}: {report['rows']} rows ({report['mode']}) in {report['load_seconds']}s "
+                  f"-> {report['rows_per_second']} rows/s, indexes {report['index_seconds']}s")
+            reports.append(report)
+    finally:
+        await engine.dispose()
+    return reports
+
+
+def main():
+    dotenv.load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Bulk-load the HR CSV files into the database")
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'),
+                        help="Database URL (defaults to DATABASE_URL)")
+    parser.add_argument('--tables', nargs='+', choices=list(TABLES), default=list(TABLES),
+                        help="Tables to load (default: all)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows read and written per chunk")
+    parser.add_argument('--mode', choices=['upsert', 'replace'], default='upsert',
+                        help="upsert into existing tables, or drop and reload them")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    asyncio.run(ingest(args.database_url, args.tables, args.chunksize, args.mode))
+
+
+if __name__ == '__main__':
+    main()
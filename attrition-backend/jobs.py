@@ -0,0 +1,285 @@
+"""
+In-process scheduler for slow analytics work (plots, chat answers, simulations).
+
+Every job class has its own workers, so a burst of one kind of job doesn't
+hold up the others, and its own priority queue: lower numbers run first, ties
+in submission order. A thread class runs jobs on its dispatcher threads; a
+process class hands them to a ProcessPoolExecutor. Its workers start from a
+fresh interpreter (forkserver, or spawn), never forked from this threaded
+process, so a job's function must be importable without side effects and its
+arguments must pickle and carry the data it needs.
+
+Submitting a job with the same class and key as one still queued or running
+returns that job instead of starting a second one. Cancelling marks the job
+cancelled at once: a queued job never starts, a running thread job sees
+`cancelled` turn true and may stop early (see current_job()), and a running
+process job finishes but its result is dropped. Finished jobs stay readable
+for `ttl` seconds. Workers start on first use, so schedulers created before
+serve.py forks are safe.
+"""
+
+import heapq
+import itertools
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+REGISTRY.counter('jobs_total', 'Background jobs by class and final state')
+REGISTRY.counter('jobs_deduplicated_total', 'Submissions answered by an identical queued or running job')
+REGISTRY.histogram('job_queue_seconds', 'Time background jobs waited in their queue')
+REGISTRY.histogram('job_run_seconds', 'Time background jobs ran until they finished')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Every scheduler created, for the gauges below
+SCHEDULERS: List['JobScheduler'] = []
+
+_local = threading.local()
+
+
+def current_job() -> Optional['Job']:
+    """The job running on this thread (None outside jobs and in process jobs)."""
+    return getattr(_local, 'job', None)
+
+
+class Job:
+    """One submitted call and its state."""
+
+    def __init__(self, kind: str, key: Optional[Hashable], priority: int, fn: Callable, args: tuple):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.state = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Bumped on every state change, for wait()
+        self.revision = 0
+        self._changed = threading.Condition()
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.state in FINISHED
+
+    def _set(self, state: str, result: Any = None, error: Optional[str] = None) -> bool:
+        """Move to `state`; a finished job stays as it is. Returns whether the state changed."""
+        with self._changed:
+            if self.done:
+                return False
+            now = time.time()
+            if state == RUNNING:
+                self.started = now
+                REGISTRY.observe('job_queue_seconds', now - self.submitted, kind=self.kind)
+            else:
+                self.finished = now
+                self.result, self.error = result, error
+                # Drop the call so a finished job doesn't pin its arguments
+                self.fn, self.args = None, ()
+                if self.started is not None:
+                    REGISTRY.observe('job_run_seconds', now - self.started, kind=self.kind)
+                REGISTRY.inc('jobs_total', kind=self.kind, state=state)
+            self.state = state
+            self.revision += 1
+            self._changed.notify_all()
+            return True
+
+    def wait(self, revision: int, timeout: Optional[float] = None) -> int:
+        """Block until the job changes past `revision` (or timeout); returns the current revision."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.revision != revision, timeout)
+            return self.revision
+
+    def snapshot(self) -> Tuple[int, Dict[str, Any]]:
+        """The revision and status of the job, read together."""
+        with self._changed:
+            return self.revision, self.to_dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        status = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.state,
+            'priority': self.priority,
+            'submitted': round(self.submitted, 3),
+            'started': None if self.started is None else round(self.started, 3),
+            'finished': None if self.finished is None else round(self.finished, 3),
+        }
+        if self.state == SUCCEEDED:
+            status['result'] = self.result
+        if self.error is not None:
+            status['error'] = self.error
+        return status
+
+
+class JobClass:
+    """Queue and workers of one class of jobs."""
+
+    def __init__(self, name: str, workers: int, processes: bool = False):
+        self.name = name
+        self.workers = max(int(workers), 1)
+        self.processes = processes
+        self.queue: List[Tuple[int, int, Job]] = []
+        self.running = 0
+        self.threads: List[threading.Thread] = []
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+
+class JobScheduler:
+    """Priority queues and workers per job class, plus the registry of recent jobs."""
+
+    def __init__(self, classes: Dict[str, Tuple[int, bool]], ttl: float = 600.0):
+        self.classes = {name: JobClass(name, workers, processes) for name, (workers, processes) in classes.items()}
+        self.ttl = ttl
+        self.jobs: Dict[str, Job] = {}
+        self.inflight: Dict[Tuple[str, Hashable], Job] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Condition()
+        SCHEDULERS.append(self)
+
+    def submit(self, kind: str, fn: Callable, *args, key: Optional[Hashable] = None,
+               priority: int = 0) -> Tuple[Job, bool]:
+        """
+        Queue fn(*args) in class `kind`.
+
+        Returns the job and whether it was created: with a key, an identical
+        queued or running job is returned instead of a new one.
+        """
+        job_class = self.classes[kind]
+        with self._lock:
+            self._expire()
+            if key is not None:
+                existing = self.inflight.get((kind, key))
+                if existing is not None and not existing.done:
+                    REGISTRY.inc('jobs_deduplicated_total', kind=kind)
+                    return existing, False
+            job = Job(kind, key, priority, fn, args)
+            self.jobs[job.id] = job
+            if key is not None:
+                self.inflight[(kind, key)] = job
+            heapq.heappush(job_class.queue, (priority, next(self._sequence), job))
+            while len(job_class.threads) < job_class.workers:
+                thread = threading.Thread(target=self._dispatch, args=(job_class,), daemon=True,
+                                          name=f'jobs-{kind}-{len(job_class.threads)}')
+                job_class.threads.append(thread)
+                thread.start()
+            self._lock.notify_all()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; returns None for unknown ids."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.done:
+                return job
+            job._cancel.set()
+            job._set(CANCELLED)
+            self._release(job)
+        return job
+
+    def _release(self, job: Job):
+        if job.key is not None and self.inflight.get((job.kind, job.key)) is job:
+            del self.inflight[(job.kind, job.key)]
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items() if job.done and job.finished < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _dispatch(self, job_class: JobClass):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: job_class.queue)
+                _, _, job = heapq.heappop(job_class.queue)
+                # Cancelled while queued
+                if job.done:
+                    continue
+                job._set(RUNNING)
+                job_class.running += 1
+                fn, args = job.fn, job.args
+
+            try:
+                if job_class.processes:
+                    result = self._executor(job_class, fn).submit(fn, *args).result()
+                else:
+                    _local.job = job
+                    try:
+                        result = fn(*args)
+                    finally:
+                        _local.job = None
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    # A worker process died; later jobs get a fresh pool
+                    self.restart_processes()
+                job._set(FAILED, error=str(e) or type(e).__name__)
+            else:
+                job._set(SUCCEEDED, result)
+            finally:
+                with self._lock:
+                    job_class.running -= 1
+                    self._release(job)
+
+    def _executor(self, job_class: JobClass, fn: Callable) -> ProcessPoolExecutor:
+        with self._lock:
+            if job_class.executor is None:
+                # Forking now would copy the locks other threads hold (a child could block on one forever)
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                if 'forkserver' in methods:
+                    # The server imports the job's module once, rather than re-running __main__
+                    context.set_forkserver_preload([fn.__module__])
+                job_class.executor = ProcessPoolExecutor(max_workers=job_class.workers, mp_context=context)
+            return job_class.executor
+
+    def restart_processes(self):
+        """Start new process workers on next use; running process jobs finish on the old ones."""
+        with self._lock:
+            for job_class in self.classes.values():
+                if job_class.executor is not None:
+                    job_class.executor.shutdown(wait=False)
+                    job_class.executor = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    'workers': job_class.workers,
+                    'processes': job_class.processes,
+                    'queued': sum(not job.done for _, _, job in job_class.queue),
+                    'running': job_class.running,
+                }
+                for name, job_class in self.classes.items()
+            }
+
+
+REGISTRY.gauge('jobs_queued', 'Background jobs waiting in each class queue',
+               lambda: {(('kind', name),): stats['queued']
+                        for scheduler in SCHEDULERS for name, stats in scheduler.stats().items()})
+REGISTRY.gauge('jobs_running', 'Background jobs running in each class',
+               lambda: {(('kind', name),): stats['running']
+                        for scheduler in SCHEDULERS for name, stats in scheduler.stats().items()})
@@ -0,0 +1,162 @@
+"""
+Rate-limited, retrying client for the OpenAI-compatible chat completions API.
+
+Every chatbot in the process shares one client, so single chat turns, chat
+jobs and batches together stay within its limits:
+
+- at most `max_concurrent` requests are in flight;
+- with `requests_per_minute` set, requests are spaced by a token bucket that
+  allows short bursts up to a sixth of the per-minute rate;
+- a 429, a 5xx or a connection error is retried up to `max_retries` times.
+  The wait is the Retry-After header when there is one. Otherwise it grows
+  exponentially from `backoff` up to `max_backoff`, with full jitter. A 429
+  also pauses every other caller until its retry time, instead of each
+  discovering the limit separately.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from metrics import REGISTRY
+
+REGISTRY.counter('llm_requests_total', 'Chat completion requests by outcome (HTTP status or error)')
+REGISTRY.counter('llm_retries_total', 'Chat completion requests retried, by reason')
+REGISTRY.histogram('llm_wait_seconds', 'Time chat completion requests waited for a concurrency or rate slot')
+
+# Statuses worth retrying: rate limited, or the upstream is briefly unavailable
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """Token bucket of `per_minute` requests, which a 429 can pause for everyone."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(per_minute / 6.0, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.rate > 0:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.rate <= 0:
+                        return
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class LLMClient:
+    """Posts chat completions within a concurrency bound and rate limit, retrying with backoff."""
+
+    def __init__(self, max_concurrent: int = 8, requests_per_minute: float = 0, max_retries: int = 4,
+                 backoff: float = 1.0, max_backoff: float = 30.0, timeout: float = 120.0):
+        self.max_concurrent = max(int(max_concurrent), 1)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(requests_per_minute)
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'LLMClient':
+        return cls(
+            max_concurrent=int(os.getenv('LLM_MAX_CONCURRENT', 8)),
+            requests_per_minute=float(os.getenv('LLM_REQUESTS_PER_MINUTE', 0)),
+            max_retries=int(os.getenv('LLM_MAX_RETRIES', 4)),
+            backoff=float(os.getenv('LLM_BACKOFF_SECONDS', 1)),
+            max_backoff=float(os.getenv('LLM_MAX_BACKOFF_SECONDS', 30)),
+            timeout=float(os.getenv('LLM_TIMEOUT_SECONDS', 120)),
+        )
+
+    def session(self):
+        """One pooled HTTP session, so concurrent requests reuse connections."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrent)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def complete(self, url: str, api_key: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST `payload` to `url` and return the decoded response, raising once retries run out."""
+        import requests
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            self.limiter.acquire()
+            with self._slots:
+                REGISTRY.observe('llm_wait_seconds', time.perf_counter() - started)
+                try:
+                    response = self.session().post(url, headers=headers, json=payload, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    response, error = None, e
+                    REGISTRY.inc('llm_requests_total', outcome=type(e).__name__)
+                else:
+                    REGISTRY.inc('llm_requests_total', outcome=str(response.status_code))
+                    if response.status_code not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        return response.json()
+                    error = None
+
+            if attempt >= self.max_retries:
+                if response is not None:
+                    response.raise_for_status()
+                raise error
+            attempt += 1
+            delay = self._retry_after(response)
+            if delay is None:
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            if response is not None and response.status_code == 429:
+                self.limiter.pause(delay)
+            REGISTRY.inc('llm_retries_total', reason='error' if response is None else str(response.status_code))
+            time.sleep(delay)
+
+    def _retry_after(self, response) -> Optional[float]:
+        """Seconds from a Retry-After header (the HTTP-date form is ignored)."""
+        if response is None:
+            return None
+        try:
+            return min(float(response.headers.get('Retry-After', '')), self.max_backoff)
+        except ValueError:
+            return None
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_client() -> LLMClient:
+    """The process-wide client, configured from the environment on first use."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = LLMClient.from_env()
+    return _shared
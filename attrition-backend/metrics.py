@@ -0,0 +1,207 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Every thread records into its own shard (a plain dict reached through
+threading.local), so the hot path takes no locks. A scrape merges the shards;
+shards of finished threads are folded into a retired total so per-request
+threads don't accumulate.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Payload size buckets in bytes
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """Counters and histograms sharded per thread, merged on scrape."""
+
+    def __init__(self):
+        self._definitions: Dict[str, Dict] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[LabelKey, float]]]] = {}
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        self._retired: Dict = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str):
+        self._definitions[name] = {'type': 'counter', 'help': help_text}
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self._definitions[name] = {'type': 'histogram', 'help': help_text, 'buckets': tuple(buckets)}
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], Dict[LabelKey, float]]):
+        """Register a gauge whose values are read from `collect` at scrape time."""
+        self._gauges[name] = (help_text, collect)
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            # Registration is the only locked step, once per thread
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        shard = self._shard()
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        shard = self._shard()
+        cells = shard.get(key)
+        if cells is None:
+            # One slot per bucket plus +Inf, then sum and count
+            cells = [0] * (len(self._definitions[name]['buckets']) + 3)
+            shard[key] = cells
+        cells[bisect_left(self._definitions[name]['buckets'], value)] += 1
+        cells[-2] += value
+        cells[-1] += 1
+
+    @staticmethod
+    def _merge_into(target: Dict, shard: Dict):
+        for key, value in list(shard.items()):
+            if isinstance(value, list):
+                cells = target.get(key)
+                if cells is None:
+                    target[key] = list(value)
+                else:
+                    for i, v in enumerate(value):
+                        cells[i] += v
+            else:
+                target[key] = target.get(key, 0) + value
+
+    def snapshot(self) -> Dict:
+        """Merge all shards into one {(name, labels): value} dict."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge_into(self._retired, shard)
+            self._shards = live
+            merged = {}
+            self._merge_into(merged, self._retired)
+            for _, shard in live:
+                self._merge_into(merged, shard)
+        return merged
+
+    @staticmethod
+    def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        escaped = [
+            (k, str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')) for k, v in pairs
+        ]
+        return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        merged = self.snapshot()
+        by_name: Dict[str, List] = {}
+        for (name, labels), value in merged.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, definition in self._definitions.items():
+            lines.append(f'# HELP {name} {definition["help"]}')
+            lines.append(f'# TYPE {name} {definition["type"]}')
+            for labels, value in sorted(by_name.get(name, []), key=lambda item: item[0]):
+                if definition['type'] == 'counter':
+                    lines.append(f'{name}{self._format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(definition['buckets'] + (float('inf'),), value[:-2]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{self._format_labels(labels, ("le", le))} {cumulative}')
+                lines.append(f'{name}_sum{self._format_labels(labels)} {value[-2]}')
+                lines.append(f'{name}_count{self._format_labels(labels)} {value[-1]}')
+
+        for name, (help_text, collect) in self._gauges.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in sorted(collect().items()):
+                lines.append(f'{name}{self._format_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REGISTRY.histogram('http_request_duration_seconds', 'Request latency by route')
+REGISTRY.histogram('http_request_size_bytes', 'Request body size by route', SIZE_BUCKETS)
+REGISTRY.histogram('http_response_size_bytes', 'Response body size by route', SIZE_BUCKETS)
+REGISTRY.counter('http_requests_total', 'Requests by route, method and status')
+REGISTRY.counter('http_request_errors_total', 'Requests that failed with a 5xx status or an exception')
+REGISTRY.histogram('chat_stage_duration_seconds', 'Time spent in each stage of process_query')
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a stage of chat processing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe('chat_stage_duration_seconds', time.perf_counter() - started, stage=stage)
+
+
+def init_app(app):
+    """Install request timing middleware and the /metrics endpoint on a Flask app."""
+    from flask import Response, g, request
+
+    def route_label() -> str:
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = getattr(g, 'metrics_started', None)
+        if started is None:
+            return response
+        route = route_label()
+        REGISTRY.observe('http_request_duration_seconds', time.perf_counter() - started,
+                         route=route, method=request.method)
+        REGISTRY.inc('http_requests_total', route=route, method=request.method, status=str(response.status_code))
+        if request.content_length:
+            REGISTRY.observe('http_request_size_bytes', request.content_length, route=route)
+        # Streamed responses have no length up front
+        if not response.is_streamed and response.content_length is not None:
+            REGISTRY.observe('http_response_size_bytes', response.content_length, route=route)
+        if response.status_code >= 500:
+            REGISTRY.inc('http_request_errors_total', route=route, method=request.method)
+        g.metrics_recorded = True
+        return response
+
+    @app.teardown_request
+    def record_exception(exc):
+        # Unhandled exceptions skip after_request
+        if exc is not None and not getattr(g, 'metrics_recorded', False):
+            route = route_label()
+            started = getattr(g, 'metrics_started', time.perf_counter())
+            REGISTRY.observe('http_request_duration_seconds', time.perf_counter() - started,
+                             route=route, method=request.method)
+            REGISTRY.inc('http_requests_total', route=route, method=request.method, status='500')
+            REGISTRY.inc('http_request_errors_total', route=route, method=request.method)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Expose all metrics in Prometheus text format"""
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
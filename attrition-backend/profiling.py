@@ -0,0 +1,276 @@
+"""
+Opt-in request profiling.
+
+A request is profiled when it carries the configured secret, either in the
+`X-Profile` header or the `profile` query parameter. The default mode is a
+statistical sampler that reads the request thread's stack via
+sys._current_frames() and emits folded stacks ("a;b;c 42"), which flamegraph.pl,
+speedscope and inferno read directly. `X-Profile-Mode: cprofile` (or
+`profileMode=cprofile`) runs the request under cProfile instead. Only one
+cProfile session can be active per process (on Python 3.12 cProfile is built on
+sys.monitoring, which also records the work of other threads while it runs), so
+a cProfile request that arrives while another is being profiled falls back to
+the sampler; its profile records `requestedMode: cprofile`.
+
+With PROFILE_SAMPLE_RATE > 0 a fraction of all requests is profiled with the
+sampler, and the slowest PROFILE_KEEP of them are kept. Profiles are listed at
+/api/profiles, which also requires the secret.
+"""
+
+import cProfile
+import heapq
+import hmac
+import io
+import itertools
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Routes that are never profiled
+EXCLUDED_ROUTES = {'/metrics', '/api/profiles', '/api/profiles/<profile_id>'}
+
+
+class SamplingSession:
+    """Stack samples collected for one request thread."""
+
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.stacks: Dict[tuple, int] = {}
+        self.samples = 0
+
+    def record(self, frame, labels: Dict):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+                labels[code] = label
+            stack.append(label)
+            frame = frame.f_back
+        key = tuple(reversed(stack))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        """Render the samples in the folded-stack format used by flame graph tools."""
+        lines = [';'.join(stack) + f' {count}' for stack, count in self.stacks.items()]
+        return '\n'.join(sorted(lines)) + ('\n' if lines else '')
+
+
+class StackSampler:
+    """One background thread sampling the stacks of every active session."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._sessions: Dict[int, SamplingSession] = {}
+        self._labels: Dict = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: int) -> SamplingSession:
+        session = SamplingSession(thread_id)
+        with self._lock:
+            self._sessions[thread_id] = session
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session: SamplingSession):
+        with self._lock:
+            self._sessions.pop(session.thread_id, None)
+
+    def _run(self):
+        while True:
+            # Idle without waking up while nothing is being profiled
+            self._active.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                sessions = list(self._sessions.values())
+                if not sessions:
+                    self._active.clear()
+                    continue
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is not None:
+                    session.record(frame, self._labels)
+            del frames
+
+
+class ProfileStore:
+    """Recent on-demand profiles plus the slowest sampled ones."""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self._recent = deque(maxlen=keep)
+        self._slowest: List = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Dict[str, Any]):
+        with self._lock:
+            if profile['trigger'] == 'on-demand':
+                self._recent.append(profile)
+                return
+            entry = (profile['durationMs'], next(self._counter), profile)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+
+    def admits(self, duration_ms: float) -> bool:
+        """Whether a sampled profile this slow would be kept (checked before rendering it)."""
+        with self._lock:
+            return len(self._slowest) < self.keep or duration_ms > self._slowest[0][0]
+
+    def _all(self) -> List[Dict[str, Any]]:
+        return list(self._recent) + [entry[2] for entry in self._slowest]
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = self._all()
+        summaries = [{key: value for key, value in p.items() if key not in ('folded', 'stats')} for p in profiles]
+        return sorted(summaries, key=lambda p: p['durationMs'], reverse=True)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((p for p in self._all() if p['id'] == profile_id), None)
+
+
+def cprofile_stats(profiler: cProfile.Profile, limit: int = 60) -> str:
+    """Render cProfile results sorted by cumulative time."""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+def init_app(app):
+    """Install the profiling hooks and the /api/profiles endpoints on a Flask app."""
+    from flask import Response, g, jsonify, request
+
+    secret = os.getenv('PROFILE_SECRET', '')
+    sample_rate = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    sampler = StackSampler(float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000)
+    store = ProfileStore(int(os.getenv('PROFILE_KEEP', 20)))
+    app.extensions['profiling'] = store
+
+    # Held for the duration of the one cProfile session the process can run
+    cprofile_lock = threading.Lock()
+
+    def has_secret(value: Optional[str]) -> bool:
+        return bool(secret) and value is not None and hmac.compare_digest(value.encode(), secret.encode())
+
+    def route_label() -> str:
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    def public_path() -> str:
+        # Keep the secret out of stored profiles
+        args = [f'{key}={value}' for key, value in request.args.items(multi=True) if key != 'profile']
+        return request.path + ('?' + '&'.join(args) if args else '')
+
+    @app.before_request
+    def start_profile():
+        if route_label() in EXCLUDED_ROUTES:
+            return
+        if has_secret(request.headers.get('X-Profile') or request.args.get('profile')):
+            trigger = 'on-demand'
+            mode = (request.headers.get('X-Profile-Mode') or request.args.get('profileMode') or 'sampling').lower()
+        elif sample_rate > 0 and random.random() < sample_rate:
+            trigger, mode = 'sampled', 'sampling'
+        else:
+            return
+
+        if mode == 'cprofile' and cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiling tool (a debugger, coverage) holds the profiler slot
+                cprofile_lock.release()
+            else:
+                g.profile = (trigger, mode, mode, profiler, time.perf_counter())
+                return
+        session = sampler.start(threading.get_ident())
+        g.profile = (trigger, mode, 'sampling', session, time.perf_counter())
+
+    def finish_profile(status: int) -> Optional[Dict[str, Any]]:
+        state = g.pop('profile', None)
+        if state is None:
+            return None
+        trigger, requested_mode, mode, handle, started = state
+        duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        if mode == 'cprofile':
+            try:
+                handle.disable()
+            finally:
+                cprofile_lock.release()
+        else:
+            sampler.stop(handle)
+        if trigger == 'sampled' and not store.admits(duration_ms):
+            return None
+
+        profile = {
+            'id': uuid.uuid4().hex[:12],
+            'trigger': trigger,
+            'mode': mode,
+            'requestedMode': requested_mode,
+            'route': route_label(),
+            'method': request.method,
+            'path': public_path(),
+            'status': status,
+            'durationMs': duration_ms,
+            'createdAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        if mode == 'cprofile':
+            profile['stats'] = cprofile_stats(handle)
+        else:
+            profile['samples'] = handle.samples
+            profile['intervalMs'] = sampler.interval * 1000
+            profile['folded'] = handle.folded()
+        store.add(profile)
+        return profile
+
+    @app.after_request
+    def store_profile(response):
+        profile = finish_profile(response.status_code)
+        if profile is not None and profile['trigger'] == 'on-demand':
+            response.headers['X-Profile-Id'] = profile['id']
+        return response
+
+    @app.teardown_request
+    def store_failed_profile(exc):
+        # Unhandled exceptions skip after_request
+        if exc is not None:
+            finish_profile(500)
+
+    @app.route('/api/profiles', methods=['GET'])
+    def list_profiles():
+        """List stored request profiles, slowest first"""
+        if not has_secret(request.headers.get('X-Profile') or request.args.get('profile')):
+            return jsonify({"error": "Profiling secret required"}), 403
+        return jsonify({'profiles': store.list(), 'keep': store.keep, 'sampleRate': sample_rate})
+
+    @app.route('/api/profiles/<profile_id>', methods=['GET'])
+    def get_profile(profile_id):
+        """Return one profile as folded stacks (or cProfile text); ?format=json for the full record"""
+        if not has_secret(request.headers.get('X-Profile') or request.args.get('profile')):
+            return jsonify({"error": "Profiling secret required"}), 403
+        profile = store.get(profile_id)
+        if profile is None:
+            return jsonify({"error": f"Unknown profile {profile_id}"}), 404
+        if request.args.get('format') == 'json':
+            return jsonify(profile)
+        body = profile['stats'] if profile['mode'] == 'cprofile' else profile['folded']
+        return Response(body, mimetype='text/plain')
@@ -0,0 +1,80 @@
+"""
+Bounded LRU caches for results derived from one dataset version.
+
+Every entry belongs to the (increasing) dataset version it was computed from.
+The first lookup with a newer version drops the whole cache; lookups still
+carrying an older version are computed but not stored. Hits, misses and
+evictions are exported through metrics.REGISTRY, labelled by cache name.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from metrics import REGISTRY
+
+REGISTRY.counter('cache_requests_total', 'Result cache lookups by cache and result (hit or miss)')
+REGISTRY.counter('cache_evictions_total', 'Entries evicted from a result cache to stay within its size')
+
+# Every cache created, for the gauges below
+CACHES: List['ResultCache'] = []
+
+
+class ResultCache:
+    """Thread-safe LRU cache scoped to a dataset version."""
+
+    def __init__(self, name: str, maxsize: int = 256):
+        self.name = name
+        self.maxsize = maxsize
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES.append(self)
+
+    def get_or_compute(self, version: int, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing (outside the lock) and storing it on a miss."""
+        with self._lock:
+            if self.version is None or version > self.version:
+                self._entries.clear()
+                self.version = version
+            if version == self.version and key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                REGISTRY.inc('cache_requests_total', cache=self.name, result='hit')
+                return self._entries[key]
+            self.misses += 1
+        REGISTRY.inc('cache_requests_total', cache=self.name, result='miss')
+
+        value = compute()
+        with self._lock:
+            # A newer version may have arrived while computing; don't store a stale result
+            if version == self.version and self.maxsize > 0:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    REGISTRY.inc('cache_evictions_total', cache=self.name)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+REGISTRY.gauge('cache_entries', 'Entries held by each result cache',
+               lambda: {(('cache', cache.name),): len(cache._entries) for cache in CACHES})
+REGISTRY.gauge('cache_hit_ratio', 'Hits over lookups for each result cache since startup',
+               lambda: {(('cache', cache.name),): cache.stats()['hitRate'] or 0 for cache in CACHES})
@@ -0,0 +1,148 @@
+"""
+Attrition risk score from a logistic regression.
+
+The model is fitted with Newton's method (IRLS) in numpy on standardized
+numeric columns plus one-hot indicators for the low-cardinality string
+columns. Fitting uses at most `max_rows` sampled rows; scoring works column
+by column, so the design matrix for the full dataset is never built.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Identifiers, constants and encodings of the target itself
+EXCLUDED_COLUMNS = {'EmployeeNumber', 'EmployeeCount', 'StandardHours', 'Over18',
+                    'Attrition', 'Attrition_Binary', 'AttritionBinary'}
+MAX_CATEGORIES = 10
+
+# (column, category) -- category is None for numeric columns
+Feature = Tuple[str, Optional[str]]
+
+
+def select_features(df: pd.DataFrame) -> List[Feature]:
+    features: List[Feature] = []
+    for name in df.columns:
+        if name in EXCLUDED_COLUMNS:
+            continue
+        series = df[name]
+        if series.dtype.kind in 'biuf':
+            features.append((name, None))
+            continue
+        categories = series.dropna().unique()
+        if 1 < len(categories) <= MAX_CATEGORIES:
+            # Leave the first category out as the baseline
+            features.extend((name, category) for category in sorted(categories)[1:])
+    return features
+
+
+def category_codes(values, categories: List[str]) -> np.ndarray:
+    """Positions of the values in `categories`, -1 for anything else."""
+    return pd.Categorical(values, categories=categories).codes
+
+
+def design_matrix(df: pd.DataFrame, features: List[Feature]) -> np.ndarray:
+    X = np.empty((len(df), len(features)))
+    codes = {}
+    for j, (name, category) in enumerate(features):
+        if category is None:
+            X[:, j] = df[name].to_numpy()
+            continue
+        if name not in codes:
+            categories = [c for n, c in features if n == name]
+            codes[name] = (category_codes(df[name], categories), categories)
+        column_codes, categories = codes[name]
+        X[:, j] = column_codes == categories.index(category)
+    return X
+
+
+class RiskModel:
+    """Logistic regression of Attrition == 'Yes' on the employee columns."""
+
+    def __init__(self, features: List[Feature], mean: np.ndarray, scale: np.ndarray,
+                 coef: np.ndarray, intercept: float, iterations: int):
+        self.features = features
+        self.mean = mean
+        self.scale = scale
+        self.coef = coef
+        self.intercept = intercept
+        self.iterations = iterations
+
+        # The model is linear in the raw columns: fold the standardization into per-feature
+        # weights, and each one-hot group into a lookup table per string column
+        weights = coef / scale
+        self.offset = intercept - float(weights @ mean)
+        self.terms = {}
+        for (name, category), weight in zip(features, weights):
+            if category is None:
+                self.terms[name] = float(weight)
+            else:
+                categories, category_weights = self.terms.setdefault(name, ([], []))
+                categories.append(category)
+                category_weights.append(weight)
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, max_rows: int = 100000, l2: float = 1.0,
+            max_iterations: int = 25, tol: float = 1e-6, seed: int = 0) -> 'RiskModel':
+        sample = df
+        if len(df) > max_rows:
+            rows = np.random.default_rng(seed).choice(len(df), max_rows, replace=False)
+            sample = df.take(np.sort(rows))
+
+        features = select_features(sample)
+        X = design_matrix(sample, features)
+        y = (sample['Attrition'] == 'Yes').to_numpy(dtype=float)
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        # Constant columns carry no signal; keep them at zero instead of dividing by zero
+        scale[scale == 0] = np.inf
+        X = np.column_stack([np.ones(len(X)), (X - mean) / scale])
+
+        # Ridge penalty on the coefficients but not the intercept
+        penalty = np.full(X.shape[1], float(l2))
+        penalty[0] = 0.0
+        w = np.zeros(X.shape[1])
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            p = 1.0 / (1.0 + np.exp(-(X @ w)))
+            gradient = X.T @ (p - y) + penalty * w
+            hessian = (X * (p * (1 - p))[:, None]).T @ X + np.diag(penalty)
+            step = np.linalg.solve(hessian, gradient)
+            w -= step
+            if np.abs(step).max() < tol:
+                break
+
+        return cls(features, mean, scale, w[1:], float(w[0]), iterations)
+
+    def contribution(self, name: str, values) -> np.ndarray:
+        """Logit contribution of one column's values (zero for columns the model doesn't use)."""
+        term = self.terms.get(name)
+        if term is None:
+            return np.zeros(len(values))
+        if isinstance(term, float):
+            return np.asarray(values, dtype=float) * term
+        categories, category_weights = term
+        # Baseline and unseen categories (code -1) pick up the trailing zero
+        return np.append(category_weights, 0.0)[category_codes(values, categories)]
+
+    def logit(self, df: pd.DataFrame) -> np.ndarray:
+        """Return the log-odds of attrition for every row."""
+        z = np.full(len(df), self.offset)
+        for name in self.terms:
+            z += self.contribution(name, df[name].to_numpy())
+        return z
+
+    @staticmethod
+    def probability(logits: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def score(self, df: pd.DataFrame) -> np.ndarray:
+        """Return the predicted attrition probability of every row."""
+        return self.probability(self.logit(df))
+
+    def coefficients(self) -> List[dict]:
+        """Standardized coefficients, largest effect first."""
+        rows = [{'feature': name if category is None else f'{name}={category}', 'coefficient': float(c)}
+                for (name, category), c in zip(self.features, self.coef)]
+        return sorted(rows, key=lambda row: abs(row['coefficient']), reverse=True)
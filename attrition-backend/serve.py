@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+Production entry point: preload once, fork workers.
+
+The master imports app.py (reading the dataset and building the aggregates,
+hierarchy and chatbot), freezes the garbage collector so collections in the
+workers don't write to the inherited objects, binds the listening socket and
+forks the workers. Each worker serves the shared socket with a bounded
+thread pool, so the loaded numpy columns stay shared copy-on-write between
+all of them.
+
+    python serve.py --workers 8 --threads 4 --port 8000
+
+The master waits until every worker has passed its /healthz self-check
+before reporting ready (optionally to --ready-file), and restarts workers
+that die. On SIGTERM each worker stops accepting and finishes the requests it
+has accepted, for up to --drain-timeout seconds, before it exits.
+"""
+
+import argparse
+import gc
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler without the per-request access log line."""
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server handling requests on a fixed-size thread pool."""
+
+    multithread = True
+
+    def __init__(self, app, fd: int, threads: int, access_log: bool = False, drain_timeout: float = 30.0):
+        handler = WSGIRequestHandler if access_log else QuietRequestHandler
+        super().__init__('0.0.0.0', 0, app, handler=handler, fd=fd)
+        # Every worker polls the same socket; losing the race to accept must not block
+        self.socket.setblocking(False)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        self.drain_timeout = drain_timeout
+        # Requests accepted and not yet answered, queued or running
+        self.in_flight = 0
+        self.idle = threading.Condition()
+        # Whether closing let every request finish; None until closed
+        self.drained: Optional[bool] = None
+
+    def process_request(self, request, client_address):
+        with self.idle:
+            self.in_flight += 1
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self.idle:
+                self.in_flight -= 1
+                self.idle.notify_all()
+
+    def server_close(self) -> bool:
+        """
+        Stop listening, then let the accepted requests finish.
+
+        Waits up to drain_timeout seconds; returns whether every request finished.
+        Later calls (serve_forever closes the server too) return the same answer.
+        """
+        super().server_close()
+        if not hasattr(self, 'pool'):
+            return True
+        if self.drained is None:
+            with self.idle:
+                self.drained = self.idle.wait_for(lambda: self.in_flight == 0, self.drain_timeout)
+            # Requests still queued after the timeout are dropped rather than started
+            self.pool.shutdown(wait=self.drained, cancel_futures=not self.drained)
+        return self.drained
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Bind the listening socket in the master so every worker inherits it."""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app_module, sock: socket.socket, threads: int, ready_fd: int, access_log: bool,
+               drain_timeout: float):
+    """Worker process body: self-check, report ready, serve until SIGTERM, then drain."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    app_module.after_fork()
+
+    server = PooledWSGIServer(app_module.app, sock.fileno(), threads, access_log, drain_timeout)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+
+    response = app_module.app.test_client().get('/healthz')
+    if response.status_code != 200:
+        print(f"Worker {os.getpid()} failed its readiness check: {response.status_code}", file=sys.stderr)
+        os._exit(1)
+    os.write(ready_fd, f'{os.getpid()}\n'.encode())
+
+    server.serve_forever()
+    if not server.server_close():
+        print(f"Worker {os.getpid()} stopped with {server.in_flight} requests unfinished after "
+              f"{drain_timeout:g}s", file=sys.stderr)
+    os._exit(0)
+
+
+class Master:
+    """Fork and supervise the worker processes."""
+
+    def __init__(self, app_module, sock: socket.socket, workers: int, threads: int, access_log: bool = False,
+                 drain_timeout: float = 30.0):
+        self.app_module = app_module
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.access_log = access_log
+        self.drain_timeout = drain_timeout
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.ready_r, self.ready_w = os.pipe()
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            os.close(self.ready_r)
+            try:
+                run_worker(self.app_module, self.sock, self.threads, self.ready_w, self.access_log,
+                           self.drain_timeout)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(1)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    def wait_ready(self, timeout: float) -> List[int]:
+        """Collect readiness reports from the initial workers."""
+        ready: List[int] = []
+        buffer = b''
+        deadline = time.monotonic() + timeout
+        while len(ready) < self.workers:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.ready_r], [], [], remaining)[0]:
+                break
+            buffer += os.read(self.ready_r, 4096)
+            *lines, buffer = buffer.split(b'\n')
+            ready.extend(int(line) for line in lines if line)
+        return ready
+
+    def stop(self, *_):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def supervise(self):
+        """Reap workers and replace those that exit unexpectedly."""
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if self.stopping or started is None:
+                continue
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting", file=sys.stderr)
+            # Avoid a tight crash loop when workers die on startup
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            self.spawn()
+
+
+def memory_rollup(pid: int) -> Dict[str, int]:
+    """Read Rss/Pss/Shared/Private (kB) for a process from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        return {}
+    return fields
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve the analytics API with preforked workers")
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', 4)),
+                        help="Request threads per worker")
+    parser.add_argument('--backlog', type=int, default=1024)
+    parser.add_argument('--ready-timeout', type=float, default=120)
+    parser.add_argument('--ready-file', help="Write master/worker pids here once every worker is ready")
+    parser.add_argument('--access-log', action='store_true')
+    parser.add_argument('--drain-timeout', type=float, default=float(os.getenv('WEB_DRAIN_TIMEOUT', 30)),
+                        help="Seconds a stopping worker waits for the requests it has accepted")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    import app as app_module
+
+    app_module.app.config['WORKERS'] = args.workers
+    app_module.before_fork()
+    # Move everything loaded so far out of the collector's reach, so GC passes in the
+    # workers don't dirty the shared pages by touching object headers
+    gc.collect()
+    gc.freeze()
+    print(f"Loaded application in {time.perf_counter() - started:.1f}s; "
+          f"master RSS {memory_rollup(os.getpid()).get('Rss', 0) // 1024} MB")
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    master = Master(app_module, sock, args.workers, args.threads, args.access_log, args.drain_timeout)
+    signal.signal(signal.SIGTERM, master.stop)
+    signal.signal(signal.SIGINT, master.stop)
+    for _ in range(args.workers):
+        master.spawn()
+
+    ready = master.wait_ready(args.ready_timeout)
+    if len(ready) < args.workers:
+        print(f"Only {len(ready)} of {args.workers} workers became ready", file=sys.stderr)
+        master.stop()
+        master.supervise()
+        sys.exit(1)
+
+    print(f"Ready: {args.workers} workers x {args.threads} threads on {args.host}:{sock.getsockname()[1]}")
+    if args.ready_file:
+        with open(args.ready_file, 'w') as f:
+            json.dump({'master': os.getpid(), 'workers': ready, 'port': sock.getsockname()[1]}, f)
+
+    master.supervise()
+    sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+Columnar dataset in named shared memory.
+
+Each published version of the dataset is one shared memory segment holding
+every column as a flat array: numeric columns as-is, string columns as
+integer codes into a small category list. A JSON manifest describes the
+segment (column names, dtypes, offsets, categories). Publishing writes a new
+segment, swaps the manifest into place with os.replace, and unlinks the
+previous segment; processes that still map it keep their pages until they
+let go.
+
+Any process (forked worker, spawned plot renderer, CLI) attaches read-only
+numpy views without copying:
+
+    python shared_dataset.py publish --manifest /dev/shm/attrition.json --csv HR-Employee-Attrition-All.csv
+    python shared_dataset.py info --manifest /dev/shm/attrition.json
+"""
+
+import argparse
+import json
+import os
+import time
+import uuid
+import weakref
+from datetime import datetime, timezone
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SEGMENT_PREFIX = 'attrition_'
+MANIFEST_FORMAT = 1
+# Column offsets are aligned to cache lines
+ALIGNMENT = 64
+
+
+def _open_segment(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    """Open a segment without handing its lifetime to the resource tracker."""
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        # Before Python 3.13 every opened segment is registered with the resource tracker,
+        # which unlinks it when this process exits; lifetime is managed through the manifest
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def unlink_segment(name: str):
+    """Remove a segment name; existing mappings stay valid until they are closed."""
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def read_manifest(manifest_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _code_dtype(categories: int) -> np.dtype:
+    for dtype in (np.int8, np.int16, np.int32):
+        if categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def encode_columns(df: pd.DataFrame):
+    """Lay out the frame's columns for the segment; returns (column specs, arrays, total size)."""
+    specs, arrays = [], []
+    offset = 0
+    for name in df.columns:
+        series = df[name]
+        if series.dtype.kind in 'biufM':
+            values = np.ascontiguousarray(series.to_numpy())
+            spec = {'name': name, 'kind': 'numeric', 'dtype': values.dtype.str}
+        else:
+            codes, uniques = pd.factorize(series, sort=True)
+            values = codes.astype(_code_dtype(len(uniques)))
+            spec = {'name': name, 'kind': 'codes', 'dtype': values.dtype.str,
+                    'categories': [value.item() if hasattr(value, 'item') else value for value in uniques]}
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        spec['offset'] = offset
+        specs.append(spec)
+        arrays.append(values)
+        offset += values.nbytes
+    return specs, arrays, offset
+
+
+def publish(df: pd.DataFrame, manifest_path: str, source: Optional[str] = None) -> Dict[str, Any]:
+    """Write the frame to a new segment and make it the current version."""
+    previous = read_manifest(manifest_path)
+    specs, arrays, size = encode_columns(df)
+
+    segment = f'{SEGMENT_PREFIX}{uuid.uuid4().hex[:16]}'
+    shm = _open_segment(segment, create=True, size=max(size, 1))
+    for spec, values in zip(specs, arrays):
+        target = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf, offset=spec['offset'])
+        target[:] = values
+        del target
+    shm.close()
+
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'version': (previous or {}).get('version', 0) + 1,
+        'segment': segment,
+        'rows': len(df),
+        'size': size,
+        'source': source,
+        'publishedAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'columns': specs,
+    }
+    # Readers see either the old manifest or the new one, never a partial write
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    if previous and previous.get('segment') != segment:
+        unlink_segment(previous['segment'])
+    return manifest
+
+
+class SharedDataset:
+    """Read-only numpy views over one published version of the dataset."""
+
+    def __init__(self, manifest: Dict[str, Any], shm: shared_memory.SharedMemory):
+        self.manifest = manifest
+        # numpy does not hold the buffer export, so closing the segment under live views
+        # would unmap their memory. Every column is a view of one base array instead, and
+        # the segment is closed only once that array (and so every view) is gone.
+        base = np.ndarray((shm.size,), dtype=np.uint8, buffer=shm.buf)
+        weakref.finalize(base, shm.close)
+        self.columns: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, list] = {}
+        for spec in manifest['columns']:
+            dtype = np.dtype(spec['dtype'])
+            start = spec['offset']
+            view = base[start:start + manifest['rows'] * dtype.itemsize].view(dtype)
+            view.setflags(write=False)
+            self.columns[spec['name']] = view
+            if spec['kind'] == 'codes':
+                self.categories[spec['name']] = spec['categories']
+
+    @property
+    def version(self) -> int:
+        return self.manifest['version']
+
+    @property
+    def rows(self) -> int:
+        return self.manifest['rows']
+
+    @classmethod
+    def attach(cls, manifest_path: str, retries: int = 5) -> 'SharedDataset':
+        """Attach to the current version, retrying if it is swapped out while attaching."""
+        for attempt in range(retries):
+            manifest = read_manifest(manifest_path)
+            if manifest is None:
+                raise FileNotFoundError(f"No shared dataset manifest at {manifest_path}")
+            try:
+                return cls(manifest, _open_segment(manifest['segment']))
+            except FileNotFoundError:
+                time.sleep(0.05 * (attempt + 1))
+        raise FileNotFoundError(f"Shared dataset segment in {manifest_path} no longer exists")
+
+    def frame(self, strings: str = 'object') -> pd.DataFrame:
+        """
+        Build a DataFrame over the segment.
+
+        Numeric columns are the shared views themselves. With strings='object'
+        string columns are expanded from their codes into object arrays that all
+        point at the same few category strings, so existing pandas code sees the
+        dtypes it expects; strings='category' wraps the shared codes in
+        Categoricals instead, leaving nothing per-row in private memory.
+        """
+        data = {}
+        for name, values in self.columns.items():
+            if name not in self.categories:
+                data[name] = values
+            elif strings == 'category':
+                data[name] = pd.Categorical.from_codes(values, self.categories[name], validate=False)
+            else:
+                # Code -1 (missing) indexes the trailing NaN
+                lookup = np.array(self.categories[name] + [np.nan], dtype=object)
+                data[name] = lookup[values]
+        return pd.DataFrame(data, copy=False)
+
+    def close(self):
+        """Drop this handle's views; the segment is unmapped once no frame uses it either."""
+        self.columns = {}
+
+
+def attach_or_publish(manifest_path: str, csv_path: str) -> Tuple[SharedDataset, bool]:
+    """Attach to a published dataset, publishing the CSV first if there is none; returns (dataset, published)."""
+    try:
+        return SharedDataset.attach(manifest_path), False
+    except FileNotFoundError:
+        publish(pd.read_csv(csv_path), manifest_path, source=os.path.abspath(csv_path))
+        return SharedDataset.attach(manifest_path), True
+
+
+def release(manifest_path: str):
+    """Unlink the current segment and remove the manifest."""
+    manifest = read_manifest(manifest_path)
+    if manifest is not None:
+        unlink_segment(manifest['segment'])
+        try:
+            os.unlink(manifest_path)
+        except FileNotFoundError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish or inspect the shared-memory dataset")
+    parser.add_argument('command', choices=['publish', 'info', 'release'])
+    parser.add_argument('--manifest', default=os.getenv('SHARED_DATASET_MANIFEST'), required=False)
+    parser.add_argument('--csv', default=os.getenv('DATASET_PATH', './HR-Employee-Attrition-All.csv'))
+    args = parser.parse_args()
+    if not args.manifest:
+        parser.error("--manifest (or SHARED_DATASET_MANIFEST) is required")
+
+    if args.command == 'publish':
+        started = time.perf_counter()
+        manifest = publish(pd.read_csv(args.csv), args.manifest, source=os.path.abspath(args.csv))
+        print(f"Published version {manifest['version']} ({manifest['rows']} rows, "
+              f"{manifest['size'] / 2 ** 20:.1f} MB) as {manifest['segment']} "
+              f"in {time.perf_counter() - started:.2f}s")
+    elif args.command == 'info':
+        manifest = read_manifest(args.manifest)
+        if manifest is None:
+            print(f"No shared dataset at {args.manifest}")
+            return
+        print(f"Version {manifest['version']}: {manifest['rows']} rows, {manifest['size'] / 2 ** 20:.1f} MB "
+              f"in {manifest['segment']} (published {manifest['publishedAt']} from {manifest['source']})")
+        for spec in manifest['columns']:
+            extra = f" ({len(spec['categories'])} categories)" if spec['kind'] == 'codes' else ''
+            print(f"  {spec['name']}: {spec['kind']} {spec['dtype']}{extra}")
+    else:
+        release(args.manifest)
+        print(f"Released {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
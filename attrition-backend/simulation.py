@@ -0,0 +1,324 @@
+"""
+Monte Carlo what-if simulation of retention interventions.
+
+An intervention selects employees by column values and changes feature
+columns for them, e.g.
+
+    {"where": {"Department": ["Sales"]}, "set": {"OverTime": "No"}, "fraction": 0.5}
+    {"where": {"JobLevel": [1]}, "scale": {"MonthlyIncome": 1.10}}
+
+The risk model is linear on the logit scale, so an intervention is an
+additive logit delta on the rows it changes; nothing else is re-scored and
+no feature matrix is built. Interventions everyone adopts shift the fixed
+per-department sums once. For partially adopted ones, each draw decides
+which employees adopt them, and each department's attrition count is drawn
+from the normal approximation of its Poisson-binomial distribution.
+
+Draws run in batches: uint16 adoption draws and a float32 indicator @ weights
+product per adoption state. With SIMULATION_WORKERS > 1 chunks of draws run on a thread pool; the batch
+kernels (random fills, ufuncs, reductions) release the GIL.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from risk_model import RiskModel
+
+OPERATIONS = ('set', 'scale', 'add')
+# Types a column value in an intervention may have
+SCALARS = (str, int, float)
+# Partially adopted interventions give each row 2^k adoption states
+MAX_PARTIAL = 3
+# Elements per (draw, row) batch array
+BATCH_ELEMENTS = 4_000_000
+PERCENTILES = (5, 50, 95)
+
+
+class Intervention:
+    """Rows selected by `where` get `changes`; each one takes them up with probability `fraction`."""
+
+    def __init__(self, where: Dict[str, list], changes: List[Tuple[str, str, Any]], fraction: float = 1.0):
+        self.where = where
+        self.changes = changes
+        self.fraction = fraction
+
+    @classmethod
+    def parse(cls, spec: Dict[str, Any], df: pd.DataFrame, model: RiskModel) -> 'Intervention':
+        """Validate one intervention from a request body; raises ValueError."""
+        if not isinstance(spec, dict):
+            raise ValueError("Each intervention must be an object")
+        where = spec.get('where') or {}
+        if not isinstance(where, dict):
+            raise ValueError("where must map column names to lists of values")
+        for name, values in where.items():
+            if name not in df.columns:
+                raise ValueError(f"Unknown column in where: {name}")
+            if not isinstance(values, list):
+                where[name] = values = [values]
+            if not all(isinstance(value, SCALARS) for value in values):
+                raise ValueError(f"where {name} must list plain values")
+
+        changes = []
+        for op in OPERATIONS:
+            columns = spec.get(op) or {}
+            if not isinstance(columns, dict):
+                raise ValueError(f"{op} must map column names to values")
+            for name, value in columns.items():
+                if not isinstance(value, SCALARS):
+                    raise ValueError(f"{op} {name} needs a single value")
+                if name not in model.terms:
+                    raise ValueError(f"{name} is not a risk model feature")
+                numeric = isinstance(model.terms[name], float)
+                if op != 'set' and not numeric:
+                    raise ValueError(f"Cannot {op} non-numeric column {name}")
+                if numeric and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                    raise ValueError(f"{op} {name} needs a number")
+                if not numeric and value not in set(df[name].dropna().unique()):
+                    raise ValueError(f"{value!r} is not a value of {name}")
+                changes.append((name, op, value))
+        if not changes:
+            raise ValueError(f"An intervention needs at least one of {', '.join(OPERATIONS)}")
+
+        fraction = spec.get('fraction', 1.0)
+        if isinstance(fraction, bool) or not isinstance(fraction, (int, float)) or not 0 <= fraction <= 1:
+            raise ValueError("fraction must be between 0 and 1")
+        return cls(where, changes, float(fraction))
+
+    def rows(self, df: pd.DataFrame) -> np.ndarray:
+        mask = np.ones(len(df), dtype=bool)
+        for name, values in self.where.items():
+            mask &= df[name].isin(values).to_numpy()
+        return np.flatnonzero(mask)
+
+    def deltas(self, df: pd.DataFrame, model: RiskModel) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, logit delta) for the rows this intervention actually changes."""
+        rows = self.rows(df)
+        delta = np.zeros(len(rows))
+        for name, op, value in self.changes:
+            before = df[name].to_numpy()[rows]
+            if op == 'set':
+                after = np.full(len(rows), value, dtype=object if isinstance(value, str) else float)
+            elif op == 'scale':
+                after = before * value
+            else:
+                after = before + value
+            delta += model.contribution(name, after) - model.contribution(name, before)
+        changed = delta != 0
+        return rows[changed], delta[changed]
+
+
+def _simulate_batch(patterns: List[Tuple[List[int], np.ndarray]], fixed_mean: np.ndarray,
+                    fixed_var: np.ndarray, draws: int, seed: np.random.SeedSequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run `draws` draws; returns (expected, simulated) attrition counts, both (draws, groups).
+
+    Each pattern holds the rows touched by the same partially adopted interventions:
+    their adoption thresholds (out of 65536) and, for every non-empty adoption state, a
+    (rows, 2 * groups) matrix of the change in probability and variance it causes in each
+    group. A draw picks each row's state; indicator @ weights gives every group's sums at once.
+    """
+    rng = np.random.default_rng(seed)
+    groups = len(fixed_mean)
+    expected = np.empty((draws, groups))
+    simulated = np.empty((draws, groups))
+    rows = sum(weights.shape[1] for _, weights in patterns)
+    batch = max(1, min(draws, BATCH_ELEMENTS // max(rows, 1)))
+
+    for start in range(0, draws, batch):
+        size = min(batch, draws - start)
+        sums = np.zeros((size, 2 * groups))
+        for thresholds, weights in patterns:
+            shape = (size, weights.shape[1])
+            if len(thresholds) == 1:
+                # One intervention: the adoption indicator is the state
+                adopted = rng.integers(0, 65536, shape, dtype=np.uint16) < thresholds[0]
+                sums += adopted.astype(np.float32) @ weights[0]
+                continue
+            state = np.zeros(shape, dtype=np.uint8)
+            for bit, threshold in enumerate(thresholds):
+                adopted = rng.integers(0, 65536, shape, dtype=np.uint16) < threshold
+                state |= adopted.view(np.uint8) << bit
+            for s, state_weights in enumerate(weights, start=1):
+                sums += (state == s).astype(np.float32) @ state_weights
+        mean = fixed_mean + sums[:, :groups]
+        var = np.clip(fixed_var + sums[:, groups:], 0, None)
+        expected[start:start + size] = mean
+        simulated[start:start + size] = np.clip(rng.normal(mean, np.sqrt(var)).round(), 0, None)
+    return expected, simulated
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> ThreadPoolExecutor:
+    """Thread pool for the draws, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='simulation')
+        return _pool
+
+
+class Simulator:
+    """Baseline risk of one dataset version, grouped for what-if runs."""
+
+    def __init__(self, df: pd.DataFrame, model: RiskModel, logits: np.ndarray, group_column: str = 'Department'):
+        self.df = df
+        self.model = model
+        self.logits = logits.astype(np.float32)
+        self.group_column = group_column
+        codes, labels = pd.factorize(df[group_column], sort=True)
+        # Rows without a group are pooled under "Unknown"
+        if (codes < 0).any():
+            labels = list(labels) + ['Unknown']
+            codes = np.where(codes < 0, len(labels) - 1, codes)
+        self.codes = codes
+        self.labels = [str(label) for label in labels]
+
+        p = RiskModel.probability(logits)
+        self.baseline_mean = np.bincount(codes, weights=p, minlength=len(self.labels))
+        self.baseline_var = np.bincount(codes, weights=p * (1 - p), minlength=len(self.labels))
+        self.headcount = np.bincount(codes, minlength=len(self.labels))
+
+    def run(self, interventions: List[Intervention], draws: int = 2000, seed: Optional[int] = None,
+            budget_seconds: float = 5.0, workers: int = 1,
+            should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """
+        Simulate the interventions; raises ValueError if too many are partially adopted.
+
+        Draws stop at the budget, or once `should_stop` returns true (e.g. a
+        cancelled job), with the draws finished so far summarized. The first
+        chunk of draws always finishes, so there is always an estimate.
+        """
+        started = time.perf_counter()
+        partial = [k for k, intervention in enumerate(interventions) if 0 < intervention.fraction < 1]
+        if len(partial) > MAX_PARTIAL:
+            raise ValueError(f"At most {MAX_PARTIAL} interventions can have a fraction below 1")
+
+        # Logit deltas of every intervention over the union of the rows they change
+        changed = [intervention.deltas(self.df, self.model) for intervention in interventions]
+        rows = np.unique(np.concatenate([r for r, _ in changed])) if changed else np.zeros(0, dtype=np.int64)
+        deltas = np.zeros((len(interventions), len(rows)))
+        for k, (changed_rows, delta) in enumerate(changed):
+            deltas[k, np.searchsorted(rows, changed_rows)] = delta
+
+        # Interventions everyone adopts shift the logits once; their rows need no draws
+        base = self.logits[rows].astype(float)
+        full = [k for k, intervention in enumerate(interventions) if intervention.fraction >= 1]
+        logits = base + deltas[full].sum(axis=0)
+        codes = self.codes[rows]
+        groups = len(self.labels)
+        p_base = RiskModel.probability(base)
+        p_adopted = RiskModel.probability(logits)
+        fixed_mean = (self.baseline_mean - np.bincount(codes, weights=p_base, minlength=groups)
+                      + np.bincount(codes, weights=p_adopted, minlength=groups))
+        fixed_var = (self.baseline_var - np.bincount(codes, weights=p_base * (1 - p_base), minlength=groups)
+                     + np.bincount(codes, weights=p_adopted * (1 - p_adopted), minlength=groups))
+
+        # Rows touched by the same partially adopted interventions share one state space
+        touched = deltas[partial] != 0
+        pattern_ids = (touched.astype(np.int64) << np.arange(len(partial))[:, None]).sum(axis=0)
+        patterns = []
+        for pattern in np.unique(pattern_ids[pattern_ids > 0]):
+            members = [k for bit, k in enumerate(partial) if pattern >> bit & 1]
+            selected = np.flatnonzero(pattern_ids == pattern)
+            # Adoption is drawn as uint16 < threshold, so fractions are quantized to 1/65536
+            thresholds = [min(round(interventions[k].fraction * 65536), 65535) for k in members]
+            weights = np.zeros((2 ** len(members) - 1, len(selected), 2 * groups), dtype=np.float32)
+            p0 = p_adopted[selected]
+            for s in range(1, 2 ** len(members)):
+                adopted = [k for bit, k in enumerate(members) if s >> bit & 1]
+                p = RiskModel.probability(logits[selected] + deltas[adopted][:, selected].sum(axis=0))
+                weights[s - 1, np.arange(len(selected)), codes[selected]] = p - p0
+                weights[s - 1, np.arange(len(selected)), groups + codes[selected]] = p * (1 - p) - p0 * (1 - p0)
+            patterns.append((thresholds, weights))
+
+        # Independent, reproducible streams per chunk of draws
+        chunk = max(1, min(draws, 250))
+        chunks = [min(chunk, draws - start) for start in range(0, draws, chunk)]
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+        args = (patterns, fixed_mean, fixed_var)
+
+        results = []
+        deadline = started + budget_seconds
+        stopped = should_stop or (lambda: False)
+        if workers > 1 and len(chunks) > 1:
+            pool = get_pool(workers)
+            pending = {pool.submit(_simulate_batch, *args, size, s) for size, s in zip(chunks, seeds)}
+            while pending and not (results and (time.perf_counter() >= deadline or stopped())):
+                # Like the serial loop, the first chunk finishes even past the budget
+                timeout = max(deadline - time.perf_counter(), 0) if results else None
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+            for future in pending:
+                future.cancel()
+        else:
+            for size, s in zip(chunks, seeds):
+                if results and (time.perf_counter() >= deadline or stopped()):
+                    break
+                results.append(_simulate_batch(*args, size, s))
+
+        expected = np.concatenate([e for e, _ in results]) if results else np.zeros((0, groups))
+        simulated = np.concatenate([s for _, s in results]) if results else np.zeros((0, groups))
+        return self._summarize(expected, simulated, len(rows), draws, time.perf_counter() - started)
+
+    def _summarize(self, expected: np.ndarray, simulated: np.ndarray, affected: int, requested: int,
+                   seconds: float) -> Dict[str, Any]:
+        def distribution(baseline_mean, baseline_var, expected_counts, simulated_counts, headcount):
+            headcount = max(int(headcount), 1)
+            baseline_sd = float(np.sqrt(baseline_var))
+            summary = {
+                'headcount': int(headcount),
+                'baseline': {
+                    'expectedAttrition': round(float(baseline_mean), 2),
+                    'expectedRate': round(float(baseline_mean) / headcount * 100, 3),
+                    # Outcome spread of the baseline under the same normal approximation
+                    'p5': round(max(float(baseline_mean) - 1.645 * baseline_sd, 0), 1),
+                    'p95': round(float(baseline_mean) + 1.645 * baseline_sd, 1),
+                },
+            }
+            if len(simulated_counts):
+                percentiles = np.percentile(simulated_counts, PERCENTILES)
+                mean = float(expected_counts.mean())
+                summary['scenario'] = {
+                    'expectedAttrition': round(mean, 2),
+                    'expectedRate': round(mean / headcount * 100, 3),
+                    'change': round(mean - float(baseline_mean), 2),
+                    **{f'p{q}': round(float(v), 1) for q, v in zip(PERCENTILES, percentiles)},
+                    'rateHistogram': self._histogram(simulated_counts / headcount * 100),
+                }
+            return summary
+
+        groups = {
+            label: distribution(self.baseline_mean[g], self.baseline_var[g], expected[:, g], simulated[:, g],
+                                self.headcount[g])
+            for g, label in enumerate(self.labels)
+        }
+        total = distribution(self.baseline_mean.sum(), self.baseline_var.sum(), expected.sum(axis=1),
+                             simulated.sum(axis=1), self.headcount.sum())
+        return {
+            'groupBy': self.group_column,
+            'groups': groups,
+            'total': total,
+            'affectedEmployees': affected,
+            'draws': len(simulated),
+            'requestedDraws': requested,
+            'truncated': len(simulated) < requested,
+            'seconds': round(seconds, 3),
+        }
+
+    @staticmethod
+    def _histogram(values: np.ndarray, bins: int = 20) -> Dict[str, list]:
+        counts, edges = np.histogram(values, bins=bins)
+        return {'edges': [round(float(e), 3) for e in edges], 'counts': counts.tolist()}
+
+
+def simulation_workers() -> int:
+    return int(os.getenv('SIMULATION_WORKERS', min(os.cpu_count() or 1, 4)))
@@ -0,0 +1,398 @@
+"""
+Mergeable per-column sketches behind /api/dataset-metadata and the chat context.
+
+Each column keeps its count, missing values, mean and sum of squared deviations
+(merged with Chan's formula), min/max, a Misra-Gries heavy-hitter table for its
+top values, a HyperLogLog for its distinct count and, for numeric columns, a KLL
+sketch for quantiles. While a column has at most `capacity` distinct values the
+heavy-hitter table holds every value exactly and answers quantiles and distinct
+counts itself; the KLL sketch only starts once it overflows. Sketches built per
+chunk (or per process) merge into the sketch of the whole dataset.
+"""
+
+import copy
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Values tracked exactly per column before the top-value table starts trimming
+DEFAULT_CAPACITY = 128
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang and Liberty): items on level h stand for
+    2^h input values. A level over capacity is sorted and every other item,
+    from a random offset, is promoted to the level above. With k=400 the rank
+    error stays around 0.5-1% over 1M values, merged from chunks of any size.
+    """
+
+    def __init__(self, k: int = 400, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.zeros(0)]
+        self._rng = np.random.default_rng(seed)
+        self._sorted = None
+
+    @classmethod
+    def from_counts(cls, values: np.ndarray, counts: np.ndarray, k: int = 400) -> 'KLLSketch':
+        """Sketch of `values` repeated `counts` times: each set bit of a count puts the value on that level."""
+        sketch = cls(k)
+        counts = counts.astype(np.int64)
+        sketch.n = int(counts.sum())
+        top = int(counts.max()).bit_length() if len(counts) else 0
+        sketch.levels = [values[(counts >> h) & 1 == 1].astype(float) for h in range(max(top, 1))]
+        sketch._compress()
+        return sketch
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        self._sorted = None
+        compacted = True
+        while compacted:
+            compacted = False
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if len(items) <= self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                items = np.sort(items)
+                # With an odd count the largest item stays behind, so no weight is lost
+                paired = len(items) - len(items) % 2
+                promoted = items[self._rng.integers(2):paired:2]
+                self.levels[level] = items[paired:]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                compacted = True
+
+    def update(self, values: np.ndarray):
+        self.levels[0] = np.concatenate([self.levels[0], np.asarray(values, dtype=float)])
+        self.n += len(values)
+        self._compress()
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        merged = KLLSketch(self.k)
+        merged.n = self.n + other.n
+        depth = max(len(self.levels), len(other.levels))
+        merged.levels = [
+            np.concatenate([levels[h] for levels in (self.levels, other.levels) if h < len(levels)])
+            for h in range(depth)
+        ]
+        merged._compress()
+        return merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self._sorted is None:
+            items = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+            order = np.argsort(items, kind='stable')
+            self._sorted = (items[order], np.cumsum(weights[order]))
+        items, cumulative = self._sorted
+        if not len(items):
+            return None
+        position = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(items[min(position, len(items) - 1)])
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over 64-bit hashes; merging takes the register-wise maximum."""
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @staticmethod
+    def _hash(values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values)
+        # Integer and float chunks of the same column must hash 3 and 3.0 alike
+        if values.dtype.kind in 'biuf':
+            values = values.astype(float)
+        return pd.util.hash_array(values)
+
+    def update(self, values: np.ndarray):
+        """Add values; duplicates don't change the registers, so distinct values are enough."""
+        if not len(values):
+            return
+        hashes = self._hash(values)
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # Rank = leading zeros of the remaining bits + 1; frexp is exact below 2^53
+        _, exponent = np.frexp(rest.astype(float))
+        rank = np.where(rest == 0, bits + 1, bits - exponent + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        merged = HyperLogLog(self.precision)
+        merged.registers = np.maximum(self.registers, other.registers)
+        return merged
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class HeavyHitters:
+    """
+    Misra-Gries summary of value counts, kept at `capacity` values.
+
+    When trimming, the largest dropped count is subtracted from every kept
+    count and added to `error`, which bounds how far any count may be
+    underestimated. With `error` at zero the table is exact.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    @property
+    def exact(self) -> bool:
+        return self.error == 0
+
+    def _with(self, counts: pd.Series, error: int) -> 'HeavyHitters':
+        summary = HeavyHitters(self.capacity)
+        counts = counts[counts > 0].astype(np.int64)
+        if len(counts) > self.capacity:
+            dropped = int(counts.nlargest(self.capacity + 1).iloc[-1])
+            counts = counts[counts > dropped] - dropped
+            error += dropped
+        summary.counts, summary.error = counts, error
+        return summary
+
+    def _combined(self, counts: pd.Series, sign: int = 1) -> pd.Series:
+        if not len(self.counts):
+            return counts * sign
+        return self.counts.add(counts * sign, fill_value=0)
+
+    def add(self, counts: pd.Series) -> 'HeavyHitters':
+        return self._with(self._combined(counts), self.error)
+
+    def subtract(self, counts: pd.Series) -> 'HeavyHitters':
+        return self._with(self._combined(counts, -1), self.error)
+
+    def merge(self, other: 'HeavyHitters') -> 'HeavyHitters':
+        return self._with(self._combined(other.counts), self.error + other.error)
+
+    def top(self, n: int) -> Dict[Any, int]:
+        return {_python(value): int(count) for value, count in self.counts.nlargest(n).items()}
+
+
+def _python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ColumnSketch:
+    """Summary statistics of one column, mergeable across chunks."""
+
+    def __init__(self, numeric: bool, capacity: int = DEFAULT_CAPACITY):
+        self.numeric = numeric
+        self.capacity = capacity
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.values = HeavyHitters(capacity)
+        self.distinct = HyperLogLog()
+        self.quantiles: Optional[KLLSketch] = None
+        self._table = None
+
+    @classmethod
+    def from_counts(cls, counts: pd.Series, missing: int = 0, numeric: bool = False,
+                    capacity: int = DEFAULT_CAPACITY) -> 'ColumnSketch':
+        """Sketch of a column given its value counts."""
+        sketch = cls(numeric, capacity)
+        counts = counts[counts > 0]
+        sketch.count = int(counts.sum())
+        sketch.missing = int(missing)
+        sketch.distinct.update(counts.index.to_numpy())
+        sketch.values = sketch.values.add(counts)
+        if numeric and sketch.count:
+            values = counts.index.to_numpy(dtype=float)
+            weights = counts.to_numpy(dtype=float)
+            sketch.mean = float((values * weights).sum() / sketch.count)
+            sketch.m2 = float((weights * (values - sketch.mean) ** 2).sum())
+            sketch.min, sketch.max = float(values.min()), float(values.max())
+            if not sketch.values.exact:
+                sketch.quantiles = KLLSketch.from_counts(values, counts.to_numpy())
+        return sketch
+
+    @classmethod
+    def of(cls, series: pd.Series, capacity: int = DEFAULT_CAPACITY) -> 'ColumnSketch':
+        counts = series.value_counts(sort=False, dropna=True)
+        return cls.from_counts(counts, len(series) - int(counts.sum()), series.dtype.kind in 'biuf', capacity)
+
+    def _quantile_sketch(self) -> KLLSketch:
+        if self.quantiles is not None:
+            return self.quantiles
+        return KLLSketch.from_counts(self.values.counts.index.to_numpy(dtype=float), self.values.counts.to_numpy())
+
+    def merge(self, other: 'ColumnSketch') -> 'ColumnSketch':
+        # A chunk with only missing values may have been read with another dtype
+        if not other.count:
+            numeric = self.numeric
+        elif not self.count:
+            numeric = other.numeric
+        else:
+            numeric = self.numeric and other.numeric
+        merged = ColumnSketch(numeric, self.capacity)
+        merged.count = self.count + other.count
+        merged.missing = self.missing + other.missing
+        if merged.count:
+            delta = other.mean - self.mean
+            merged.mean = self.mean + delta * other.count / merged.count
+            merged.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / merged.count
+        bounds = [s for s in (self, other) if s.count and s.min is not None]
+        if bounds:
+            merged.min = min(s.min for s in bounds)
+            merged.max = max(s.max for s in bounds)
+        merged.values = self.values.merge(other.values)
+        merged.distinct = self.distinct.merge(other.distinct)
+        if numeric and not merged.values.exact:
+            merged.quantiles = self._quantile_sketch().merge(other._quantile_sketch())
+        return merged
+
+    def replace(self, old: pd.Series, new: pd.Series) -> 'ColumnSketch':
+        """
+        Sketch after rows holding `old` values were changed to `new` ones.
+
+        Counts, mean, variance and an exact value table are updated exactly;
+        the KLL and HyperLogLog sketches can't forget values, so the old ones
+        stay in them.
+        """
+        removed = ColumnSketch.of(old, self.capacity)
+        updated = self.merge(ColumnSketch.of(new, self.capacity))
+        updated.count -= removed.count
+        updated.missing -= removed.missing
+        if updated.count and removed.count:
+            # Chan's formula solved for the part that remains
+            total = updated.count + removed.count
+            mean = (total * updated.mean - removed.count * removed.mean) / updated.count
+            delta = removed.mean - mean
+            updated.m2 = max(updated.m2 - removed.m2 - delta ** 2 * updated.count * removed.count / total, 0.0)
+            updated.mean = mean
+        updated.values = updated.values.subtract(removed.values.counts)
+        if updated.numeric and updated.values.exact and len(updated.values.counts):
+            values = updated.values.counts.index.to_numpy(dtype=float)
+            updated.min, updated.max = float(values.min()), float(values.max())
+        return updated
+
+    def distinct_count(self) -> int:
+        return len(self.values.counts) if self.values.exact else self.distinct.estimate()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.numeric or not self.count:
+            return None
+        if self.quantiles is not None:
+            return float(np.clip(self.quantiles.quantile(q), self.min, self.max))
+        # Exact table: linear interpolation between the neighbouring ranks, as pandas does
+        if self._table is None:
+            counts = self.values.counts.sort_index()
+            self._table = (counts.index.to_numpy(dtype=float), counts.to_numpy().cumsum())
+        values, cumulative = self._table
+        position = q * (self.count - 1)
+        lower, upper = math.floor(position), math.ceil(position)
+        low = values[np.searchsorted(cumulative, lower, side='right')]
+        high = values[np.searchsorted(cumulative, upper, side='right')]
+        return float(low + (high - low) * (position - lower))
+
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float('nan')
+
+
+class DatasetSketch:
+    """ColumnSketch per column, built chunk by chunk."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.rows = 0
+        self.columns: Dict[str, ColumnSketch] = {}
+
+    @classmethod
+    def of(cls, frame: pd.DataFrame, capacity: int = DEFAULT_CAPACITY) -> 'DatasetSketch':
+        sketch = cls(capacity)
+        sketch.update(frame)
+        return sketch
+
+    def update(self, frame: pd.DataFrame):
+        """Fold a chunk of rows in."""
+        self.merge_in(DatasetSketch._of_chunk(frame, self.capacity))
+
+    @classmethod
+    def _of_chunk(cls, frame: pd.DataFrame, capacity: int) -> 'DatasetSketch':
+        sketch = cls(capacity)
+        sketch.rows = len(frame)
+        sketch.columns = {name: ColumnSketch.of(frame[name], capacity) for name in frame.columns}
+        return sketch
+
+    def merge_in(self, other: 'DatasetSketch'):
+        """Merge another sketch (another chunk or process) into this one."""
+        for name in list(self.columns) + [name for name in other.columns if name not in self.columns]:
+            mine, theirs = self.columns.get(name), other.columns.get(name)
+            # A column missing on one side is missing for all of that side's rows
+            if mine is None:
+                mine = copy.copy(theirs)
+                mine.missing += self.rows
+                self.columns[name] = mine
+            elif theirs is None:
+                mine.missing += other.rows
+            else:
+                self.columns[name] = mine.merge(theirs)
+        self.rows += other.rows
+
+    def replace(self, column: str, old: Iterable, new: Iterable):
+        if column in self.columns:
+            self.columns[column] = self.columns[column].replace(pd.Series(old), pd.Series(new))
+
+    def add_indicators(self, columns: Iterable[str], suffix: str = '_Binary'):
+        """Sketch <column>_Binary (Yes = 1, No = 0) columns from their source column's exact value table."""
+        for name in columns:
+            source = self.columns.get(name[:-len(suffix)]) if name.endswith(suffix) else None
+            if name in self.columns or source is None or not source.values.exact:
+                continue
+            counts = source.values.counts
+            indicator = pd.Series({1: counts.get('Yes', 0), 0: counts.get('No', 0)})
+            self.columns[name] = ColumnSketch.from_counts(indicator, self.rows - int(indicator.sum()), True,
+                                                          self.capacity)
+
+    def numeric_columns(self) -> List[str]:
+        return [name for name, sketch in self.columns.items() if sketch.numeric]
+
+    def categorical_columns(self) -> List[str]:
+        return [name for name, sketch in self.columns.items() if not sketch.numeric]
+
+    def missing_values(self) -> int:
+        return sum(sketch.missing for sketch in self.columns.values())
+
+    def top_values(self, column: str, n: int = 5) -> Dict[Any, int]:
+        return self.columns[column].values.top(n)
+
+    def describe(self, columns: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """The statistics of DataFrame.describe() for numeric columns."""
+        result = {}
+        for name in columns:
+            sketch = self.columns[name]
+            result[name] = {
+                'count': float(sketch.count),
+                'mean': sketch.mean if sketch.count else float('nan'),
+                'std': sketch.std(),
+                'min': sketch.min,
+                '25%': sketch.quantile(0.25),
+                '50%': sketch.quantile(0.5),
+                '75%': sketch.quantile(0.75),
+                'max': sketch.max,
+            }
+        return result
@@ -0,0 +1,366 @@
+"""
+Storage backends for the attrition aggregations.
+
+`PandasBackend` answers from the in-process DataFrame. `SQLBackend` pushes the
+same aggregations down to the database as GROUP BY queries over a pooled async
+SQLAlchemy engine (SQLite via aiosqlite locally, Postgres via asyncpg).
+`StreamingBackend` answers from counts built in one chunked pass over the CSV.
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from filters import filter_mask, filter_sql
+
+# Dimensions served by the /api/attrition-by-* endpoints.
+# Binned dimensions keep their label order; the others are sorted by label.
+DIMENSIONS = {
+    'age': {
+        'column': 'Age',
+        'bins': [18, 25, 35, 45, 55, 65],
+        'labels': ['18-25', '26-35', '36-45', '46-55', '56-65'],
+    },
+    'gender': {'column': 'Gender'},
+    'department': {'column': 'Department'},
+    'education': {
+        'column': 'Education',
+        'mapping': {1: 'Below College', 2: 'College', 3: 'Bachelor', 4: 'Master', 5: 'Doctor'},
+    },
+    'job-satisfaction': {
+        'column': 'JobSatisfaction',
+        'mapping': {1: 'Low', 2: 'Medium', 3: 'High', 4: 'Very High'},
+    },
+    'salary': {
+        # Annual income bands
+        'column': 'MonthlyIncome',
+        'scale': 12,
+        'bins': [0, 50000, 100000, 150000, 200000, float('inf')],
+        'labels': ['<50K', '50K-100K', '100K-150K', '150K-200K', '>200K'],
+    },
+}
+
+
+def format_attrition(labels: List[Any], yes_counts: List[int], no_counts: List[int]) -> Dict[str, Any]:
+    """Build the labels/yesCount/noCount/rates payload for an attrition breakdown."""
+    rates = [
+        round(yes / (yes + no) * 100, 2) if yes + no > 0 else float('nan')
+        for yes, no in zip(yes_counts, no_counts)
+    ]
+    return {
+        'labels': labels,
+        'yesCount': yes_counts,
+        'noCount': no_counts,
+        'rates': rates
+    }
+
+
+def format_summary(total: int, attrition: int, retention: int,
+                   departments: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Build the overall-statistics payload, with department stats for filtered data."""
+    result = {
+        'totalEmployees': int(total),
+        'attritionCount': int(attrition),
+        'retentionCount': int(retention),
+        'attritionRate': float(round(attrition / total * 100, 2)) if total > 0 else 0.0
+    }
+    if departments is not None:
+        result['filteredData'] = True
+        result['departmentStats'] = [
+            {
+                'name': dept['name'],
+                'count': int(dept['count']),
+                'attrition': int(dept['attrition']),
+                'rate': round(dept['attrition'] / dept['count'] * 100, 2) if dept['count'] > 0 else 0
+            }
+            for dept in departments
+        ]
+    return result
+
+
+class StorageBackend:
+    """Interface shared by the storage backends."""
+
+    name = 'base'
+
+    def attrition_by(self, dimension: str) -> Dict[str, Any]:
+        """Return attrition counts and rates for one of DIMENSIONS."""
+        raise NotImplementedError
+
+    def overall_statistics(self) -> Dict[str, Any]:
+        """Return total, attrition and retention counts for the whole dataset."""
+        raise NotImplementedError
+
+    def filtered_summary(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Return overall and per-department statistics for the filtered rows."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the backend."""
+
+
+class PandasBackend(StorageBackend):
+    """
+    Aggregations over an in-process DataFrame.
+
+    When an AggregateState is attached, the unfiltered breakdowns are served
+    from its incrementally maintained counters.
+    """
+
+    name = 'pandas'
+
+    def __init__(self, dataframe: pd.DataFrame, aggregates=None):
+        self.dataframe = dataframe
+        self.aggregates = aggregates
+
+    def _dimension_values(self, spec: Dict[str, Any]) -> pd.Series:
+        values = self.dataframe[spec['column']]
+        if 'scale' in spec:
+            values = values * spec['scale']
+        if 'bins' in spec:
+            return pd.cut(values, bins=spec['bins'], labels=spec['labels'])
+        if 'mapping' in spec:
+            return values.map(spec['mapping'])
+        return values
+
+    def attrition_by(self, dimension: str) -> Dict[str, Any]:
+        if self.aggregates is not None:
+            return self.aggregates.attrition_by(dimension)
+        spec = DIMENSIONS[dimension]
+        keys = self._dimension_values(spec)
+        counts = self.dataframe.groupby([keys, 'Attrition'], observed=False).size().unstack(fill_value=0)
+        counts = counts.reindex(columns=['Yes', 'No'], fill_value=0)
+        return format_attrition(counts.index.tolist(), counts['Yes'].tolist(), counts['No'].tolist())
+
+    def overall_statistics(self) -> Dict[str, Any]:
+        if self.aggregates is not None:
+            return self.aggregates.overall_statistics()
+        attrition = self.dataframe['Attrition']
+        return format_summary(len(attrition), (attrition == 'Yes').sum(), (attrition == 'No').sum())
+
+    def filtered_summary(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        filtered_df = self.dataframe[filter_mask(self.dataframe, filters)]
+        attrited = filtered_df['Attrition'] == 'Yes'
+
+        dept_stats = filtered_df.groupby('Department').size().to_dict()
+        dept_attrition = filtered_df[attrited].groupby('Department').size().to_dict()
+        departments = [
+            {'name': dept, 'count': count, 'attrition': dept_attrition.get(dept, 0)}
+            for dept, count in dept_stats.items()
+        ]
+        return format_summary(len(filtered_df), attrited.sum(), (filtered_df['Attrition'] == 'No').sum(),
+                              departments)
+
+
+def resolve_database_url(url: str) -> str:
+    """Map a plain database URL onto the async driver used by SQLAlchemy."""
+    from sqlalchemy.engine import make_url
+
+    parsed = make_url(url)
+
+    if parsed.drivername in ('postgres', 'postgresql'):
+        # asyncpg expects `ssl` rather than libpq's `sslmode`
+        query = dict(parsed.query)
+        if 'sslmode' in query:
+            query['ssl'] = query.pop('sslmode')
+        parsed = parsed.set(drivername='postgresql+asyncpg', query=query)
+    elif parsed.drivername == 'sqlite':
+        parsed = parsed.set(drivername='sqlite+aiosqlite')
+    return parsed.render_as_string(hide_password=False)
+
+
+class SQLBackend(StorageBackend):
+    """
+    Aggregations pushed down to a SQL database.
+
+    Flask handlers are synchronous, so queries are scheduled on a dedicated
+    event loop thread that owns the async engine and its connection pool.
+    """
+
+    name = 'sql'
+
+    def __init__(self, database_url: str, table: str = 'hr_attrition',
+                 pool_size: int = 5, max_overflow: int = 10):
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        self.database_url = resolve_database_url(database_url)
+        self.table = table
+
+        engine_options = {'pool_pre_ping': True}
+        if not self.database_url.startswith('sqlite'):
+            engine_options.update(pool_size=pool_size, max_overflow=max_overflow)
+        self.engine = create_async_engine(self.database_url, **engine_options)
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='sql-backend', daemon=True)
+        self._thread.start()
+
+    def _run(self, coroutine):
+        """Run a coroutine on the backend's event loop and wait for the result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _fetch(self, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+        from sqlalchemy import text
+
+        async with self.engine.connect() as conn:
+            result = await conn.execute(text(sql), params or {})
+            return result.fetchall()
+
+    def query(self, sql: str, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Execute a read-only query and return all rows."""
+        return self._run(self._fetch(sql, params))
+
+    def load_dataframe(self, dataframe: pd.DataFrame, if_exists: str = 'replace'):
+        """Write a DataFrame into the backend table (used to seed local databases)."""
+        async def write():
+            async with self.engine.begin() as conn:
+                await conn.run_sync(
+                    lambda sync_conn: dataframe.to_sql(self.table, sync_conn, if_exists=if_exists,
+                                                       index=False, chunksize=10000)
+                )
+        self._run(write())
+
+    @staticmethod
+    def _dimension_expression(spec: Dict[str, Any]) -> str:
+        column = f'"{spec["column"]}"'
+        if 'scale' in spec:
+            column = f'({column} * {spec["scale"]})'
+
+        if 'bins' in spec:
+            # pd.cut semantics: right-closed intervals (low, high]
+            cases = []
+            for low, high, label in zip(spec['bins'][:-1], spec['bins'][1:], spec['labels']):
+                upper = '' if np.isinf(high) else f' AND {column} <= {high}'
+                cases.append(f"WHEN {column} > {low}{upper} THEN '{label}'")
+            return f"CASE {' '.join(cases)} END"
+
+        if 'mapping' in spec:
+            cases = [f"WHEN {column} = {key} THEN '{label}'" for key, label in spec['mapping'].items()]
+            return f"CASE {' '.join(cases)} END"
+
+        return column
+
+    def attrition_by(self, dimension: str) -> Dict[str, Any]:
+        spec = DIMENSIONS[dimension]
+        rows = self.query(
+            f"""
+            SELECT {self._dimension_expression(spec)} AS label,
+                   SUM(CASE WHEN "Attrition" = 'Yes' THEN 1 ELSE 0 END) AS yes_count,
+                   SUM(CASE WHEN "Attrition" = 'No' THEN 1 ELSE 0 END) AS no_count
+            FROM "{self.table}"
+            GROUP BY 1
+            """
+        )
+        counts = {row.label: (int(row.yes_count), int(row.no_count)) for row in rows if row.label is not None}
+
+        if 'bins' in spec:
+            labels = spec['labels']
+        else:
+            labels = sorted(counts)
+        return format_attrition(
+            labels,
+            [counts.get(label, (0, 0))[0] for label in labels],
+            [counts.get(label, (0, 0))[1] for label in labels]
+        )
+
+    def overall_statistics(self) -> Dict[str, Any]:
+        row = self.query(
+            f"""
+            SELECT COUNT(*) AS total,
+                   SUM(CASE WHEN "Attrition" = 'Yes' THEN 1 ELSE 0 END) AS yes_count,
+                   SUM(CASE WHEN "Attrition" = 'No' THEN 1 ELSE 0 END) AS no_count
+            FROM "{self.table}"
+            """
+        )[0]
+        return format_summary(row.total, row.yes_count or 0, row.no_count or 0)
+
+    def filtered_summary(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        where, params = filter_sql(filters)
+        rows = self.query(
+            f"""
+            SELECT "Department" AS name,
+                   COUNT(*) AS count,
+                   SUM(CASE WHEN "Attrition" = 'Yes' THEN 1 ELSE 0 END) AS yes_count,
+                   SUM(CASE WHEN "Attrition" = 'No' THEN 1 ELSE 0 END) AS no_count
+            FROM "{self.table}"
+            WHERE {where}
+            GROUP BY "Department"
+            ORDER BY "Department"
+            """,
+            params
+        )
+        departments = [
+            {'name': row.name, 'count': row.count, 'attrition': row.yes_count} for row in rows
+        ]
+        return format_summary(
+            sum(row.count for row in rows),
+            sum(row.yes_count for row in rows),
+            sum(row.no_count for row in rows),
+            departments
+        )
+
+    def close(self):
+        self._run(self.engine.dispose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class StreamingBackend(StorageBackend):
+    """
+    Aggregations served from a StreamingAggregates pass instead of the rows.
+
+    The unfiltered breakdowns come from its counters. Filtered summaries run
+    filter_mask over its count cube, whose rows are the distinct combinations
+    of the filtered columns, and add up the counts of the matching cells.
+    """
+
+    name = 'streaming'
+
+    def __init__(self, aggregates):
+        self.aggregates = aggregates
+        self.cube = aggregates.cube
+
+    def attrition_by(self, dimension: str) -> Dict[str, Any]:
+        return self.aggregates.attrition_by(dimension)
+
+    def overall_statistics(self) -> Dict[str, Any]:
+        return self.aggregates.overall_statistics()
+
+    def filtered_summary(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        matched = self.cube[filter_mask(self.cube, filters)]
+        by_department = matched.groupby('Department')[['count', 'yes']].sum()
+        departments = [
+            {'name': dept, 'count': count, 'attrition': yes}
+            for dept, count, yes in zip(by_department.index, by_department['count'], by_department['yes'])
+        ]
+        return format_summary(matched['count'].sum(), matched['yes'].sum(), matched['no'].sum(), departments)
+
+
+def create_backend(dataframe: pd.DataFrame, aggregates=None) -> StorageBackend:
+    """
+    Create the storage backend selected by the environment.
+
+    STORAGE_BACKEND=sql uses DATABASE_URL (table DATASET_TABLE, default
+    hr_attrition); STORAGE_BACKEND=streaming serves from `aggregates`, which
+    must then be a StreamingAggregates; anything else serves from the
+    in-process DataFrame.
+    """
+    backend = os.getenv('STORAGE_BACKEND', 'pandas').lower()
+    if backend == 'streaming':
+        return StreamingBackend(aggregates)
+    if backend != 'sql':
+        return PandasBackend(dataframe, aggregates)
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        raise ValueError("STORAGE_BACKEND=sql requires DATABASE_URL to be set")
+
+    return SQLBackend(
+        database_url,
+        table=os.getenv('DATASET_TABLE', 'hr_attrition'),
+        pool_size=int(os.getenv('DATABASE_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('DATABASE_MAX_OVERFLOW', 10)),
+    )
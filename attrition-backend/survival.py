@@ -0,0 +1,162 @@
+"""
+Kaplan-Meier tenure analysis.
+
+All cohorts of a grouping column are estimated together: observations are
+bucketed into a (cohort x distinct time) grid with a single bincount, and the
+survival curves, Greenwood variances and confidence bands are computed with
+array operations over that grid.
+"""
+
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DAYS_PER_YEAR = 365.25
+
+# Cohort columns offered by default; any other low-cardinality column works too
+DEFAULT_COHORTS = ['Department', 'JobLevel', 'HireYear', 'OverTime']
+MAX_COHORT_GROUPS = 200
+
+
+def build_tenure_frame(df: pd.DataFrame, employee_records: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Return the dataset with `Tenure` (years) and `Exited` (bool) columns.
+
+    When hire/exit dates are available (employees.csv) they are used for the
+    matching employees; everyone else falls back to YearsAtCompany/Attrition.
+    """
+    # Shallow copy: the dataset's columns are shared, only the added ones are new
+    tenure_df = df.copy(deep=False)
+    tenure = df['YearsAtCompany'].to_numpy(dtype=float)
+    exited = (df['Attrition'] == 'Yes').to_numpy()
+
+    if employee_records is not None and 'EmployeeNumber' in df.columns:
+        # Line the dates up with the dataset rows without merging (and copying) the whole frame
+        dates = employee_records[['EmployeeNumber', 'hire_date', 'exit_date']]
+        dates = dates.drop_duplicates('EmployeeNumber').set_index('EmployeeNumber')
+        dates = dates.reindex(df['EmployeeNumber'].to_numpy())
+
+        hire = pd.to_datetime(dates['hire_date'], errors='coerce')
+        exit_ = pd.to_datetime(dates['exit_date'], errors='coerce')
+        # Censor active employees at the latest date seen in the data
+        reference = max(hire.max(), exit_.max()) if exit_.notna().any() else hire.max()
+
+        has_dates = hire.notna().to_numpy()
+        end = exit_.fillna(reference)
+        date_tenure = ((end - hire).dt.days / DAYS_PER_YEAR).to_numpy(dtype=float)
+
+        tenure = np.where(has_dates, date_tenure, tenure)
+        exited = np.where(has_dates, exit_.notna().to_numpy(), exited)
+        tenure_df['HireYear'] = hire.dt.year.astype('Int64').array
+
+    tenure_df['Tenure'] = tenure
+    tenure_df['Exited'] = exited.astype(bool)
+    return tenure_df
+
+
+def kaplan_meier(durations, events, groups=None, confidence: float = 0.95) -> Dict[str, Any]:
+    """
+    Estimate Kaplan-Meier survival curves for every group at once.
+
+    Returns the shared time axis plus (groups x times) arrays for survival,
+    confidence bounds, number at risk and events. Bounds use the log-log
+    transform of the Greenwood variance.
+    """
+    durations = np.asarray(durations, dtype=float)
+    events = np.asarray(events, dtype=bool)
+
+    if groups is None:
+        codes = np.zeros(len(durations), dtype=np.int64)
+        labels = np.array(['All'], dtype=object)
+    else:
+        codes, labels = pd.factorize(pd.Series(groups), sort=True)
+
+    valid = (codes >= 0) & ~np.isnan(durations) & (durations >= 0)
+    codes, durations, events = codes[valid], durations[valid], events[valid]
+
+    times, time_idx = np.unique(durations, return_inverse=True)
+    n_groups, n_times = len(labels), len(times)
+
+    cell = codes * n_times + time_idx
+    removed = np.bincount(cell, minlength=n_groups * n_times).reshape(n_groups, n_times)
+    deaths = np.bincount(cell, weights=events, minlength=n_groups * n_times).reshape(n_groups, n_times)
+    # Everyone whose tenure is >= t is still at risk at t
+    at_risk = removed[:, ::-1].cumsum(axis=1)[:, ::-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hazard = np.where(at_risk > 0, deaths / at_risk, 0.0)
+        survival = np.cumprod(1.0 - hazard, axis=1)
+
+        greenwood_terms = np.where(at_risk > deaths, deaths / (at_risk * (at_risk - deaths)), 0.0)
+        greenwood = np.cumsum(greenwood_terms, axis=1)
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        log_s = np.log(survival)
+        se = np.sqrt(greenwood) / np.abs(log_s)
+        lower = survival ** np.exp(z * se)
+        upper = survival ** np.exp(-z * se)
+
+    # No events yet -> the band collapses onto S(t) = 1; S(t) = 0 stays at 0
+    lower = np.where(np.isfinite(se), lower, survival)
+    upper = np.where(np.isfinite(se), upper, survival)
+
+    below_half = survival <= 0.5
+    median = np.where(below_half.any(axis=1), times[below_half.argmax(axis=1)], np.nan)
+
+    return {
+        'labels': labels,
+        'times': times,
+        'survival': survival,
+        'lower': lower,
+        'upper': upper,
+        'at_risk': at_risk,
+        'events': deaths.astype(np.int64),
+        'removed': removed,
+        'median': median,
+    }
+
+
+def _clean(values: np.ndarray, decimals: int = 4) -> List[Optional[float]]:
+    """Round an array and replace NaN with None so it serializes to JSON."""
+    rounded = np.round(values.astype(float), decimals)
+    return [None if np.isnan(v) else float(v) for v in rounded]
+
+
+def _label(value) -> Any:
+    """Convert numpy scalars in cohort labels to plain Python values."""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def survival_curves(tenure_df: pd.DataFrame, cohort: Optional[str] = None,
+                    confidence: float = 0.95) -> Dict[str, Any]:
+    """Return JSON-ready survival curves for each value of `cohort`."""
+    groups = tenure_df[cohort] if cohort else None
+    if groups is not None and groups.nunique() > MAX_COHORT_GROUPS:
+        raise ValueError(f"Column '{cohort}' has too many distinct values for a cohort analysis")
+
+    km = kaplan_meier(tenure_df['Tenure'], tenure_df['Exited'], groups, confidence)
+
+    curves = []
+    # One entry per cohort; each curve keeps only the times where it changes
+    for i, label in enumerate(km['labels']):
+        steps = km['removed'][i] > 0
+        curves.append({
+            'cohort': _label(label),
+            'employees': int(km['removed'][i].sum()),
+            'exits': int(km['events'][i].sum()),
+            'medianTenure': _clean(km['median'][i:i + 1])[0],
+            'times': _clean(km['times'][steps]),
+            'survival': _clean(km['survival'][i][steps]),
+            'lower': _clean(km['lower'][i][steps]),
+            'upper': _clean(km['upper'][i][steps]),
+            'atRisk': km['at_risk'][i][steps].tolist(),
+            'events': km['events'][i][steps].tolist(),
+        })
+
+    return {
+        'cohort': cohort or 'All',
+        'confidence': confidence,
+        'curves': curves,
+    }
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DATASET_PATH = os.path.join(BACKEND_DIR, 'HR-Employee-Attrition-All.csv')
+
+
+@pytest.fixture(scope='session')
+def bundled_frame() -> pd.DataFrame:
+    return pd.read_csv(DATASET_PATH)
+
+
+@pytest.fixture
+def hr_frame(bundled_frame) -> pd.DataFrame:
+    """A private copy of the bundled dataset, safe to modify."""
+    return bundled_frame.copy()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import AggregateState
+from correlation import INDICATOR_SUFFIX, indicator_sources
+from storage import DIMENSIONS
+
+
+def retained_ids(frame: pd.DataFrame, count: int) -> list:
+    """Ids of retained employees whose EmployeeNumber is unique in the frame."""
+    unique = frame[~frame['EmployeeNumber'].duplicated(keep=False)]
+    return unique.loc[unique['Attrition'] == 'No', 'EmployeeNumber'].head(count).tolist()
+
+
+def expected_correlation(frame: pd.DataFrame) -> pd.DataFrame:
+    """DataFrame.corr() over the numeric columns and a 0/1 indicator per Yes/No column."""
+    indicators = {name + INDICATOR_SUFFIX: frame[name].map({'Yes': 1.0, 'No': 0.0})
+                  for name in indicator_sources(frame) if name + INDICATOR_SUFFIX not in frame.columns}
+    return frame.select_dtypes('number').assign(**indicators).corr()
+
+
+@pytest.mark.parametrize('with_binary', [False, True])
+def test_attrition_events_match_a_fresh_recompute(hr_frame, with_binary):
+    if with_binary:
+        # The chatbot adds Attrition_Binary to the shared frame; appends must keep it in step
+        hr_frame['Attrition_Binary'] = (hr_frame['Attrition'] == 'Yes').astype(int)
+    state = AggregateState(hr_frame)
+    ids = retained_ids(hr_frame, 60)
+    already_left = hr_frame.loc[hr_frame['Attrition'] == 'Yes', 'EmployeeNumber'].iloc[0]
+    events = pd.DataFrame({
+        'employee_id': ids + [ids[0], already_left, 10 ** 9],
+        'exit_date': '2024-03-15',
+        'exit_reason': 'Resignation',
+    })
+
+    summary, applied = state.apply_attrition_events(events)
+
+    assert summary == {'applied': 60, 'unknown': 1, 'duplicate': 2}
+    assert len(applied) == 60
+    fresh = AggregateState(hr_frame.copy())
+    assert state.overall_statistics() == fresh.overall_statistics()
+    for dimension in DIMENSIONS:
+        assert state.attrition_by(dimension) == fresh.attrition_by(dimension)
+    pd.testing.assert_frame_equal(state.correlation_matrix(), fresh.correlation_matrix(), atol=1e-9)
+    matrix = state.correlation_matrix()
+    expected = expected_correlation(hr_frame).loc[matrix.index, matrix.columns]
+    pd.testing.assert_frame_equal(matrix, expected, atol=1e-9)
+    assert state.monthly_trends()['exits'] == [60]
+
+
+def test_reapplying_events_changes_nothing(hr_frame):
+    state = AggregateState(hr_frame)
+    events = pd.DataFrame({'employee_id': retained_ids(hr_frame, 10), 'exit_date': '2024-01-02'})
+    state.apply_attrition_events(events)
+    before = state.overall_statistics(), state.correlation_matrix()
+
+    summary, _ = state.apply_attrition_events(events)
+
+    assert summary == {'applied': 0, 'unknown': 0, 'duplicate': 10}
+    assert state.overall_statistics() == before[0]
+    pd.testing.assert_frame_equal(state.correlation_matrix(), before[1])
+
+
+def test_monthly_metrics_batches_add_up_to_one_batch(hr_frame):
+    rng = np.random.default_rng(0)
+    metrics = pd.DataFrame({
+        'month': rng.choice(['2024-01-01', '2024-02-01', '2024-03-01'], 500),
+        'monthly_income': rng.integers(1000, 20000, 500),
+        'work_hours': rng.integers(120, 200, 500),
+        'performance_rating': rng.integers(1, 5, 500),
+        'overtime': rng.choice(['Yes', 'No'], 500),
+    })
+    whole, split = AggregateState(hr_frame), AggregateState(hr_frame)
+
+    assert whole.append_monthly_metrics(metrics) == 500
+    split.append_monthly_metrics(metrics.iloc[:123])
+    split.append_monthly_metrics(metrics.iloc[123:])
+
+    assert split.monthly_trends() == whole.monthly_trends()
+    assert whole.monthly_trends()['activeEmployees'] == metrics['month'].value_counts().sort_index().tolist()
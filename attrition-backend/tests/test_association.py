@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import ATTRITION_INDICATOR
+from association import (MAX_LEVELS, CategoryCodes, CategoryTables, attrition_codes, contingency_table, cramers_v,
+                         mutual_information, rank_factors, rank_tables)
+from correlation import CoMoments
+
+
+@pytest.fixture(scope='module')
+def categories(bundled_frame):
+    return CategoryCodes(bundled_frame)
+
+
+def tables(frame, categories):
+    target = attrition_codes(frame)
+    for name in categories.columns:
+        yield name, contingency_table(categories.codes[name], len(categories.levels[name]), target)
+
+
+def reference_cramers_v(frame, name):
+    observed = pd.crosstab(frame[name], frame['Attrition']).to_numpy(float)
+    n = observed.sum()
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / n
+    chi2 = ((observed - expected) ** 2 / expected).sum()
+    return np.sqrt(chi2 / (n * (min(observed.shape) - 1)))
+
+
+def entropy(counts):
+    p = counts[counts > 0] / counts.sum()
+    return -(p * np.log2(p)).sum()
+
+
+def test_tables_match_crosstab(bundled_frame, categories):
+    for name, table in tables(bundled_frame, categories):
+        expected = pd.crosstab(bundled_frame[name], bundled_frame['Attrition'])
+        assert np.array_equal(table, expected.to_numpy(float)), name
+
+
+def test_cramers_v_matches_chi_squared_formula(bundled_frame, categories):
+    for name, table in tables(bundled_frame, categories):
+        assert cramers_v(table) == pytest.approx(reference_cramers_v(bundled_frame, name), rel=1e-9), name
+
+
+def test_cramers_v_matches_scipy(bundled_frame, categories):
+    contingency = pytest.importorskip('scipy.stats.contingency')
+    for name, table in tables(bundled_frame, categories):
+        assert cramers_v(table) == pytest.approx(contingency.association(table.astype(int), method='cramer'), rel=1e-9), name
+
+
+def test_mutual_information_matches_entropies(bundled_frame, categories):
+    for name, table in tables(bundled_frame, categories):
+        # I(X; Y) = H(X) + H(Y) - H(X, Y)
+        expected = entropy(table.sum(axis=1)) + entropy(table.sum(axis=0)) - entropy(table.ravel())
+        assert mutual_information(table) == pytest.approx(expected, rel=1e-9, abs=1e-12), name
+
+
+def test_two_level_cramers_v_is_abs_r(bundled_frame, categories):
+    indicator = (bundled_frame['OverTime'] == 'Yes').astype(float)
+    attrition = (bundled_frame['Attrition'] == 'Yes').astype(float)
+    table = dict(tables(bundled_frame, categories))['OverTime']
+    assert cramers_v(table) == pytest.approx(abs(np.corrcoef(indicator, attrition)[0, 1]), rel=1e-9)
+
+
+def test_degenerate_tables_have_no_score():
+    assert np.isnan(cramers_v(np.array([[10.0, 5.0], [0.0, 0.0]])))
+    assert np.isnan(cramers_v(np.array([[10.0, 0.0], [7.0, 0.0]])))
+    assert np.isnan(mutual_information(np.zeros((2, 2))))
+
+
+def ranked(frame, categories, mask=None):
+    moments = CoMoments.of(frame)
+    if mask is not None:
+        moments = moments.subset(frame, mask)
+    correlations = moments.correlation()[ATTRITION_INDICATOR]
+    return {factor['factor']: factor for factor in rank_factors(correlations, categories, attrition_codes(frame), mask)}
+
+
+def test_yes_no_columns_are_scored_once(bundled_frame, categories):
+    factors = ranked(bundled_frame, categories)
+    assert factors['OverTime']['kind'] == 'categorical'
+    assert 'OverTime_Binary' not in factors
+    assert ATTRITION_INDICATOR not in factors
+    # The skipped indicator would have scored the same
+    r = CoMoments.of(bundled_frame).correlation().loc['OverTime_Binary', ATTRITION_INDICATOR]
+    assert factors['OverTime']['importance'] == pytest.approx(abs(r), rel=1e-9)
+
+
+def test_column_constant_within_rows_is_left_out(bundled_frame, categories):
+    mask = (bundled_frame['OverTime'] == 'Yes').to_numpy()
+    factors = ranked(bundled_frame, categories, mask)
+    assert 'OverTime' not in factors and 'OverTime_Binary' not in factors
+    assert 'Department' in factors
+    assert all(np.isfinite(factor['importance']) for factor in factors.values())
+    importances = [factor['importance'] for factor in factors.values()]
+    assert importances == sorted(importances, reverse=True)
+
+
+def chunked_tables(frame, chunksize):
+    accumulated = CategoryTables()
+    for start in range(0, len(frame), chunksize):
+        accumulated.update(frame.iloc[start:start + chunksize])
+    return accumulated
+
+
+def test_chunked_tables_match_one_pass(bundled_frame, categories):
+    accumulated = chunked_tables(bundled_frame, 200)
+    expected = dict(tables(bundled_frame, categories))
+    assert set(accumulated.tables()) == set(expected)
+    for name, table in expected.items():
+        # Levels come in first-seen order rather than sorted
+        assert np.array_equal(accumulated.counts[name].sort_index().to_numpy(), table), name
+
+    correlations = CoMoments.of(bundled_frame).correlation()[ATTRITION_INDICATOR]
+    assert rank_tables(correlations, accumulated.tables()) == rank_factors(correlations, categories,
+                                                                          attrition_codes(bundled_frame))
+
+
+def test_chunked_column_with_too_many_levels_is_dropped():
+    frame = pd.DataFrame({'Code': [f'c{k}' for k in range(MAX_LEVELS + 1)], 'Team': ['a', 'b'] * 32 + ['a'],
+                          'Attrition': ['Yes', 'No'] * 32 + ['No']})
+    # No single chunk has more than MAX_LEVELS codes, but together they do
+    accumulated = chunked_tables(frame, 40)
+    assert accumulated.counts['Code'] is None
+    assert list(accumulated.tables()) == ['Team']
@@ -0,0 +1,87 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+import chatbot
+from chatbot import HRAnalyticsChatbot, plot_columns, render_plot_of, render_shared_plot
+from jobs import SUCCEEDED, JobScheduler
+from shared_dataset import publish, release
+
+PLOTS = [
+    {'plot_type': 'bar', 'x_column': 'Department', 'y_column': 'Attrition Rate'},
+    {'plot_type': 'bar', 'x_column': 'Age Group', 'hue': 'Attrition'},
+    {'plot_type': 'box', 'x_column': 'YearsAtCompany_Group', 'y_column': 'MonthlyIncome'},
+    {'plot_type': 'bar', 'x_column': 'Factor', 'y_column': 'Correlation Coefficient'},
+    {'plot_type': 'heatmap', 'x_column': 'Age'},
+]
+
+
+class EchoClient:
+    """Answers with the last user message, slowly enough for turns to overlap."""
+
+    def complete(self, url, api_key, payload):
+        time.sleep(0.02)
+        question = [m for m in payload['messages'] if m['role'] == 'user'][-1]['content']
+        return {'choices': [{'message': {'content': f'echo {question}'}}]}
+
+
+def test_concurrent_turns_keep_the_conversation_in_order(monkeypatch):
+    monkeypatch.setattr(chatbot, 'shared_client', lambda: EchoClient())
+    bot = HRAnalyticsChatbot()
+    bot.api_key = 'test'
+    barrier = threading.Barrier(6)
+
+    def ask(k):
+        barrier.wait(timeout=5)
+        response = bot.process_query(f'question {k}')
+        assert response['response'] == f'echo question {k}'
+
+    threads = [threading.Thread(target=ask, args=(k,)) for k in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    history = bot.conversation_history
+    assert len(history) == 12
+    for question, answer in zip(history[::2], history[1::2]):
+        assert question['role'] == 'user' and answer['role'] == 'assistant'
+        assert answer['content'] == f"echo {question['content']}"
+
+
+@pytest.mark.parametrize('params', PLOTS)
+def test_plot_columns_draw_the_same_plot(hr_frame, params):
+    frame = HRAnalyticsChatbot(hr_frame).dataframe
+    columns = plot_columns(frame, params)
+    if params['plot_type'] != 'heatmap' and 'Factor' not in params['x_column']:
+        assert len(columns) <= 3
+    assert render_plot_of(frame[columns], params) == render_plot_of(frame, params)
+
+
+def wait_for(job):
+    revision = 0
+    deadline = time.monotonic() + 60
+    while not job.done and time.monotonic() < deadline:
+        revision = job.wait(revision, timeout=1)
+    assert job.state == SUCCEEDED, job.error
+    return job.result
+
+
+def test_plot_jobs_run_in_a_worker_process(hr_frame, tmp_path):
+    manifest_path = str(tmp_path / f'{uuid.uuid4().hex}.json')
+    manifest = publish(hr_frame, manifest_path)
+    scheduler = JobScheduler({'plot': (1, True)})
+    frame = HRAnalyticsChatbot(hr_frame).dataframe
+    params = PLOTS[0]
+    try:
+        # The columns the plot reads, then the whole dataset attached from shared memory
+        sent, _ = scheduler.submit('plot', render_plot_of, frame[plot_columns(frame, params)], params)
+        attached, _ = scheduler.submit('plot', render_shared_plot, manifest_path, manifest['version'], params)
+        expected = render_plot_of(frame, params)
+        assert wait_for(sent) == expected
+        assert wait_for(attached) == expected
+    finally:
+        scheduler.restart_processes()
+        release(manifest_path)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from employee_index import EmployeeIndex, decode_cursor, encode_cursor
+
+
+def all_pages(index: EmployeeIndex, column: str, descending: bool, limit: int, mask=None) -> list:
+    rows, after = [], None
+    while True:
+        page, more = index.page(column, mask, limit, descending, after)
+        rows.extend(page.tolist())
+        if not more:
+            return rows
+        after = tuple(decode_cursor(index.cursor_after(column, page[-1], descending))[key]
+                      for key in ('value', 'id', 'row'))
+
+
+@pytest.fixture
+def duplicated_frame():
+    # Every (value, EmployeeNumber) pair appears three times
+    return pd.DataFrame({
+        'EmployeeNumber': np.repeat([7, 3, 5, 3], 6),
+        'JobSatisfaction': np.tile([1, 2], 12),
+        'MonthlyIncome': np.repeat([4000.0, np.nan, 2500.0, 4000.0], 6),
+    })
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('limit', [1, 2, 5, 7])
+def test_pages_visit_every_row_once_with_duplicate_keys(duplicated_frame, descending, limit):
+    index = EmployeeIndex(duplicated_frame, columns=['JobSatisfaction', 'MonthlyIncome'])
+
+    rows = all_pages(index, 'JobSatisfaction', descending, limit)
+
+    assert sorted(rows) == list(range(len(duplicated_frame)))
+    keys = [(duplicated_frame['JobSatisfaction'][row], duplicated_frame['EmployeeNumber'][row], row) for row in rows]
+    assert keys == sorted(keys, reverse=descending)
+    # Rows without a value are left out of float columns
+    income_rows = all_pages(index, 'MonthlyIncome', descending, limit)
+    assert sorted(income_rows) == np.flatnonzero(duplicated_frame['MonthlyIncome'].notna()).tolist()
+
+
+def test_pages_on_a_doubled_bundled_dataset_with_a_filter(hr_frame):
+    # Loading the same export twice repeats every EmployeeNumber
+    frame = pd.concat([hr_frame, hr_frame], ignore_index=True)
+    index = EmployeeIndex(frame)
+    mask = (frame['Department'] == 'Sales').to_numpy()
+
+    rows = all_pages(index, 'JobSatisfaction', True, 37, mask)
+
+    assert sorted(rows) == np.flatnonzero(mask).tolist()
+
+
+@pytest.mark.parametrize('state', [
+    {'sort': 'Age', 'order': 'asc', 'value': 'thirty', 'id': 1, 'row': 0},
+    {'sort': 'Age', 'order': 'asc', 'value': None, 'id': 1, 'row': 0},
+    {'sort': 'Age', 'order': 'asc', 'value': 30, 'id': [1], 'row': 0},
+    {'sort': 'Age', 'order': 'asc', 'value': True, 'id': 1, 'row': 0},
+    {'sort': 'Age', 'order': 'asc', 'value': 30, 'id': 1, 'row': -1},
+    {'sort': 'Age', 'order': 'asc', 'value': 30, 'id': 1, 'row': 1.5},
+    {'sort': 'Age', 'order': 'asc', 'value': 30, 'id': 1},
+    [30, 1, 0],
+])
+def test_malformed_cursors_are_rejected(state):
+    with pytest.raises(ValueError, match='Malformed cursor'):
+        decode_cursor(encode_cursor(state))
+    with pytest.raises(ValueError, match='Malformed cursor'):
+        decode_cursor('not base64 json')
@@ -0,0 +1,100 @@
+import sqlite3
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from filters import EMPTY_RANGE, canonicalize_filters, filter_domain, filter_mask, filter_sql, filters_key, \
+    parse_filter_args
+
+
+def filters_from(args: dict) -> dict:
+    return parse_filter_args(MultiDict(args))
+
+
+def sql_count(connection: sqlite3.Connection, filters: dict) -> int:
+    where, params = filter_sql(filters)
+    return connection.execute(f'SELECT COUNT(*) FROM hr WHERE {where}', params).fetchone()[0]
+
+
+@pytest.fixture
+def single_rating_frame(hr_frame):
+    hr_frame['PerformanceRating'] = 3
+    return hr_frame
+
+
+@pytest.mark.parametrize('args', [
+    {'performanceMin': '4'},
+    {'performanceMax': '2'},
+    {'performanceMin': '3.5', 'performanceMax': '5'},
+])
+def test_empty_range_on_a_single_valued_column_selects_nothing(single_rating_frame, args):
+    filters = filters_from(args)
+    canonical = canonicalize_filters(filters, filter_domain(single_rating_frame))
+
+    assert filter_mask(single_rating_frame, filters).sum() == 0
+    assert (canonical['performance_min'], canonical['performance_max']) == EMPTY_RANGE
+    assert filter_mask(single_rating_frame, canonical).sum() == 0
+
+
+@pytest.mark.parametrize('args', [
+    {'tenureMin': '200'},
+    {'tenureMax': '-5'},
+    {'tenureMin': '20', 'tenureMax': '10'},
+    {'satisfactionMin': '6', 'departments': ['Sales']},
+])
+def test_out_of_domain_range_selects_nothing_in_pandas_and_sql(hr_frame, args):
+    filters = filters_from(args)
+    canonical = canonicalize_filters(filters, filter_domain(hr_frame))
+    connection = sqlite3.connect(':memory:')
+    hr_frame.to_sql('hr', connection, index=False)
+
+    assert filter_mask(hr_frame, canonical).sum() == 0
+    assert sql_count(connection, canonical) == 0
+    assert sql_count(connection, filters) == 0
+
+
+def test_empty_ranges_share_a_key(hr_frame):
+    domain = filter_domain(hr_frame)
+    first = canonicalize_filters(filters_from({'tenureMin': '200'}), domain)
+    second = canonicalize_filters(filters_from({'tenureMin': '30', 'tenureMax': '20'}), domain)
+    assert filters_key(first) == filters_key(second)
+
+
+def test_equivalent_filters_share_a_key(hr_frame):
+    domain = filter_domain(hr_frame)
+    departments = sorted(hr_frame['Department'].unique())
+    first = canonicalize_filters(filters_from({'departments': ['Sales', 'Human Resources'], 'gender': 'Male',
+                                               'tenureMin': '-10', 'tenureMax': '1000'}), domain)
+    second = canonicalize_filters(filters_from({'departments': ['Human Resources', 'Sales', 'Sales'],
+                                                'gender': ' male'}), domain)
+    everything = canonicalize_filters(filters_from({'departments': departments, 'education': 'unknown'}), domain)
+
+    assert filters_key(first) == filters_key(second)
+    assert filters_key(everything) == filters_key(canonicalize_filters(filters_from({}), domain))
+
+
+def test_canonical_filters_select_the_same_rows(hr_frame):
+    rng = np.random.default_rng(7)
+    domain = filter_domain(hr_frame)
+    departments = hr_frame['Department'].unique().tolist()
+    connection = sqlite3.connect(':memory:')
+    hr_frame.to_sql('hr', connection, index=False)
+
+    for _ in range(200):
+        args = {}
+        for name, low, high in [('tenure', -5, 45), ('satisfaction', 0, 6), ('performance', 0, 6)]:
+            if rng.random() < 0.6:
+                args[f'{name}Min'] = str(rng.integers(low, high))
+            if rng.random() < 0.6:
+                args[f'{name}Max'] = str(rng.integers(low, high))
+        if rng.random() < 0.5:
+            args['departments'] = list(rng.choice(departments, rng.integers(1, 4)))
+        args['gender'] = str(rng.choice(['all', 'Male', 'FEMALE']))
+        args['atRisk'] = str(rng.choice(['true', 'false']))
+        filters = filters_from(args)
+        canonical = canonicalize_filters(filters, domain)
+
+        expected = filter_mask(hr_frame, filters)
+        np.testing.assert_array_equal(filter_mask(hr_frame, canonical), expected, err_msg=str(args))
+        assert sql_count(connection, canonical) == expected.sum(), args
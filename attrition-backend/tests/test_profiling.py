@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+import profiling
+
+SECRET = 's3cret'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('PROFILE_SECRET', SECRET)
+    app = Flask(__name__)
+    profiling.init_app(app)
+    barrier = threading.Barrier(4)
+
+    @app.route('/work')
+    def work():
+        # Every request is inside its profile at the same time
+        barrier.wait(timeout=5)
+        total = sum(i * i for i in range(20000))
+        time.sleep(0.05)
+        return jsonify(total=total)
+
+    return app.test_client()
+
+
+def test_concurrent_cprofile_requests_all_succeed(client):
+    results = []
+
+    def request():
+        response = client.get('/work', headers={'X-Profile': SECRET, 'X-Profile-Mode': 'cprofile'})
+        results.append((response.status_code, response.headers.get('X-Profile-Id')))
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [status for status, _ in results] == [200] * 4
+    profiles = client.get('/api/profiles', headers={'X-Profile': SECRET}).get_json()['profiles']
+    assert len(profiles) == 4
+    assert all(profile['requestedMode'] == 'cprofile' for profile in profiles)
+    assert [profile['mode'] for profile in profiles].count('cprofile') == 1
+
+
+def test_wrong_secret_is_rejected(client):
+    assert client.get('/api/profiles', headers={'X-Profile': 'wrong'}).status_code == 403
+    assert client.get('/api/profiles', headers={'X-Profile': 'sécret'}).status_code == 403
+    assert client.get('/api/profiles').status_code == 403
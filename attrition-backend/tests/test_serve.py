@@ -0,0 +1,63 @@
+import http.client
+import threading
+import time
+
+import pytest
+
+from serve import PooledWSGIServer, bind_socket
+
+
+def slow_app(environ, start_response):
+    time.sleep(float(environ['QUERY_STRING'] or 0))
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'done']
+
+
+@pytest.fixture
+def listener():
+    sock = bind_socket('127.0.0.1', 0, 16)
+    yield sock
+    sock.close()
+
+
+def request(port, delay, results):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('GET', f'/?{delay}')
+        response = connection.getresponse()
+        results.append((response.status, response.read()))
+    except (OSError, http.client.HTTPException) as e:
+        results.append(e)
+
+
+def serve_and_stop(listener, delay, drain_timeout):
+    """Start a request that takes `delay` seconds, then stop the server while it runs."""
+    server = PooledWSGIServer(slow_app, listener.fileno(), 2, drain_timeout=drain_timeout)
+    serving = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05})
+    serving.start()
+    results = []
+    client = threading.Thread(target=request, args=(listener.getsockname()[1], delay, results))
+    client.start()
+    deadline = time.monotonic() + 5
+    while server.in_flight == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    started = time.monotonic()
+    server.shutdown()
+    drained = server.server_close()
+    seconds = time.monotonic() - started
+    serving.join()
+    client.join()
+    return drained, seconds, results
+
+
+def test_stopping_finishes_requests_in_flight(listener):
+    drained, seconds, results = serve_and_stop(listener, 0.5, drain_timeout=10)
+    assert drained
+    assert results == [(200, b'done')]
+    assert seconds < 5
+
+
+def test_drain_is_bounded(listener):
+    drained, seconds, _ = serve_and_stop(listener, 3, drain_timeout=0.2)
+    assert not drained
+    assert seconds < 2
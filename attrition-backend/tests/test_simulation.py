@@ -0,0 +1,60 @@
+import pytest
+
+from risk_model import RiskModel
+from simulation import Intervention, Simulator
+
+
+@pytest.fixture(scope='module')
+def simulator(bundled_frame):
+    model = RiskModel.fit(bundled_frame)
+    return Simulator(bundled_frame, model, model.logit(bundled_frame))
+
+
+def parse(spec, simulator):
+    return Intervention.parse(spec, simulator.df, simulator.model)
+
+
+@pytest.mark.parametrize('spec, message', [
+    ([1], 'must be an object'),
+    ({'where': [1], 'set': {'OverTime': 'No'}}, 'where must map'),
+    ({'where': {'Department': [['Sales']]}, 'set': {'OverTime': 'No'}}, 'where Department'),
+    ({'set': [1]}, 'set must map'),
+    ({'scale': 'MonthlyIncome'}, 'scale must map'),
+    ({'set': {'OverTime': ['No']}}, 'set OverTime needs a single value'),
+    ({'set': {'OverTime': {'value': 'No'}}}, 'set OverTime needs a single value'),
+    ({'add': {'MonthlyIncome': None}}, 'add MonthlyIncome needs a single value'),
+    ({'scale': {'MonthlyIncome': '1.1'}}, 'needs a number'),
+    ({'set': {'OverTime': 'Maybe'}}, 'is not a value of OverTime'),
+    ({'add': {'OverTime': 1}}, 'Cannot add non-numeric'),
+    ({'set': {'NoSuchColumn': 1}}, 'not a risk model feature'),
+    ({'where': {'Department': ['Sales']}}, 'needs at least one'),
+    ({'set': {'OverTime': 'No'}, 'fraction': True}, 'fraction must be between'),
+    ({'set': {'OverTime': 'No'}, 'fraction': 1.5}, 'fraction must be between'),
+])
+def test_invalid_interventions_raise_value_error(simulator, spec, message):
+    with pytest.raises(ValueError, match=message):
+        parse(spec, simulator)
+
+
+def test_valid_intervention(simulator):
+    intervention = parse({'where': {'Department': 'Sales'}, 'set': {'OverTime': 'No'},
+                          'scale': {'MonthlyIncome': 1.1}, 'fraction': 0.5}, simulator)
+    assert intervention.where == {'Department': ['Sales']}
+    assert intervention.changes == [('OverTime', 'set', 'No'), ('MonthlyIncome', 'scale', 1.1)]
+    assert intervention.fraction == 0.5
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_exhausted_budget_still_gives_an_estimate(simulator, workers):
+    intervention = parse({'set': {'OverTime': 'No'}, 'fraction': 0.5}, simulator)
+    result = simulator.run([intervention], draws=2000, seed=1, budget_seconds=0, workers=workers)
+    assert 1 <= result['draws'] < 2000
+    assert result['truncated']
+    assert 'scenario' in result['total']
+
+
+def test_stopped_run_still_gives_an_estimate(simulator):
+    intervention = parse({'set': {'OverTime': 'No'}, 'fraction': 0.5}, simulator)
+    result = simulator.run([intervention], draws=2000, seed=1, workers=2, should_stop=lambda: True)
+    assert result['draws'] >= 1
+    assert 'scenario' in result['total']
@@ -0,0 +1,72 @@
+import math
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from aggregates import AggregateState, StreamingAggregates
+from conftest import DATASET_PATH
+from filters import parse_filter_args
+from storage import DIMENSIONS, PandasBackend, SQLBackend, StreamingBackend
+
+FILTER_ARGS = [
+    {},
+    {'departments': ['Sales']},
+    {'departments': ['Sales', 'Human Resources'], 'gender': 'male'},
+    {'tenureMin': '3', 'tenureMax': '10', 'satisfactionMin': '2'},
+    {'education': 'masters', 'role': 'midlevel'},
+    {'atRisk': 'true', 'performanceMin': '4'},
+    {'gender': 'female', 'atRisk': 'true', 'tenureMax': '2', 'departments': ['Research & Development']},
+]
+
+
+def comparable(value):
+    """NaN rates compare equal to each other."""
+    if isinstance(value, dict):
+        return {key: comparable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [comparable(item) for item in value]
+    if isinstance(value, float) and math.isnan(value):
+        return 'nan'
+    return value
+
+
+@pytest.fixture(scope='module')
+def reference(bundled_frame):
+    return PandasBackend(bundled_frame.copy())
+
+
+@pytest.fixture(scope='module')
+def sql_backend(bundled_frame, tmp_path_factory):
+    backend = SQLBackend(f"sqlite:///{tmp_path_factory.mktemp('sql') / 'hr.db'}")
+    backend.load_dataframe(bundled_frame)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture(scope='module')
+def streaming_backend():
+    # Small chunks, so the counters and the cube are merged across many chunks
+    return StreamingBackend(StreamingAggregates(DATASET_PATH, chunksize=200, sample_rows=100))
+
+
+@pytest.fixture(scope='module', params=['aggregates', 'sql', 'streaming'])
+def backend(request, bundled_frame, sql_backend, streaming_backend):
+    if request.param == 'aggregates':
+        frame = bundled_frame.copy()
+        return PandasBackend(frame, AggregateState(frame))
+    return {'sql': sql_backend, 'streaming': streaming_backend}[request.param]
+
+
+@pytest.mark.parametrize('dimension', sorted(DIMENSIONS))
+def test_attrition_by_matches_pandas(backend, reference, dimension):
+    assert comparable(backend.attrition_by(dimension)) == comparable(reference.attrition_by(dimension))
+
+
+def test_overall_statistics_match_pandas(backend, reference):
+    assert backend.overall_statistics() == reference.overall_statistics()
+
+
+@pytest.mark.parametrize('args', FILTER_ARGS)
+def test_filtered_summary_matches_pandas(backend, reference, args):
+    filters = parse_filter_args(MultiDict(args))
+    assert backend.filtered_summary(filters) == reference.filtered_summary(filters)
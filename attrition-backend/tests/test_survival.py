@@ -0,0 +1,124 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from survival import DAYS_PER_YEAR, MAX_COHORT_GROUPS, build_tenure_frame, kaplan_meier, survival_curves
+
+Z95 = 1.959963984540054
+
+# Ties at t=1 and t=3 (an event and a censoring at 3), the last one at risk exits at t=4:
+#   t  at risk  events  S(t)                   Greenwood sum
+#   1  6        2       1 - 2/6 = 2/3          2 / (6 * 4) = 1/12
+#   2  4        0       2/3                    1/12
+#   3  3        1       2/3 * (1 - 1/3) = 4/9  1/12 + 1 / (3 * 2) = 1/4
+#   4  1        1       0                      (undefined once S = 0)
+DURATIONS = [1, 1, 2, 3, 3, 4]
+EVENTS = [1, 1, 0, 1, 0, 1]
+
+
+def log_log_band(s, greenwood):
+    se = math.sqrt(greenwood) / abs(math.log(s))
+    return s ** math.exp(Z95 * se), s ** math.exp(-Z95 * se)
+
+
+def test_tied_event_times():
+    km = kaplan_meier(DURATIONS, EVENTS)
+    assert km['times'].tolist() == [1, 2, 3, 4]
+    assert km['at_risk'][0].tolist() == [6, 4, 3, 1]
+    assert km['events'][0].tolist() == [2, 0, 1, 1]
+    assert km['removed'][0].tolist() == [2, 1, 2, 1]
+    assert km['survival'][0] == pytest.approx([2 / 3, 2 / 3, 4 / 9, 0])
+    assert km['median'][0] == 3
+
+
+def test_greenwood_bands():
+    km = kaplan_meier(DURATIONS, EVENTS)
+    for t, (s, greenwood) in enumerate([(2 / 3, 1 / 12), (2 / 3, 1 / 12), (4 / 9, 1 / 4)]):
+        lower, upper = log_log_band(s, greenwood)
+        assert km['lower'][0][t] == pytest.approx(lower)
+        assert km['upper'][0][t] == pytest.approx(upper)
+        assert lower < s < upper
+    # S(t) = 0 stays at 0
+    assert km['lower'][0][3] == km['upper'][0][3] == 0
+
+
+def test_greenwood_variance_without_ties():
+    # 1 - 1/4, then * (1 - 1/2) after a censoring at 2: Greenwood 1/12 + 1/2
+    km = kaplan_meier([1, 2, 3, 4], [1, 0, 1, 0], confidence=0.9)
+    assert km['survival'][0] == pytest.approx([3 / 4, 3 / 4, 3 / 8, 3 / 8])
+    z = 1.6448536269514722
+    s, greenwood = 3 / 8, 1 / 12 + 1 / 2
+    se = math.sqrt(greenwood) / abs(math.log(s))
+    assert km['lower'][0][2] == pytest.approx(s ** math.exp(z * se))
+    assert km['upper'][0][2] == pytest.approx(s ** math.exp(-z * se))
+
+
+def test_censoring_only_cohort():
+    km = kaplan_meier([2, 5, 5], [0, 0, 0])
+    assert km['survival'][0].tolist() == [1, 1]
+    assert km['lower'][0].tolist() == km['upper'][0].tolist() == [1, 1]
+    assert km['at_risk'][0].tolist() == [3, 2]
+    assert np.isnan(km['median'][0])
+
+
+def test_cohorts_match_separate_estimates():
+    durations = DURATIONS + [2, 5, 5, 1, 6]
+    events = EVENTS + [0, 0, 0, 1, 1]
+    groups = ['a'] * 6 + ['b'] * 3 + ['c'] * 2
+    km = kaplan_meier(durations, events, groups)
+    assert km['labels'].tolist() == ['a', 'b', 'c']
+    assert km['times'].tolist() == [1, 2, 3, 4, 5, 6]
+
+    for g, label in enumerate(km['labels']):
+        rows = [k for k, group in enumerate(groups) if group == label]
+        alone = kaplan_meier([durations[k] for k in rows], [events[k] for k in rows])
+        # Same curve on the shared axis, read at the cohort's own times
+        shared = np.searchsorted(km['times'], alone['times'])
+        for name in ('survival', 'lower', 'upper', 'at_risk', 'events'):
+            assert km[name][g][shared] == pytest.approx(alone[name][0]), (label, name)
+
+
+def test_invalid_rows_are_dropped():
+    km = kaplan_meier([1, np.nan, -1, 2, 3], [1, 1, 1, 0, 1], ['a', 'a', 'a', None, 'a'])
+    assert km['labels'].tolist() == ['a']
+    assert km['times'].tolist() == [1, 3]
+    assert km['removed'][0].tolist() == [1, 1]
+
+
+def test_survival_curves_keep_each_cohorts_times():
+    frame = pd.DataFrame({
+        'Tenure': DURATIONS + [2, 5, 5],
+        'Exited': [bool(e) for e in EVENTS] + [False] * 3,
+        'Team': ['a'] * 6 + ['b'] * 3,
+    })
+    result = survival_curves(frame, 'Team')
+    a, b = result['curves']
+    assert (a['cohort'], a['employees'], a['exits'], a['medianTenure']) == ('a', 6, 4, 3.0)
+    assert a['times'] == [1, 2, 3, 4]
+    assert a['survival'] == [0.6667, 0.6667, 0.4444, 0.0]
+    assert (b['cohort'], b['employees'], b['exits'], b['medianTenure']) == ('b', 3, 0, None)
+    assert b['times'] == [2, 5]
+    assert b['survival'] == b['lower'] == b['upper'] == [1.0, 1.0]
+    assert b['atRisk'] == [3, 2]
+
+
+def test_too_many_cohorts():
+    frame = pd.DataFrame({'Tenure': range(MAX_COHORT_GROUPS + 1), 'Exited': False,
+                          'Id': range(MAX_COHORT_GROUPS + 1)})
+    with pytest.raises(ValueError, match='too many distinct values'):
+        survival_curves(frame, 'Id')
+
+
+def test_tenure_from_hire_and_exit_dates():
+    df = pd.DataFrame({'EmployeeNumber': [1, 2, 3], 'YearsAtCompany': [9, 9, 4],
+                       'Attrition': ['No', 'Yes', 'Yes']})
+    records = pd.DataFrame({'EmployeeNumber': [1, 2], 'hire_date': ['2010-01-01', '2011-01-01'],
+                            'exit_date': ['2012-01-01', None]})
+    tenure = build_tenure_frame(df, records)
+    # Active employees are censored at the latest date seen; employee 3 has no dates
+    assert tenure['Tenure'].tolist() == pytest.approx([730 / DAYS_PER_YEAR, 365 / DAYS_PER_YEAR, 4])
+    assert tenure['Exited'].tolist() == [True, False, True]
+    assert tenure['HireYear'].tolist()[:2] == [2010, 2011]
+    assert tenure['HireYear'].isna().tolist() == [False, False, True]